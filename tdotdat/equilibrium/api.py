@@ -29,6 +29,7 @@ def create_equilibrium(data):
         current_pidstore.minters["equid"](equ_uuid, data)
         # create equilibrium
         created_equilibrium = Equilibrium.create(data, id_=equ_uuid)
-        # index the equilibrium
-        RecordIndexer().index(created_equilibrium)
     db.session.commit()
+    # queue the equilibrium to be indexed by the bulk index consumer
+    RecordIndexer().bulk_index([str(created_equilibrium.id)])
+    return created_equilibrium
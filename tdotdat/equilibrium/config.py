@@ -1,4 +1,4 @@
-from invenio_indexer.api import RecordIndexer
+from invenio_indexer.api import BulkRecordIndexer
 from invenio_records_rest.utils import allow_all, check_search
 from invenio_search import RecordsSearch
 
@@ -18,8 +18,9 @@ RECORDS_REST_ENDPOINTS = {
         default_endpoint_prefix=True,
         record_class=Equilibrium,
         search_class=RecordsSearch,
-        indexer_class=RecordIndexer,
+        indexer_class=BulkRecordIndexer,
         search_index="equilibrium",
+        search_factory_imp="tdotdat.equilibrium.query:search_factory",
         record_serializers={
             "application/json": "tdotdat.equilibrium.serializers:json_v1_response",
         },
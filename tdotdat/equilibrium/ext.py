@@ -1,8 +1,14 @@
+from invenio_db import db
 from invenio_indexer.signals import before_record_index
-from invenio_files_rest.signals import file_deleted, file_uploaded
+from invenio_records.signals import after_record_delete, after_record_update
+from sqlalchemy import event
+
+from tdotdat.records.jsonresolvers import (
+    forget_changed_equilibria,
+    invalidate_equilibrium,
+)
 
 from . import config, indexer
-from .tasks import update_record_files_async
 
 
 class Equilibrium:
@@ -45,5 +51,8 @@ class Equilibrium:
             indexer.indexer_receiver, sender=app, index="equilibrium-equilibrium-v1.0.0"
         )
 
-        file_deleted.connect(update_record_files_async, weak=False)
-        file_uploaded.connect(update_record_files_async, weak=False)
+        after_record_update.connect(invalidate_equilibrium, weak=False)
+        after_record_delete.connect(invalidate_equilibrium, weak=False)
+        if not event.contains(db.session, "after_commit", forget_changed_equilibria):
+            event.listen(db.session, "after_commit", forget_changed_equilibria)
+            event.listen(db.session, "after_rollback", forget_changed_equilibria)
@@ -0,0 +1,11 @@
+from tdotdat.records.query import search_factory as records_search_factory
+
+from .marshmallow import EquilibriumMetadataSchemaV1
+
+
+def search_factory(self, search):
+    """Records search factory, checking ``fields`` against the equilibrium
+    metadata."""
+    return records_search_factory(
+        self, search, schema_class=EquilibriumMetadataSchemaV1
+    )
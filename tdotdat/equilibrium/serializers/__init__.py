@@ -1,15 +1,16 @@
-from invenio_records_rest.serializers.json import JSONSerializer
 from invenio_records_rest.serializers.response import (
     record_responsify,
     search_responsify,
 )
 
+from tdotdat.records.serializers.json import BaseJSONSerializer
+
 from ..marshmallow import EquilibriumSchemaV1
 
 # Serializers
 # ===========
 #: JSON serializer definition.
-json_v1 = JSONSerializer(EquilibriumSchemaV1, replace_refs=True)
+json_v1 = BaseJSONSerializer(EquilibriumSchemaV1, replace_refs=True)
 
 # Records-REST serializers
 # ========================
@@ -1,8 +1,24 @@
-from flask import Blueprint, render_template, request, redirect, url_for
+import uuid
+
+from flask import (
+    Blueprint,
+    abort,
+    jsonify,
+    render_template,
+    request,
+    redirect,
+    url_for,
+)
 from flask_login import login_required
 from invenio_files_rest.models import ObjectVersion, Bucket
+from invenio_pidstore.errors import PersistentIdentifierError
 import pyrokinetics
 
+from ..records.api import records_using_equilibrium
+from ..records.files import create_object, remove_unused_files
+from ..records.permissions import verify_endpoint_permission
+from ..records.proxies import current_parse_cache
+from ..records.resolver import BulkResolver
 from .forms import EquilibriumForm
 from .api import create_equilibrium
 
@@ -14,6 +30,13 @@ blueprint = Blueprint(
     static_folder="static",
 )
 
+api_blueprint = Blueprint(
+    "equilibrium_api",
+    __name__,
+    url_prefix="/equilibrium",
+)
+"""Blueprint for the REST API endpoints that aren't provided by Invenio"""
+
 
 @blueprint.route("/search")
 def search():
@@ -28,19 +51,25 @@ def create():
         return render_template("equilibrium/create.html", form=form)
 
     bucket = Bucket.create()
+    orphan_id = None
 
     if form.input_file.data:
         input_file = request.files[form.input_file.name]
-        in_file = ObjectVersion.create(bucket, input_file.filename, stream=input_file)
+        in_file, orphan_id = create_object(bucket, input_file.filename, input_file)
 
-        # Note this relies on details of the file storage to get the filename
-        print(in_file.file.storage().fileurl)
-        pyro = pyrokinetics.Pyro(gk_file=in_file.file.storage().fileurl)
+        def parse():
+            # Note this relies on details of the file storage to get the filename
+            pyro = pyrokinetics.Pyro(gk_file=in_file.file.storage().fileurl)
+            return {
+                "elongation": pyro.local_geometry["kappa"],
+                "q": pyro.local_geometry["q"],
+                "B0": pyro.local_geometry["B0"],
+            }
 
         data = {
-            "elongation": pyro.local_geometry["kappa"],
-            "q": pyro.local_geometry["q"],
-            "B0": pyro.local_geometry["B0"],
+            **current_parse_cache.get_or_parse(
+                "equilibrium", [in_file.file.checksum], parse
+            ),
             "_bucket": str(bucket.id),
             "_files": [
                 dict(
@@ -66,7 +95,9 @@ def create():
 
     data = {k: v for k, v in data.items() if v is not None}
 
+    # Commits the files as well
     create_equilibrium(data)
+    remove_unused_files([orphan_id])
 
     return redirect(url_for("equilibrium.success"))
 
@@ -75,3 +106,68 @@ def create():
 @login_required
 def success():
     return render_template("equilibrium/success.html")
+
+
+@api_blueprint.route("/<pid_value>/records")
+def records(pid_value):
+    """List the records that use an equilibrium.
+
+    Pages are fetched from the table of references to equilibria, ordered by
+    record UUID, so each page costs the same however many records use the
+    equilibrium. Takes ``size`` (10 by default) and ``after``, the UUID of
+    the last record on the previous page, as given in the ``next`` link.
+    Needs permission to list records.
+    """
+    verify_endpoint_permission("recid", "list")
+
+    size = request.args.get("size", 10, type=int)
+    if not 1 <= size <= 1000:
+        abort(400)
+    after = request.args.get("after")
+    if after is not None:
+        try:
+            after = uuid.UUID(after)
+        except ValueError:
+            abort(400)
+
+    try:
+        [(_, equilibrium_id)] = BulkResolver(
+            pid_type="equid", object_type="rec"
+        ).resolve([pid_value])
+    except PersistentIdentifierError:
+        abort(404)
+
+    results = records_using_equilibrium(equilibrium_id, after=after, limit=size)
+
+    def link(**kwargs):
+        return url_for(
+            ".records", pid_value=pid_value, size=size, _external=True, **kwargs
+        )
+
+    links = dict(self=link(**({"after": str(after)} if after else {})))
+    if len(results) == size:
+        links["next"] = link(after=str(results[-1][0]))
+
+    return jsonify(
+        hits=dict(
+            hits=[
+                dict(
+                    id=int(recid),
+                    links=dict(
+                        self=url_for(
+                            "invenio_records_rest.recid_item",
+                            pid_value=recid,
+                            _external=True,
+                        ),
+                        html=url_for(
+                            "invenio_records_ui.recid",
+                            pid_value=recid,
+                            _external=True,
+                        ),
+                    ),
+                )
+                for _, recid in results
+            ]
+        ),
+        links=links,
+    )
@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2022 TDoTP.
+#
+# TDotDat is free software; you can redistribute it and/or modify it under
+# the terms of the MIT License; see LICENSE file for more details.
+
+"""Cache of simulation data parsed by pyrokinetics.
+
+Parsing GK outputs is slow, and the same files get parsed again whenever a
+record is re-created or an equilibrium is extracted from an input file already
+in the database. Results are cached on disk keyed by the checksums of the
+parsed files and the pyrokinetics version, so a new pyrokinetics release
+invalidates everything. The least recently used entries are evicted once the
+cache grows past its size limit.
+
+This doesn't depend on the rest of the application, so that ``upload_run.py``
+can use the same cache, with the same keys, before uploading anything. The
+server's cache, which also counts hits and misses across workers, is
+:class:`tdotdat.records.parse_cache.ParseCache`.
+"""
+
+import hashlib
+import json
+import os
+import pathlib
+import tempfile
+
+import pyrokinetics
+
+
+class ParseCache:
+    """Least recently used cache of parsed simulations, stored on disk.
+
+    :param directory: Directory to keep cache entries in.
+    :param max_size: Maximum total size of the entries, in bytes.
+    """
+
+    def __init__(self, directory, max_size):
+        self.directory = pathlib.Path(directory)
+        self.max_size = max_size
+
+    @staticmethod
+    def make_key(kind, checksums):
+        """Key for parsing files with the given checksums.
+
+        :param kind: What the files are being parsed into, e.g. ``"record"``.
+        :param checksums: Checksums of the parsed files, in order.
+        """
+        description = json.dumps([kind, pyrokinetics.__version__, list(checksums)])
+        return hashlib.sha256(description.encode("utf-8")).hexdigest()
+
+    def _path(self, key):
+        return self.directory / f"{key}.json"
+
+    def get(self, key):
+        """Get a cached result, or ``None`` if it isn't in the cache."""
+        path = self._path(key)
+        try:
+            value = json.loads(path.read_text())
+            # Mark as recently used
+            os.utime(path)
+        except (FileNotFoundError, ValueError):
+            return None
+        return value
+
+    def set(self, key, value):
+        """Add a result to the cache, evicting old entries if necessary."""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        # Write to a temporary file first so other workers never see a partial
+        # entry
+        with tempfile.NamedTemporaryFile(
+            "w", dir=self.directory, suffix=".tmp", delete=False
+        ) as f:
+            json.dump(value, f)
+        os.replace(f.name, self._path(key))
+        self.evict()
+
+    def evict(self):
+        """Remove least recently used entries until under the size limit."""
+        entries = []
+        for path in self.directory.glob("*.json"):
+            try:
+                entries.append((path.stat(), path))
+            except FileNotFoundError:
+                continue
+
+        total = sum(stat.st_size for stat, _ in entries)
+        for stat, path in sorted(entries, key=lambda entry: entry[0].st_mtime):
+            if total <= self.max_size:
+                break
+            path.unlink(missing_ok=True)
+            total -= stat.st_size
+
+    def count(self, hit):
+        """Count a hit or miss of :meth:`get_or_parse`. Does nothing here."""
+
+    def get_or_parse(self, kind, checksums, parse):
+        """Get the cached result of parsing some files, or parse them now.
+
+        :param kind: What the files are being parsed into, e.g. ``"record"``.
+        :param checksums: Checksums of the parsed files, in order.
+        :param parse: Function doing the parsing, only called on a cache miss.
+            Must return something JSON serialisable.
+        """
+        key = self.make_key(kind, checksums)
+        if (value := self.get(key)) is not None:
+            self.count(True)
+            return value
+
+        self.count(False)
+        value = parse()
+        self.set(key, value)
+        return value
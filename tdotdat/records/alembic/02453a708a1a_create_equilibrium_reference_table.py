@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2022 TDoTP.
+#
+# TDotDat is free software; you can redistribute it and/or modify it under
+# the terms of the MIT License; see LICENSE file for more details.
+
+"""Create equilibrium reference table.
+
+Fill it in for existing records with ``invenio tdotdat
+backfill-equilibrium-references``.
+"""
+
+import sqlalchemy as sa
+import sqlalchemy_utils
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "02453a708a1a"
+down_revision = "04cd63ba27ef"
+branch_labels = ()
+depends_on = "07fb52561c5c"  # invenio-records
+
+
+def upgrade():
+    """Upgrade database."""
+    op.create_table(
+        "tdotdat_equilibrium_reference",
+        sa.Column("record_id", sqlalchemy_utils.types.uuid.UUIDType(), nullable=False),
+        sa.Column(
+            "equilibrium_id", sqlalchemy_utils.types.uuid.UUIDType(), nullable=False
+        ),
+        sa.ForeignKeyConstraint(
+            ["equilibrium_id"],
+            ["records_metadata.id"],
+            name=op.f("fk_tdotdat_equilibrium_reference_equilibrium_id_records_5242"),
+            ondelete="CASCADE",
+        ),
+        sa.ForeignKeyConstraint(
+            ["record_id"],
+            ["records_metadata.id"],
+            name=op.f("fk_tdotdat_equilibrium_reference_record_id_records_metadata"),
+            ondelete="CASCADE",
+        ),
+        sa.PrimaryKeyConstraint(
+            "record_id", name=op.f("pk_tdotdat_equilibrium_reference")
+        ),
+    )
+    op.create_index(
+        "idx_tdotdat_equilibrium_reference_equilibrium",
+        "tdotdat_equilibrium_reference",
+        ["equilibrium_id", "record_id"],
+        unique=False,
+    )
+
+
+def downgrade():
+    """Downgrade database."""
+    op.drop_index(
+        "idx_tdotdat_equilibrium_reference_equilibrium",
+        table_name="tdotdat_equilibrium_reference",
+    )
+    op.drop_table("tdotdat_equilibrium_reference")
@@ -0,0 +1,22 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2022 TDoTP.
+#
+# TDotDat is free software; you can redistribute it and/or modify it under
+# the terms of the MIT License; see LICENSE file for more details.
+
+"""Create tdotdat_records branch."""
+
+# revision identifiers, used by Alembic.
+revision = "04cd63ba27ef"
+down_revision = None
+branch_labels = ("tdotdat_records",)
+depends_on = "dbdbc1b19cf2"
+
+
+def upgrade():
+    """Upgrade database."""
+
+
+def downgrade():
+    """Downgrade database."""
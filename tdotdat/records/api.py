@@ -9,13 +9,36 @@
 
 import uuid
 
+from flask import current_app
 from invenio_db import db
 from invenio_indexer.api import RecordIndexer
 from invenio_pidstore import current_pidstore
+from invenio_pidstore.models import PersistentIdentifier, PIDStatus
 from invenio_jsonschemas import current_jsonschemas
 from invenio_records_files.api import Record as FilesRecord
 
 from ..config import JSONSCHEMAS_HOST
+from .arrays import extract_arrays, remove_unused_arrays, store_arrays
+from .models import EquilibriumReference
+
+
+def _reference_equilibrium(data):
+    """Replace ``equilibrium_id`` in ``data`` with a JSON reference."""
+    if (equilibrium_id := data.pop("equilibrium_id", None)) is not None:
+        data["equilibrium"] = {
+            "$ref": f"https://{JSONSCHEMAS_HOST}/api/resolver/equilibrium/{equilibrium_id}"
+        }
+
+
+def _extract_arrays(data):
+    """Move large arrays out of ``data``, if sidecar arrays are enabled."""
+    if not current_app.config["TDOTDAT_SIDECAR_ARRAYS_ENABLED"]:
+        return {}
+    return extract_arrays(
+        data,
+        current_app.config["TDOTDAT_SIDECAR_ARRAY_FIELDS"],
+        current_app.config["TDOTDAT_SIDECAR_ARRAY_MIN_SIZE"],
+    )
 
 
 class Record(FilesRecord):
@@ -26,20 +49,110 @@ class Record(FilesRecord):
     @classmethod
     def create(cls, data, id_=None, **kwargs):
         data["$schema"] = current_jsonschemas.path_to_url(cls._schema)
+        _reference_equilibrium(data)
+
+        # Extract before creating, so even the first revision is small. A
+        # record without a bucket has nowhere to store them.
+        arrays = {}
+        if kwargs.get("with_bucket", True):
+            arrays = _extract_arrays(data)
+
+        record = super().create(data, id_=id_, **kwargs)
+        record.update_equilibrium_reference(created=True)
+
+        if arrays:
+            store_arrays(record, arrays)
+            record.commit()
+        return record
+
+    def commit(self, **kwargs):
+        """Store changes of the record, and of the equilibrium it uses.
+
+        Large arrays put back into the record, e.g. by an update with
+        ``?arrays=inline`` metadata, are moved to sidecar files again, and
+        sidecar files that are no longer used are deleted.
+        """
+        _reference_equilibrium(self)
+        if self.files is not None:
+            store_arrays(self, _extract_arrays(self))
+            # The model still has the metadata from before the changes
+            remove_unused_arrays(self, self.model.json or {})
+        record = super().commit(**kwargs)
+        self.update_equilibrium_reference()
+        return record
+
+    def delete(self, force=False):
+        """Delete the record, and its reference to an equilibrium."""
+        EquilibriumReference.query.filter_by(record_id=self.id).delete()
+        return super().delete(force=force)
+
+    def equilibrium_id(self):
+        """UUID of the equilibrium the record uses, or ``None``."""
+        ref = (self.get("equilibrium") or {}).get("$ref")
+        if ref is None:
+            return None
+        pid = PersistentIdentifier.query.filter_by(
+            pid_type="equid", pid_value=ref.rstrip("/").rsplit("/", 1)[-1]
+        ).one_or_none()
+        return pid.object_uuid if pid is not None else None
+
+    def update_equilibrium_reference(self, created=False):
+        """Update the reference to the equilibrium the record uses.
 
-        if (equilibrium_id := data.get("equilibrium_id", None)) is not None:
-            data["equilibrium"] = {
-                "$ref": f"https://{JSONSCHEMAS_HOST}/api/resolver/equilibrium/{equilibrium_id}"
-            }
-            del data["equilibrium_id"]
+        :param created: If the record is new, so has no reference yet.
+        """
+        equilibrium_id = self.equilibrium_id()
+        reference = None if created else EquilibriumReference.query.get(self.id)
+        with db.session.begin_nested():
+            if equilibrium_id is None:
+                if reference is not None:
+                    db.session.delete(reference)
+            elif reference is None:
+                db.session.add(
+                    EquilibriumReference(
+                        record_id=self.id, equilibrium_id=equilibrium_id
+                    )
+                )
+            else:
+                reference.equilibrium_id = equilibrium_id
 
-        return super().create(data, id_=id_, **kwargs)
+
+def records_using_equilibrium(equilibrium_id, after=None, limit=None):
+    """Records that use an equilibrium, ordered by UUID.
+
+    :param equilibrium_id: UUID of the equilibrium.
+    :param after: If given, only records with a greater UUID, for paginating.
+    :param limit: If given, maximum number of records.
+    :returns: List of ``(record UUID, PID value)`` tuples.
+    """
+    query = (
+        db.session.query(EquilibriumReference.record_id, PersistentIdentifier.pid_value)
+        .join(
+            PersistentIdentifier,
+            db.and_(
+                PersistentIdentifier.object_uuid == EquilibriumReference.record_id,
+                PersistentIdentifier.object_type == "rec",
+                PersistentIdentifier.pid_type == "recid",
+            ),
+        )
+        .filter(
+            EquilibriumReference.equilibrium_id == equilibrium_id,
+            PersistentIdentifier.status == PIDStatus.REGISTERED,
+        )
+    )
+    if after is not None:
+        query = query.filter(EquilibriumReference.record_id > after)
+    query = query.order_by(EquilibriumReference.record_id)
+    if limit is not None:
+        query = query.limit(limit)
+    return query.all()
 
 
 def create_record(data):
     """Create a record.
 
     :param dict data: The record data.
+    :returns: The created record.
     """
     with db.session.begin_nested():
         # create uuid
@@ -48,6 +161,37 @@ def create_record(data):
         current_pidstore.minters["recid"](rec_uuid, data)
         # create record
         created_record = Record.create(data, id_=rec_uuid)
-        # index the record
-        RecordIndexer().index(created_record)
     db.session.commit()
+    # queue the record to be indexed by the bulk index consumer
+    RecordIndexer().bulk_index([str(created_record.id)])
+    return created_record
+
+
+def create_records(data_list):
+    """Create many records in a single transaction.
+
+    Records are queued for bulk indexing rather than indexed one by one. A
+    record that fails to be created doesn't stop the others.
+
+    :param data_list: The data for each record.
+    :returns: For each item of ``data_list``, either the created record or the
+        exception raised while creating it.
+    """
+    results = []
+    with db.session.begin_nested():
+        for data in data_list:
+            try:
+                # Savepoint per record, so only this record is rolled back
+                # if it fails
+                with db.session.begin_nested():
+                    rec_uuid = uuid.uuid4()
+                    current_pidstore.minters["recid"](rec_uuid, data)
+                    results.append(Record.create(data, id_=rec_uuid))
+            except Exception as e:
+                results.append(e)
+    db.session.commit()
+
+    RecordIndexer().bulk_index(
+        [str(result.id) for result in results if isinstance(result, Record)]
+    )
+    return results
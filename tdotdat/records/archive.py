@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2022 TDoTP.
+#
+# TDotDat is free software; you can redistribute it and/or modify it under
+# the terms of the MIT License; see LICENSE file for more details.
+
+"""ZIP archives of records and their files.
+
+Archives are written to an unseekable stream and handed out as they are
+written, reading each file straight from storage a chunk at a time, so an
+archive of any size only needs a constant amount of memory and no temporary
+files. ZIP64 is used for large files.
+"""
+
+import json
+import zipfile
+from collections import defaultdict
+
+from invenio_files_rest.models import ObjectVersion
+from invenio_files_rest.proxies import current_permission_factory
+
+from .export import StreamSink
+
+
+def record_objects(record):
+    """Latest versions of the files of a record."""
+    keys = defaultdict(set)
+    for file_ in record.get("_files", []):
+        keys[file_["bucket"]].add(file_["key"])
+    return [
+        obj
+        for bucket_id, bucket_keys in keys.items()
+        for obj in ObjectVersion.get_by_bucket(bucket_id)
+        if obj.key in bucket_keys
+    ]
+
+
+def archive_records(records, chunk_size):
+    """Write records and their files to a ZIP archive.
+
+    Each record goes in a directory named after its PID, with its metadata
+    in ``record.json`` and its files under ``files/``. Files the current
+    user isn't allowed to read are left out.
+
+    :param records: Iterable of ``(pid, metadata, record)`` tuples.
+    :param chunk_size: Size in bytes of the chunks files are read in.
+    :returns: Generator of the bytes of the archive.
+    """
+    sink = StreamSink()
+    with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        for pid, metadata, record in records:
+            directory = str(pid.pid_value)
+            archive.writestr(
+                f"{directory}/record.json", json.dumps(metadata, indent=2)
+            )
+            yield sink.drain()
+
+            for obj in record_objects(record):
+                if not current_permission_factory(obj, "object-read").can():
+                    continue
+                info = zipfile.ZipInfo(
+                    f"{directory}/files/{obj.key}",
+                    date_time=obj.updated.timetuple()[:6],
+                )
+                info.compress_type = zipfile.ZIP_DEFLATED
+                # Lets zipfile decide whether it needs ZIP64
+                info.file_size = obj.file.size
+                with obj.file.storage().open() as source, archive.open(
+                    info, "w"
+                ) as target:
+                    while chunk := source.read(chunk_size):
+                        target.write(chunk)
+                        yield sink.drain()
+    yield sink.drain()
@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2022 TDoTP.
+#
+# TDotDat is free software; you can redistribute it and/or modify it under
+# the terms of the MIT License; see LICENSE file for more details.
+
+"""Storage of large numerical arrays as binary sidecar files.
+
+Long arrays such as ``time`` make the record JSON large, and get carried
+around by every revision and serialization of the record. Instead, they can be
+saved as ``.npy`` files in the record's bucket, leaving only a description of
+the array (shape, dtype and summary statistics) in the ``arrays`` field of the
+metadata.
+"""
+
+from io import BytesIO
+
+import numpy as np
+
+#: Prefix of the keys of sidecar files in the record's bucket.
+SIDECAR_PREFIX = "arrays/"
+
+
+def _get(data, path):
+    """Get the value at the dotted ``path`` in ``data``, or ``None``."""
+    for part in path.split("."):
+        if not isinstance(data, dict):
+            return None
+        data = data.get(part)
+    return data
+
+
+def _set(data, path, value):
+    """Set the value at the dotted ``path`` in ``data``."""
+    *parents, last = path.split(".")
+    for part in parents:
+        data = data.setdefault(part, {})
+    data[last] = value
+
+
+def _pop(data, path):
+    """Remove the value at the dotted ``path`` in ``data``."""
+    *parents, last = path.split(".")
+    for part in parents:
+        data = data[part]
+    return data.pop(last)
+
+
+def describe(path, array):
+    """Metadata describing a sidecar array."""
+    return dict(
+        path=path,
+        key=f"{SIDECAR_PREFIX}{path}.npy",
+        shape=list(array.shape),
+        dtype=str(array.dtype),
+        min=float(array.min()),
+        max=float(array.max()),
+        mean=float(array.mean()),
+    )
+
+
+def extract_arrays(data, paths, min_size):
+    """Move large arrays out of the record data.
+
+    Each array at one of ``paths`` with at least ``min_size`` elements is
+    removed from ``data`` and described in ``data["arrays"]`` instead. The
+    descriptions of arrays that are back in ``data``, e.g. after an update
+    with ``?arrays=inline`` metadata, are dropped.
+
+    :param dict data: The record data, modified in place.
+    :param paths: Dotted paths of the fields that may be moved.
+    :param min_size: Smallest number of elements worth moving.
+    :returns: Dict of the removed arrays by dotted path.
+    """
+    arrays = {}
+    for path in paths:
+        value = _get(data, path)
+        if not isinstance(value, list) or len(value) < min_size:
+            continue
+        try:
+            array = np.asarray(value, dtype=float)
+        except (TypeError, ValueError):
+            # Not purely numerical
+            continue
+        _pop(data, path)
+        arrays[path] = array
+
+    descriptions = [
+        description for description in data.get("arrays", [])
+        if description["path"] not in arrays
+        and _get(data, description["path"]) is None
+    ]
+    descriptions.extend(describe(path, array) for path, array in arrays.items())
+    if descriptions:
+        data["arrays"] = descriptions
+    else:
+        data.pop("arrays", None)
+    return arrays
+
+
+def store_arrays(record, arrays):
+    """Save arrays from :func:`extract_arrays` in the record's bucket.
+
+    :raises ValueError: If the record has no bucket.
+    """
+    if not arrays:
+        return
+    files = record.files
+    if files is None:
+        raise ValueError(f"Record {record.id} has no bucket to store arrays in")
+    for path, array in arrays.items():
+        stream = BytesIO()
+        np.save(stream, array, allow_pickle=False)
+        stream.seek(0)
+        files[describe(path, array)["key"]] = stream
+
+
+def remove_unused_arrays(record, previous):
+    """Delete the sidecar files of ``record`` that it no longer describes.
+
+    Only the sidecars described in ``previous``, the metadata of the record
+    before it changed, are deleted, so other files that happen to be under
+    :data:`SIDECAR_PREFIX` are left alone.
+    """
+    files = record.files
+    if files is None:
+        return
+    used = {description["key"] for description in record.get("arrays", [])}
+    unused = {
+        description["key"] for description in previous.get("arrays", [])
+    } - used
+    for key in unused:
+        try:
+            del files[key]
+        except KeyError:
+            # Already deleted
+            continue
+
+
+def load_arrays(record, metadata):
+    """Put the sidecar arrays of ``record`` back into its serialized metadata.
+
+    :param record: The record the sidecar files belong to.
+    :param dict metadata: The serialized metadata, modified in place.
+    """
+    files = record.files
+    for description in metadata.pop("arrays", []):
+        try:
+            file_object = files[description["key"]]
+        except (KeyError, TypeError):
+            # No bucket, or the sidecar is missing
+            continue
+        with file_object.obj.file.storage().open() as stream:
+            array = np.load(BytesIO(stream.read()), allow_pickle=False)
+        _set(metadata, description["path"], array.tolist())
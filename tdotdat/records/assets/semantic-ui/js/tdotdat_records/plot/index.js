@@ -1,27 +1,92 @@
-import React from "react";
+import React, { useEffect, useState } from "react";
 import Plot from "react-plotly.js";
-import { Grid, Input, Label } from 'semantic-ui-react'
+import { Checkbox, Dropdown, Grid, Input, Label, Message } from 'semantic-ui-react'
 import { createSearchAppInit } from "@js/invenio_search_ui";
 import { withState } from "react-searchkit";
 
-export const Results = ({ currentResultsState = {} }) => {
-  const { total, hits } = currentResultsState.data;
+const plotConfig = JSON.parse(
+  document.getElementById("plot-fields").dataset.plotFields
+);
 
-  var growth_rate = new Array;
-    hits.forEach(hit => (
-        hit.metadata.wavevector.forEach(wavevector => {
-            growth_rate.push(wavevector.eigenmode[0].growth_rate_norm)
-        })
-    ));
+const fieldOptions = plotConfig.fields.map(field => (
+  { key: field, text: field, value: field }
+));
 
-  var ky = new Array;
-    hits.forEach(hit => (
-        hit.metadata.wavevector.forEach(wavevector => (
-            ky.push(wavevector.binormal_component_norm)
-        ))
-    ));
+// Columns are sent as base64 little-endian float32 arrays
+const decodeColumn = ({ bdata }) => {
+  const bytes = Uint8Array.from(atob(bdata), c => c.charCodeAt(0));
+  return new Float32Array(bytes.buffer);
+};
+
+export const Results = ({ currentQueryState = {}, currentResultsState = {} }) => {
+  const { total } = currentResultsState.data;
+  const queryString = currentQueryState.queryString || "";
+  const [x, setX] = useState(plotConfig.default_fields[0]);
+  const [y, setY] = useState(plotConfig.default_fields[1]);
+  const [xLog, setXLog] = useState(false);
+  const [yLog, setYLog] = useState(false);
+  const [data, setData] = useState(null);
+  const [density, setDensity] = useState(null);
+  const [error, setError] = useState(null);
+
+  const fetchJSON = (url, params) => (
+    fetch(`${url}?${new URLSearchParams(params)}`).then(response => {
+      if (!response.ok) {
+        throw new Error(`Couldn't fetch plot data (${response.status})`);
+      }
+      return response.json();
+    })
+  );
 
-    console.log(ky, growth_rate);
+  // Sampled points would only be replaced by the density, so skip them
+  const tooMany = total > plotConfig.max_points;
+
+  useEffect(() => {
+    if (tooMany) {
+      setData(null);
+      return;
+    }
+    fetchJSON(plotConfig.url, { q: queryString, x: x, y: y })
+      .then(result => {
+        setData({
+          ...result,
+          x: decodeColumn(result.x),
+          y: decodeColumn(result.y),
+        });
+        setError(null);
+      })
+      .catch(err => setError(err.message));
+  }, [queryString, x, y, tooMany]);
+
+  // Too many points to draw them all, so show how densely they're packed
+  useEffect(() => {
+    if (!tooMany && (!data || !data.sampled)) {
+      setDensity(null);
+      return;
+    }
+    fetchJSON(plotConfig.density_url, {
+      q: queryString,
+      x: x,
+      y: y,
+      x_scale: xLog ? "log" : "linear",
+      y_scale: yLog ? "log" : "linear",
+    })
+      .then(result => setDensity(result))
+      .catch(err => setError(err.message));
+  }, [data, tooMany, queryString, x, y, xLog, yLog]);
+
+  const trace = density ? {
+    x: density.x_edges,
+    y: density.y_edges,
+    z: density.counts,
+    type: 'heatmap',
+    colorscale: 'Viridis',
+  } : {
+    x: data ? data.x : [],
+    y: data ? data.y : [],
+    type: 'scattergl',
+    mode: 'markers',
+  };
 
   return (
     <Grid relaxed>
@@ -31,19 +96,47 @@ export const Results = ({ currentResultsState = {} }) => {
         </Grid.Column>
         <Grid.Column width={8}>
             Search above to change plot data
+            {density && (
+              <span> (showing the density of {density.points} points)</span>
+            )}
+        </Grid.Column>
+      </Grid.Row>
+      <Grid.Row columns={2}>
+        <Grid.Column>
+          <Dropdown
+            fluid search selection
+            options={fieldOptions}
+            value={x}
+            onChange={(event, { value }) => setX(value)}
+          />
+          <Checkbox
+            toggle label="Log scale"
+            checked={xLog}
+            onChange={(event, { checked }) => setXLog(checked)}
+          />
+        </Grid.Column>
+        <Grid.Column>
+          <Dropdown
+            fluid search selection
+            options={fieldOptions}
+            value={y}
+            onChange={(event, { value }) => setY(value)}
+          />
+          <Checkbox
+            toggle label="Log scale"
+            checked={yLog}
+            onChange={(event, { checked }) => setYLog(checked)}
+          />
         </Grid.Column>
       </Grid.Row>
+      {error && <Grid.Row><Message negative>{error}</Message></Grid.Row>}
       <Grid.Row>
         <Plot
-            data={[
-              {
-                x: ky,
-                y: growth_rate,
-                type: 'scatter',
-                mode: 'markers',
-              },
-            ]}
-            layout={ {xaxis: {title: {text: "ky"}}, yaxis: {title: {text: "growth rate"}}} }
+            data={[trace]}
+            layout={ {
+              xaxis: {title: {text: x}, type: xLog ? 'log' : 'linear'},
+              yaxis: {title: {text: y}, type: yLog ? 'log' : 'linear'},
+            } }
         />
        </Grid.Row>
     </Grid>
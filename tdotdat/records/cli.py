@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2022 TDoTP.
+#
+# TDotDat is free software; you can redistribute it and/or modify it under
+# the terms of the MIT License; see LICENSE file for more details.
+
+"""Command line interface for TDotDat."""
+
+import multiprocessing
+import os
+import time
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from invenio_db import db
+from invenio_records.models import RecordMetadata
+
+from .api import Record
+from .indexer import consume_bulk_queue
+from . import reindex as reindexing
+
+
+@click.group()
+def tdotdat():
+    """TDotDat management commands."""
+
+
+@tdotdat.command('consume-index-queue')
+@click.option('--batch-size', type=int, default=None,
+              help='Maximum number of records per bulk request.')
+@click.option('--max-delay', type=int, default=None,
+              help='Maximum time in milliseconds a record waits to be '
+                   'indexed.')
+@with_appcontext
+def consume_index_queue(batch_size, max_delay):
+    """Continuously index records from the bulk indexing queue."""
+    batch_size = batch_size or current_app.config['TDOTDAT_INDEXER_BATCH_SIZE']
+    max_delay = max_delay or current_app.config['TDOTDAT_INDEXER_MAX_DELAY']
+    click.secho('Indexing records from the bulk queue...', fg='green')
+    consume_bulk_queue(batch_size, max_delay / 1000)
+
+
+@tdotdat.command('backfill-equilibrium-references')
+@with_appcontext
+def backfill_equilibrium_references():
+    """Fill in the references to equilibria of existing records."""
+    count = 0
+    models = RecordMetadata.query.filter(
+        RecordMetadata.json.isnot(None)
+    ).yield_per(1000)
+    for model in models:
+        if 'equilibrium' not in model.json:
+            continue
+        Record(model.json, model=model).update_equilibrium_reference()
+        count += 1
+    db.session.commit()
+    click.secho(f'Updated references of {count} records.', fg='green')
+
+
+@tdotdat.command('reindex')
+@click.option('--pid-type', default='recid', show_default=True,
+              type=click.Choice(sorted(reindexing.INDICES)),
+              help='Type of PID of the records to reindex.')
+@click.option('--workers', type=int, default=os.cpu_count(),
+              show_default=True, help='Number of worker processes.')
+@click.option('--batch-size', type=int, default=None,
+              help='Number of records per bulk request.')
+@click.option('--refresh-interval', default='-1', show_default=True,
+              help='Refresh interval of the indices while reindexing.')
+@click.option('--checkpoint', type=click.Path(dir_okay=False), default=None,
+              help='File to keep progress in, to resume an interrupted run.')
+@click.option('--restart', is_flag=True,
+              help='Ignore the progress of any previous run.')
+@with_appcontext
+def reindex(pid_type, workers, batch_size, refresh_interval, checkpoint,
+            restart):
+    """Reindex every record, in parallel and resumably."""
+    batch_size = batch_size or current_app.config['TDOTDAT_INDEXER_BATCH_SIZE']
+    path = checkpoint or os.path.join(
+        current_app.instance_path, f'reindex-{pid_type}.json')
+
+    state = None if restart else reindexing.load_checkpoint(path)
+    if state is not None and state['pid_type'] == pid_type:
+        click.secho(f'Resuming from {path}', fg='yellow')
+    else:
+        total, ranges = reindexing.split_ranges(pid_type, max(workers, 1))
+        state = dict(
+            pid_type=pid_type,
+            total=total,
+            ranges=ranges,
+            refresh_intervals=reindexing.get_refresh_intervals(pid_type),
+        )
+    reindexing.save_checkpoint(path, state)
+    # Workers open their own connections
+    db.session.close()
+
+    started = time.monotonic()
+    indexed_before = sum(r['indexed'] for r in state['ranges'])
+
+    def report(state):
+        stats = reindexing.progress(state, started, indexed_before)
+        click.echo(
+            f"\r{stats['indexed']}/{stats['total']} records indexed, "
+            f"{stats['failed']} failed ({stats['rate']:.0f} records/s)",
+            nl=False)
+
+    reindexing.set_refresh_intervals(
+        {index: refresh_interval for index in state['refresh_intervals']})
+    try:
+        reindexing.run_workers(
+            multiprocessing.get_context('spawn'),
+            state,
+            batch_size,
+            save=lambda state: reindexing.save_checkpoint(path, state),
+            report=report,
+        )
+    finally:
+        reindexing.set_refresh_intervals(state['refresh_intervals'])
+        click.echo()
+
+    stats = reindexing.progress(state, started, indexed_before)
+    elapsed = time.monotonic() - started
+    click.secho(
+        f"Indexed {stats['indexed']} records in {elapsed:.1f}s "
+        f"({stats['rate']:.0f} records/s), {stats['failed']} failed.",
+        fg='red' if stats['failed'] else 'green')
+    os.remove(path)
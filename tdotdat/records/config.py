@@ -7,7 +7,7 @@
 
 """Default configuration."""
 
-from invenio_indexer.api import RecordIndexer
+from invenio_indexer.api import BulkRecordIndexer
 from invenio_records_rest.facets import terms_filter
 from invenio_records_rest.utils import allow_all, check_search, deny_all
 from invenio_search import RecordsSearch
@@ -29,8 +29,9 @@ RECORDS_REST_ENDPOINTS = {
         default_endpoint_prefix=True,
         record_class=Record,
         search_class=RecordsSearch,
-        indexer_class=RecordIndexer,
+        indexer_class=BulkRecordIndexer,
         search_index='records',
+        search_factory_imp='tdotdat.records.query:search_factory',
         record_serializers={
             'application/json': ('tdotdat.records.serializers'
                                  ':json_v1_response'),
@@ -91,6 +92,131 @@ PIDSTORE_RECID_FIELD = 'id'
 TDOTDAT_ENDPOINTS_ENABLED = True
 """Enable/disable automatic endpoint registration."""
 
+TDOTDAT_INGEST_JOB_TTL = 24 * 60 * 60
+"""Time in seconds the status of an ingestion job can be checked for."""
+
+TDOTDAT_BULK_BATCH_SIZE = 500
+"""Number of records created per transaction by the bulk create endpoint."""
+
+TDOTDAT_INDEXER_BATCH_SIZE = 500
+"""Maximum number of records indexed per bulk request by the index consumer."""
+
+TDOTDAT_INDEXER_MAX_DELAY = 1000
+"""Maximum time in milliseconds a queued record waits to be indexed."""
+
+TDOTDAT_SIDECAR_ARRAYS_ENABLED = False
+"""Store large numerical arrays as ``.npy`` files in the record's bucket."""
+
+TDOTDAT_SIDECAR_ARRAY_FIELDS = [
+    'time',
+    'model.time_interval_norm',
+    'collisions.collisionality_norm',
+]
+"""Dotted paths of the fields that may be stored as sidecar arrays."""
+
+TDOTDAT_SIDECAR_ARRAY_MIN_SIZE = 1000
+"""Smallest number of elements for an array to be stored as a sidecar."""
+
+TDOTDAT_PARSE_CACHE_DIR = None
+"""Directory for the cache of parsed simulations.
+
+Defaults to ``parse_cache`` in the instance path.
+"""
+
+TDOTDAT_PARSE_CACHE_MAX_SIZE = 1024 * 1024 * 1024
+"""Maximum total size in bytes of the cache of parsed simulations."""
+
+TDOTDAT_NUMERIC_FACETS = dict(
+    q=dict(field='flux_surface.q', interval=0.5),
+    shear=dict(field='flux_surface.magnetic_shear_r_minor', interval=0.5),
+    elongation=dict(field='flux_surface.elongation', interval=0.1),
+    temperature_gradient=dict(
+        field='species.temperature_log_gradient_norm', interval=1.0),
+    density_gradient=dict(
+        field='species.density_log_gradient_norm', interval=1.0),
+    beta=dict(
+        field='species_all.beta_reference',
+        ranges=[
+            {'to': 0.001},
+            {'from': 0.001, 'to': 0.01},
+            {'from': 0.01, 'to': 0.1},
+            {'from': 0.1},
+        ]),
+)
+"""Numeric facets added to the records search.
+
+Maps facet names to the ``field`` to facet on, and either the ``interval`` of
+histogram buckets, or explicit ``ranges`` as for a range aggregation. See
+:func:`tdotdat.records.facets.numeric_facets`.
+"""
+
+TDOTDAT_SIMILARITY_PARAMETERS = [
+    dict(path='flux_surface.q', centre=2.0, scale=1.0),
+    dict(path='flux_surface.magnetic_shear_r_minor', centre=1.0, scale=1.0),
+    dict(path='flux_surface.elongation', centre=1.5, scale=0.3),
+    dict(path='flux_surface.triangularity_upper', centre=0.2, scale=0.2),
+    dict(path='species.0.temperature_log_gradient_norm', centre=3.0,
+         scale=2.0),
+    dict(path='species.0.density_log_gradient_norm', centre=1.0, scale=1.0),
+    dict(path='species_all.beta_reference', log=True, floor=1e-4,
+         centre=-2.0, scale=1.0),
+    dict(path='collisions.collisionality_norm.0', log=True, floor=1e-4,
+         centre=-2.0, scale=1.0),
+]
+"""Input parameters used to find similar records.
+
+In order: q, magnetic shear, elongation, triangularity, and a/LT and a/Ln of
+the first species, beta and collisionality, which are compared on a log
+scale. Each is normalised as ``(value - centre) / scale``. The number of
+parameters must match the ``dimension`` of ``parameter_vector`` in the records
+mapping.
+"""
+
+TDOTDAT_SIMILAR_MAX_RESULTS = 100
+"""Maximum number of neighbours returned by the similar records endpoint."""
+
+TDOTDAT_CURSOR_KEEP_ALIVE = '1m'
+"""How long to keep points in time open between pages of cursor pagination.
+
+Each page extends it again. If ``None``, cursors only use ``search_after``, so
+a walk through the results may miss or repeat records that change during it.
+Points in time need OpenSearch 2.4 or later.
+"""
+
+TDOTDAT_EXPORT_BATCH_SIZE = 500
+"""Number of records fetched per scroll request when exporting, and rows per
+row group of Parquet exports."""
+
+TDOTDAT_DOWNLOAD_BATCH_SIZE = 50
+"""Number of records loaded at once when downloading multiple records."""
+
+TDOTDAT_ARCHIVE_CHUNK_SIZE = 1024 * 1024
+"""Size in bytes of the chunks files are read in when archiving records."""
+
+TDOTDAT_EQUILIBRIUM_CACHE_TTL = 60 * 60
+"""Time in seconds resolved equilibria are cached for."""
+
+TDOTDAT_FILES_UPDATE_DELAY = 5
+"""Time in seconds to wait after a file is uploaded to or deleted from a
+bucket before updating the files of its record. Other changes to the bucket
+in the meantime are included in the same update."""
+
+TDOTDAT_PLOT_MAX_POINTS = 50000
+"""Maximum number of points sent to the plot page. Above this, a random
+sample of the points is sent instead, and the plot page switches to a 2D
+histogram."""
+
+TDOTDAT_PLOT_MAX_BINS = 500
+"""Maximum number of bins along each axis of 2D histograms on the plot
+page."""
+
+TDOTDAT_PLOT_CACHE_TTL = 5 * 60
+"""Time in seconds the columns binned for 2D histograms are cached for."""
+
+TDOTDAT_PLOT_CACHE_MAX_POINTS = 2 * 10**6
+"""Most points whose columns are cached for 2D histograms. Each point takes 8
+bytes in the cache."""
+
 
 RECORDS_REST_FACETS = dict(
     records=dict(
@@ -106,7 +232,19 @@ RECORDS_REST_FACETS = dict(
             keywords=terms_filter('keywords'),
             converged=terms_filter("converged"),
         )
-    )
+    ),
+    eigenmodes=dict(
+        aggs=dict(
+            nonlinear=dict(terms=dict(field='non_linear_run')),
+            software={"terms": {"field": "software"}},
+            converged={"terms": {"field": "converged"}},
+        ),
+        post_filters=dict(
+            nonlinear=terms_filter('non_linear_run'),
+            software=terms_filter("software"),
+            converged=terms_filter("converged"),
+        )
+    ),
 )
 """Introduce searching facets."""
 
@@ -125,7 +263,45 @@ RECORDS_REST_SORT_OPTIONS = dict(
             default_order='asc',
             order=2,
         ),
-    )
+        maxgrowthrate=dict(
+            title=_('Maximum growth rate'),
+            fields=['-summary.max_growth_rate'],
+            default_order='asc',
+            order=3,
+        ),
+        kyatmaxgrowthrate=dict(
+            title=_('ky at maximum growth rate'),
+            fields=['summary.ky_at_max_growth_rate'],
+            default_order='asc',
+            order=4,
+        ),
+        numwavevectors=dict(
+            title=_('Number of wavevectors'),
+            fields=['-summary.num_wavevectors'],
+            default_order='asc',
+            order=5,
+        ),
+    ),
+    eigenmodes=dict(
+        growthrate=dict(
+            title=_('Growth rate'),
+            fields=['-growth_rate'],
+            default_order='asc',
+            order=1,
+        ),
+        ky=dict(
+            title=_('ky'),
+            fields=['ky'],
+            default_order='asc',
+            order=2,
+        ),
+        frequency=dict(
+            title=_('Frequency'),
+            fields=['frequency'],
+            default_order='asc',
+            order=3,
+        ),
+    ),
 )
 """Setup sorting options."""
 
@@ -134,7 +310,11 @@ RECORDS_REST_DEFAULT_SORT = dict(
     records=dict(
         query='bestmatch',
         noquery='mostrecent',
-    )
+    ),
+    eigenmodes=dict(
+        query='growthrate',
+        noquery='growthrate',
+    ),
 )
 """Set default sorting options."""
 
@@ -148,3 +328,7 @@ RECORDS_FILES_REST_ENDPOINTS = {
 FILES_REST_PERMISSION_FACTORY = \
     'tdotdat.records.permissions:files_permission_factory'
 """Files-REST permissions factory."""
+
+TDOTDAT_STATS_PERMISSION_FACTORY = \
+    'tdotdat.records.permissions:stats_permission_factory'
+"""Permissions factory for ``/api/records/stats``. Only admins by default."""
@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2022 TDoTP.
+#
+# TDotDat is free software; you can redistribute it and/or modify it under
+# the terms of the MIT License; see LICENSE file for more details.
+
+"""Cursor pagination of search results.
+
+Paging with ``page`` gets slower the deeper it goes, and stops at the
+endpoint's ``max_result_window``. Passing ``cursor`` instead (empty for the
+first page) pages with ``search_after``: the ``next`` link of each page holds
+an opaque token with the sort values of its last hit, so every page costs the
+same. The walk also uses a point in time, kept open for
+``TDOTDAT_CURSOR_KEEP_ALIVE``, so it sees a consistent snapshot even while
+records are being added.
+"""
+
+import base64
+import binascii
+import json
+
+from flask import current_app, has_request_context, request, url_for
+from invenio_rest.errors import FieldError, RESTValidationError
+from invenio_search import current_search_client
+
+#: Unique field added to the sort, so hits with equal sort values have a
+#: stable order.
+TIEBREAKER = "id"
+
+
+def encode_cursor(data):
+    """Opaque token for a cursor."""
+    token = base64.urlsafe_b64encode(json.dumps(data).encode("utf-8"))
+    return token.decode("ascii")
+
+
+def decode_cursor(token):
+    """Cursor from a token made by :func:`encode_cursor`."""
+    try:
+        data = json.loads(base64.urlsafe_b64decode(token.encode("ascii")))
+    except (ValueError, binascii.Error):
+        data = None
+    if not isinstance(data, dict):
+        raise RESTValidationError(
+            errors=[FieldError("cursor", "Invalid cursor.")]
+        )
+    return data
+
+
+def requested_cursor():
+    """Cursor given with the ``cursor`` query parameter.
+
+    :returns: The decoded cursor, an empty dict for the first page, or
+        ``None`` if not using cursor pagination.
+    """
+    if not has_request_context() or "cursor" not in request.values:
+        return None
+    token = request.values["cursor"]
+    return decode_cursor(token) if token else {}
+
+
+def apply_cursor(search, cursor):
+    """Restrict ``search`` to the page after ``cursor``."""
+    sort = list(search._sort) or ["_score"]
+    if TIEBREAKER not in sort and {TIEBREAKER: "asc"} not in sort:
+        sort.append({TIEBREAKER: "asc"})
+    search = search.sort(*sort).extra(from_=0)
+
+    if cursor.get("after"):
+        search = search.extra(search_after=cursor["after"])
+
+    keep_alive = current_app.config["TDOTDAT_CURSOR_KEEP_ALIVE"]
+    if keep_alive:
+        pit_id = cursor.get("pit")
+        if pit_id is None:
+            pit_id = current_search_client.create_pit(
+                index=",".join(search._index), keep_alive=keep_alive
+            )["pit_id"]
+        # Searches in a point in time can't name indices or set a preference
+        search._params.pop("preference", None)
+        search = search.index().extra(pit=dict(id=pit_id, keep_alive=keep_alive))
+    return search
+
+
+def cursor_links(search_result):
+    """Links of a page of results fetched with :func:`apply_cursor`."""
+    args = request.args.copy()
+    args.pop("page", None)
+
+    def link(**kwargs):
+        for key, value in kwargs.items():
+            args[key] = value
+        return url_for(
+            request.endpoint,
+            _external=True,
+            **request.view_args,
+            **args.to_dict(flat=False),
+        )
+
+    links = dict(self=link())
+    hits = search_result["hits"]["hits"]
+    default_size = current_app.config.get("RECORDS_REST_DEFAULT_RESULTS_SIZE", 10)
+    size = request.values.get("size", default_size, type=int)
+    if hits and len(hits) >= size:
+        cursor = dict(after=hits[-1]["sort"])
+        if "pit_id" in search_result:
+            cursor["pit"] = search_result["pit_id"]
+        links["next"] = link(cursor=encode_cursor(cursor))
+    return links
@@ -0,0 +1,181 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2022 TDoTP.
+#
+# TDotDat is free software; you can redistribute it and/or modify it under
+# the terms of the MIT License; see LICENSE file for more details.
+
+"""Secondary search index with one document per eigenmode.
+
+In the ``records`` index the eigenmodes of a record are flattened together,
+so a query can't ask for a ky and a growth rate *of the same eigenmode*. The
+``eigenmodes`` index has a document for each (record, wavevector, eigenmode),
+carrying the key input parameters of its record. The documents are indexed
+in the same bulk requests as their record, see
+:class:`tdotdat.records.indexer.TDotDatIndexer`, and deleted with it.
+"""
+
+from invenio_search import RecordsSearch, current_search_client
+from invenio_search.utils import build_alias_name
+
+from .api import Record
+
+#: Alias of the eigenmodes index.
+EIGENMODES_INDEX = "eigenmodes"
+
+#: Index of the records whose eigenmodes are indexed.
+RECORDS_INDEX = "records-record-v1.0.0"
+
+#: Most records whose old eigenmodes are deleted by a single query.
+MAX_DELETE_CLAUSES = 500
+
+
+class EigenmodeSearch(RecordsSearch):
+    """Search class for the eigenmodes index."""
+
+    class Meta:
+        """Configuration for the search."""
+
+        index = EIGENMODES_INDEX
+        doc_types = None
+        fields = ("*",)
+        facets = {}
+
+
+def _record_parameters(json):
+    """Key input parameters of a record, shared by all its eigenmodes."""
+    flux_surface = json.get("flux_surface") or {}
+    species_all = json.get("species_all") or {}
+    model = json.get("model") or {}
+    return dict(
+        record_id=json.get("id"),
+        title=json.get("title"),
+        software=(json.get("software") or {}).get("name"),
+        converged=json.get("converged"),
+        non_linear_run=model.get("non_linear_run"),
+        q=flux_surface.get("q"),
+        magnetic_shear_r_minor=flux_surface.get("magnetic_shear_r_minor"),
+        elongation=flux_surface.get("elongation"),
+        triangularity_upper=flux_surface.get("triangularity_upper"),
+        triangularity_lower=flux_surface.get("triangularity_lower"),
+        r_minor_norm=flux_surface.get("r_minor_norm"),
+        beta_reference=species_all.get("beta_reference"),
+        species=[
+            dict(
+                charge_norm=s.get("charge_norm"),
+                mass_norm=s.get("mass_norm"),
+                temperature_log_gradient_norm=s.get(
+                    "temperature_log_gradient_norm"),
+                density_log_gradient_norm=s.get("density_log_gradient_norm"),
+            )
+            for s in json.get("species") or []
+        ],
+    )
+
+
+def eigenmode_documents(record_uuid, json, revision_id=0):
+    """Documents for every eigenmode of a record, by document ID."""
+    parameters = _record_parameters(json)
+    parameters["record_uuid"] = str(record_uuid)
+    parameters["record_revision"] = revision_id
+
+    documents = {}
+    for w, wavevector in enumerate(json.get("wavevector") or []):
+        for e, eigenmode in enumerate(wavevector.get("eigenmode") or []):
+            documents[f"{record_uuid}-{w}-{e}"] = dict(
+                parameters,
+                wavevector_index=w,
+                eigenmode_index=e,
+                ky=wavevector.get("binormal_component_norm"),
+                kx=wavevector.get("radial_component_norm"),
+                poloidal_turns=wavevector.get("poloidal_turns"),
+                growth_rate=eigenmode.get("growth_rate_norm"),
+                frequency=eigenmode.get("frequency_norm"),
+            )
+    return documents
+
+
+def eigenmode_actions(record_uuid, json, revision_id, version_type):
+    """Bulk actions indexing the eigenmodes of a record.
+
+    :param json: The record's document in the records index.
+    :param version_type: Version type of the record's own action.
+    """
+    index = build_alias_name(EIGENMODES_INDEX)
+    return [
+        dict(
+            _op_type="index",
+            _index=index,
+            _id=doc_id,
+            _version=revision_id,
+            _version_type=version_type,
+            _source=doc,
+        )
+        for doc_id, doc in eigenmode_documents(
+            record_uuid, json, revision_id
+        ).items()
+    ]
+
+
+def stale_eigenmodes_query(revisions):
+    """Query for eigenmodes indexed from older revisions of records.
+
+    :param revisions: Dict of the current revision of each record, by UUID.
+    """
+    return {
+        "query": {
+            "bool": {
+                "should": [
+                    {
+                        "bool": {
+                            "filter": [
+                                {"term": {"record_uuid": str(record_uuid)}}
+                            ],
+                            # Also matches documents without a revision
+                            "must_not": [
+                                {"range": {"record_revision": {"gte": revision}}}
+                            ],
+                        }
+                    }
+                    for record_uuid, revision in revisions.items()
+                ],
+                "minimum_should_match": 1,
+            }
+        }
+    }
+
+
+def delete_stale_eigenmodes(revisions):
+    """Delete eigenmodes indexed from older revisions of records.
+
+    One query deletes those of up to :data:`MAX_DELETE_CLAUSES` records.
+
+    :param revisions: Dict of the current revision of each record, by UUID.
+    """
+    items = list(revisions.items())
+    for start in range(0, len(items), MAX_DELETE_CLAUSES):
+        current_search_client.delete_by_query(
+            index=build_alias_name(EIGENMODES_INDEX),
+            body=stale_eigenmodes_query(
+                dict(items[start:start + MAX_DELETE_CLAUSES])
+            ),
+            conflicts="proceed",
+        )
+
+
+def delete_eigenmodes(record_uuid):
+    """Delete the eigenmodes of a record."""
+    current_search_client.delete_by_query(
+        index=build_alias_name(EIGENMODES_INDEX),
+        body={"query": {"term": {"record_uuid": str(record_uuid)}}},
+        conflicts="proceed",
+    )
+
+
+def record_delete_receiver(sender, record=None, **kwargs):
+    """Remove a record's eigenmodes when it is deleted.
+
+    Deleting other kinds of records, e.g. equilibria, is ignored.
+    """
+    if isinstance(record, Record):
+        delete_eigenmodes(record.id)
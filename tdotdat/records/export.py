@@ -0,0 +1,222 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2022 TDoTP.
+#
+# TDotDat is free software; you can redistribute it and/or modify it under
+# the terms of the MIT License; see LICENSE file for more details.
+
+"""Export of search results as NDJSON, CSV or Parquet.
+
+Results are scrolled from the search engine in batches and written out one
+record (or, for Parquet, one row group) at a time, so exports of the whole
+database don't need to fit in memory. For the tabular formats, nested fields
+are flattened into columns with the same dotted names as on the reference
+page. Fields inside lists, such as ``species.charge_norm``, hold a JSON list
+with a value for each item.
+"""
+
+import copy
+import csv
+import io
+import json
+
+from invenio_jsonschemas import current_jsonschemas
+from invenio_pidstore.fetchers import recid_fetcher
+from invenio_search import current_search_client
+from invenio_search.engine import search as search_engine
+
+from .api import Record
+from .serializers import json_v1
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+#: Properties of the record schema that aren't shown or exported.
+HIDDEN_PROPERTIES = ("$schema", "_bucket", "_files")
+
+#: Arrow types of the JSON schema scalar types.
+ARROW_TYPES = {
+    "number": "float64",
+    "integer": "int64",
+    "boolean": "bool_",
+    "string": "string",
+}
+
+
+def flatten_schema(properties, parent=None, in_array=False):
+    """Flatten the properties of a JSON schema into dotted names.
+
+    :returns: Dict of names to dicts with the ``type`` and ``description`` of
+        the field, and whether it's ``in_array``, i.e. has a list anywhere on
+        its path.
+    """
+    result = {}
+    for key, value in properties.items():
+        name = f"{parent}.{key}" if parent else key
+        result[name] = {
+            "type": value["type"],
+            "description": value.get("description", ""),
+            "in_array": in_array,
+        }
+        result.update(flatten_schema(value.get("properties", {}), name, in_array))
+        result.update(
+            flatten_schema(
+                value.get("items", {}).get("properties", {}), name, in_array=True
+            )
+        )
+    return result
+
+
+def record_fields():
+    """Flattened fields of the record schema."""
+    properties = copy.deepcopy(current_jsonschemas.get_schema(Record._schema))[
+        "properties"
+    ]
+    for key in HIDDEN_PROPERTIES:
+        del properties[key]
+    return flatten_schema(properties)
+
+
+def columns(fields, requested=None):
+    """Names of the fields holding values rather than other fields.
+
+    :param fields: Flattened fields from :func:`record_fields`.
+    :param requested: If given, only include fields under these paths.
+    """
+    parents = {name.rsplit(".", 1)[0] for name in fields if "." in name}
+    return [
+        name
+        for name in fields
+        if name not in parents
+        and (
+            requested is None
+            or any(name == path or name.startswith(f"{path}.") for path in requested)
+        )
+    ]
+
+
+def _lookup(data, parts):
+    """Value at a path in nested data, with a list for each list on the path."""
+    for i, part in enumerate(parts):
+        if isinstance(data, list):
+            return [_lookup(item, parts[i:]) for item in data]
+        if not isinstance(data, dict):
+            return None
+        data = data.get(part)
+    return data
+
+
+def flatten_record(metadata, names):
+    """Row of values of a record's metadata for the given columns."""
+    row = {}
+    for name in names:
+        value = _lookup(metadata, name.split("."))
+        if isinstance(value, (list, dict)):
+            value = json.dumps(value)
+        row[name] = value
+    return row
+
+
+def scan_metadata(search, batch_size):
+    """Metadata of every record matching ``search``, as it would be dumped by
+    the REST API.
+    """
+    hits = search_engine.helpers.scan(
+        current_search_client,
+        query=search.to_dict(),
+        index=",".join(search._index),
+        size=batch_size,
+        version=True,
+    )
+    for hit in hits:
+        pid = recid_fetcher(hit["_id"], hit["_source"])
+        yield json_v1.transform_search_hit(pid, hit)["metadata"]
+
+
+def export_ndjson(records):
+    """Write records as newline-delimited JSON."""
+    for metadata in records:
+        yield json.dumps(metadata) + "\n"
+
+
+def export_csv(records, names):
+    """Write records as CSV, with a column for each name."""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=names)
+    writer.writeheader()
+    for metadata in records:
+        writer.writerow(flatten_record(metadata, names))
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue()
+
+
+def _arrow_type(field):
+    if field["in_array"] or field["type"] not in ARROW_TYPES:
+        return pyarrow.string()
+    return getattr(pyarrow, ARROW_TYPES[field["type"]])()
+
+
+def parquet_schema(fields, names):
+    """Arrow schema for the given columns.
+
+    Fields inside lists are stored as JSON strings, as for CSV.
+    """
+    return pyarrow.schema([(name, _arrow_type(fields[name])) for name in names])
+
+
+class StreamSink(io.RawIOBase):
+    """Write-only file that hands out what was written to it.
+
+    Keeps track of the total written, as the Parquet writer uses the position
+    to record where each column chunk starts.
+    """
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def drain(self):
+        """Remove and return everything written so far."""
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def export_parquet(records, fields, names, row_group_size):
+    """Write records as Parquet, one row group at a time."""
+    schema = parquet_schema(fields, names)
+    sink = StreamSink()
+
+    def write(rows):
+        table = pyarrow.Table.from_pylist(rows, schema=schema)
+        writer.write_table(table, row_group_size=row_group_size)
+
+    with pyarrow.parquet.ParquetWriter(
+        pyarrow.PythonFile(sink, mode="w"), schema
+    ) as writer:
+        rows = []
+        for metadata in records:
+            rows.append(flatten_record(metadata, names))
+            if len(rows) >= row_group_size:
+                write(rows)
+                rows = []
+                yield sink.drain()
+        if rows:
+            write(rows)
+    yield sink.drain()
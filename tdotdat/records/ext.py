@@ -7,10 +7,16 @@
 
 """Flask extension for TDotDat."""
 
+import os
+
 from invenio_files_rest.signals import file_deleted, file_uploaded
 from invenio_indexer.signals import before_record_index
+from invenio_records.signals import after_record_delete
 
-from . import config, indexer
+from . import config, eigenmodes, indexer
+from .facets import numeric_facets
+from .files import deduplicate_uploaded_file
+from .parse_cache import ParseCache
 from .tasks import update_record_files_async
 
 
@@ -26,6 +32,10 @@ class TDotDat(object):
         """Flask application initialization."""
         self.init_config(app)
         app.extensions['tdotdat'] = self
+        self.parse_cache = ParseCache(
+            app.config['TDOTDAT_PARSE_CACHE_DIR'] or
+            os.path.join(app.instance_path, 'parse_cache'),
+            app.config['TDOTDAT_PARSE_CACHE_MAX_SIZE'])
         self._register_signals(app)
 
     def init_config(self, app):
@@ -55,12 +65,33 @@ class TDotDat(object):
                         app.config.setdefault(n, {})
                         app.config[n].update(getattr(config, k))
 
+        facets = app.config.get('RECORDS_REST_FACETS', {}).get('records')
+        if with_endpoints and facets is not None:
+            # Copy rather than update, as the dicts are shared with the config
+            # module
+            aggs, post_filters = numeric_facets(
+                app.config['TDOTDAT_NUMERIC_FACETS'])
+            app.config['RECORDS_REST_FACETS']['records'] = dict(
+                facets,
+                aggs=dict(facets.get('aggs', {}), **aggs),
+                post_filters=dict(facets.get('post_filters', {}),
+                                  **post_filters))
+
     def _register_signals(self, app):
         """Register signals."""
         before_record_index.dynamic_connect(
             indexer.indexer_receiver,
             sender=app,
             index="records-record-v1.0.0")
+        before_record_index.dynamic_connect(
+            indexer.equilibrium_receiver,
+            sender=app,
+            index="equilibrium-equilibrium-v1.0.0")
+        after_record_delete.connect(
+            eigenmodes.record_delete_receiver, weak=False)
 
+        # Deduplicate before the record's files are dumped, so they see the
+        # final file IDs
+        file_uploaded.connect(deduplicate_uploaded_file, weak=False)
         file_deleted.connect(update_record_files_async, weak=False)
         file_uploaded.connect(update_record_files_async, weak=False)
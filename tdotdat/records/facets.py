@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2022 TDoTP.
+#
+# TDotDat is free software; you can redistribute it and/or modify it under
+# the terms of the MIT License; see LICENSE file for more details.
+
+"""Numeric facets on physics parameters.
+
+Each facet is either a histogram with a fixed bucket width, or a set of
+explicit ranges, together with a post-filter on the same field. The filter
+takes ranges written ``"<start>--<end>"`` as for invenio's ``range_filter``
+(either end may be left empty, or prefixed with ``>``/``<`` to exclude it), or
+the key of a histogram bucket, which selects that bucket.
+
+Filters are wrapped in a ``bool`` filter clause so OpenSearch can cache them,
+and bucket keys are aligned to the histogram, so the same few ranges keep
+being reused.
+"""
+
+from invenio_records_rest.facets import range_filter as _range_filter
+from invenio_rest.errors import FieldError, RESTValidationError
+from invenio_search.engine import dsl
+
+
+def range_filter(field, interval=None):
+    """Create a cacheable range filter.
+
+    :param field: Field name.
+    :param interval: Width of the histogram buckets on ``field``, if values
+        may be bucket keys.
+    :returns: Function that returns the filter query.
+    """
+    parse = _range_filter(field)
+
+    def bucket(value):
+        try:
+            start = float(value)
+        except ValueError:
+            raise RESTValidationError(
+                errors=[FieldError(field, "Invalid range format.")]
+            )
+        return dsl.Q("range", **{field: dict(gte=start, lt=start + interval)})
+
+    def inner(values):
+        queries = [
+            bucket(value)
+            if interval is not None and "--" not in value
+            else parse([value])
+            for value in values
+        ]
+        if len(queries) == 1:
+            return dsl.Q("bool", filter=queries)
+        return dsl.Q(
+            "bool",
+            filter=[dsl.Q("bool", should=queries, minimum_should_match=1)],
+        )
+
+    return inner
+
+
+def _range_key(bounds):
+    """Filter value selecting one bucket of a range aggregation."""
+    start = bounds.get("from", "")
+    end = bounds.get("to")
+    return f"{start}--" + ("" if end is None else f"<{end}")
+
+
+def numeric_facets(definitions):
+    """Aggregations and post-filters for numeric facets.
+
+    :param definitions: Dict of facet names to dicts with the ``field`` to
+        facet on, and either the ``interval`` of a histogram, or a list of
+        ``ranges`` as for a range aggregation, e.g. ``[{"to": 1}, {"from":
+        1}]``.
+    :returns: Tuple of dicts of aggregations and post-filters, for
+        ``RECORDS_REST_FACETS``.
+    """
+    aggs = {}
+    post_filters = {}
+    for name, definition in definitions.items():
+        field = definition["field"]
+        if "ranges" in definition:
+            aggs[name] = dict(
+                range=dict(
+                    field=field,
+                    ranges=[
+                        dict(bounds, key=_range_key(bounds))
+                        for bounds in definition["ranges"]
+                    ],
+                )
+            )
+            post_filters[name] = range_filter(field)
+        else:
+            aggs[name] = dict(
+                histogram=dict(
+                    field=field, interval=definition["interval"], min_doc_count=1
+                )
+            )
+            post_filters[name] = range_filter(field, definition["interval"])
+    return aggs, post_filters
@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2022 TDoTP.
+#
+# TDotDat is free software; you can redistribute it and/or modify it under
+# the terms of the MIT License; see LICENSE file for more details.
+
+"""Content-addressed storage of uploaded files.
+
+Many simulations share identical input and equilibrium files. Files are
+identified by their checksum, and an object whose contents already exist is
+pointed at the existing ``FileInstance`` instead of keeping another copy.
+"""
+
+import hashlib
+
+from flask import current_app
+from invenio_db import db
+from invenio_files_rest.models import FileInstance, ObjectVersion
+from invenio_files_rest.proxies import current_permission_factory
+
+from .tasks import remove_unused_file
+
+
+def find_file_instance(checksum, size=None, exclude=None):
+    """Find a readable file with the given checksum.
+
+    :param checksum: Checksum of the file, e.g. ``"md5:1234abcd..."``.
+    :param size: If given, size in bytes the file must have.
+    :param exclude: If given, ID of a file to ignore.
+    :returns: The oldest matching ``FileInstance``, or ``None``.
+    """
+    query = FileInstance.query.filter_by(checksum=checksum, readable=True)
+    if size is not None:
+        query = query.filter_by(size=size)
+    if exclude is not None:
+        query = query.filter(FileInstance.id != exclude)
+    return query.order_by(FileInstance.created).first()
+
+
+def find_readable_file_instance(checksum):
+    """Find a file with the given checksum that the current user can read.
+
+    Knowing a checksum mustn't be enough to get a copy of a file, so the file
+    is only returned if the user can read one of the objects pointing at it.
+    """
+    file_instance = find_file_instance(checksum)
+    if file_instance is None:
+        return None
+    objects = ObjectVersion.query.filter_by(file_id=file_instance.id)
+    if any(current_permission_factory(obj, "object-read").can() for obj in objects):
+        return file_instance
+    return None
+
+
+def link_object(bucket, key, file_instance):
+    """Create an object in ``bucket`` pointing at an existing file."""
+    return ObjectVersion.create(bucket, key, _file_id=file_instance.id)
+
+
+def deduplicate_object(obj):
+    """Point ``obj`` at an existing file with the same contents, if any.
+
+    The caller is responsible for committing the session and then removing
+    the file that is no longer used with
+    :func:`~tdotdat.records.tasks.remove_unused_file`.
+
+    :returns: ID of the file ``obj`` used to point at, or ``None`` if there
+        was no duplicate.
+    """
+    if obj.file is None or obj.file.checksum is None:
+        return None
+
+    existing = find_file_instance(
+        obj.file.checksum, size=obj.file.size, exclude=obj.file_id
+    )
+    if existing is None:
+        return None
+
+    orphan_id = obj.file_id
+    with db.session.begin_nested():
+        obj.file = existing
+        db.session.add(obj)
+    return orphan_id
+
+
+def stream_checksum(stream, chunk_size=1024 * 1024):
+    """Checksum and size of a seekable stream, leaving its position alone."""
+    md5 = hashlib.md5()
+    size = 0
+    start = stream.tell()
+    while chunk := stream.read(chunk_size):
+        md5.update(chunk)
+        size += len(chunk)
+    stream.seek(start)
+    return f"md5:{md5.hexdigest()}", size
+
+
+def create_object(bucket, key, stream):
+    """Store ``stream`` in ``bucket``, reusing an identical file if possible.
+
+    If the stream is seekable, e.g. a file uploaded through a form, its
+    checksum is computed first, so a duplicate is never stored. Otherwise the
+    contents have to be stored to compute their checksum, and any duplicate
+    is removed afterwards.
+
+    The caller is responsible for committing the session, and then passing
+    the IDs of the duplicates to :func:`remove_unused_files`.
+
+    :returns: Tuple of the new ``ObjectVersion``, and the ID of the duplicate
+        file it no longer uses, or ``None``.
+    """
+    if getattr(stream, "seekable", lambda: False)():
+        existing = find_file_instance(*stream_checksum(stream))
+        if existing is not None:
+            return link_object(bucket, key, existing), None
+
+    obj = ObjectVersion.create(bucket, key, stream=stream)
+    return obj, deduplicate_object(obj)
+
+
+def remove_unused_files(file_ids):
+    """Remove the duplicate files left by :func:`deduplicate_object` or
+    :func:`create_object`, once the session using them has been committed.
+
+    :param file_ids: IDs of the files, ignoring any ``None``.
+    """
+    for file_id in file_ids:
+        if file_id is not None:
+            remove_unused_file.delay(str(file_id))
+
+
+def deduplicate_uploaded_file(sender, obj):
+    """Signal receiver deduplicating files uploaded through the REST API."""
+    try:
+        orphan_id = deduplicate_object(obj)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        current_app.logger.exception(
+            "Failed to deduplicate {0}.".format(obj.key), extra={"obj": obj}
+        )
+        return
+    remove_unused_files([orphan_id])
@@ -7,10 +7,301 @@
 
 """Indexer for TDotDat."""
 
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+import numpy as np
+from celery import current_app as current_celery_app
+from flask import current_app, g
+from invenio_cache import current_cache
+from invenio_indexer.api import RecordIndexer
+from invenio_pidstore.errors import PersistentIdentifierError
+from invenio_records.models import RecordMetadata
+from invenio_search.engine import search
+from invenio_search.utils import build_alias_name
+from kombu.compat import Consumer
+
+from . import eigenmodes
+from .api import records_using_equilibrium
+from .jsonresolvers import forget_equilibrium, record_jsonresolver
+from .similarity import VECTOR_FIELD, parameter_vector
+
+
+@contextmanager
+def full_reindex():
+    """Suppress the side effects of indexing while reindexing every record.
+
+    Indexing an equilibrium normally queues the records using it to be
+    indexed again, and indexing an updated record deletes its old
+    eigenmodes. Neither is needed when every record is reindexed as it is.
+    The flag is kept in the application context.
+    """
+    previous = g.get('tdotdat_full_reindex', False)
+    g.tdotdat_full_reindex = True
+    try:
+        yield
+    finally:
+        g.tdotdat_full_reindex = previous
+
+
+def in_full_reindex():
+    """Whether records are being indexed by :func:`full_reindex`."""
+    return g.get('tdotdat_full_reindex', False)
+
 
 def indexer_receiver(sender, arguments=None, json=None, record=None,
                      index=None, doc_type=None):
-    """Move _files key to files."""
+    """Move _files key to files, copy fields of the equilibrium, and add
+    summary quantities."""
     if '_files' in json:
         json['files'] = json['_files']
         del json['_files']
+
+    ref = (json.get('equilibrium') or {}).get('$ref')
+    if ref is not None:
+        try:
+            json['equilibrium_fields'] = equilibrium_fields(ref)
+        except PersistentIdentifierError:
+            current_app.logger.warning(
+                'Equilibrium {0} of record {1} not found.'.format(
+                    ref, json.get('id')))
+
+    json['summary'] = summarise(json)
+
+    vector = parameter_vector(
+        json, current_app.config['TDOTDAT_SIMILARITY_PARAMETERS'])
+    if vector is not None:
+        json[VECTOR_FIELD] = vector
+
+
+def equilibrium_fields(ref):
+    """Fields of a referenced equilibrium to copy into a record's document.
+
+    Copying its numerical fields lets records be searched by the properties
+    of their equilibrium, e.g. ``equilibrium_fields.elongation:>1.5``. They
+    are kept apart from the ``equilibrium`` reference itself, which search
+    hits return like the record does.
+    """
+    equid = ref.rstrip('/').rsplit('/', 1)[-1]
+    equilibrium = record_jsonresolver(equid)
+    fields = {
+        key: value for key, value in equilibrium.items()
+        if isinstance(value, (int, float)) and not isinstance(value, bool)
+    }
+    fields.update(id=equid, title=equilibrium.get('title'))
+    return fields
+
+
+def equilibrium_receiver(sender, json=None, record=None, **kwargs):
+    """Reindex the records using an equilibrium when it's reindexed.
+
+    Equilibria are indexed after any change is committed, so their records
+    pick up the new values. Nothing is done during a :func:`full_reindex`,
+    which indexes those records anyway.
+    """
+    if in_full_reindex():
+        return
+    forget_equilibrium(json.get('id'))
+    record_ids = [
+        str(record_id)
+        for record_id, _ in records_using_equilibrium(record.id)
+    ]
+    if record_ids:
+        TDotDatIndexer().bulk_index(record_ids)
+
+
+def _eigenmode_arrays(wavevectors):
+    """Flatten every eigenmode of every wavevector into parallel arrays."""
+    ky, growth_rate, frequency = [], [], []
+    for wavevector in wavevectors:
+        for eigenmode in wavevector.get('eigenmode') or []:
+            ky.append(wavevector.get('binormal_component_norm'))
+            growth_rate.append(eigenmode.get('growth_rate_norm'))
+            frequency.append(eigenmode.get('frequency_norm'))
+
+    def as_array(values):
+        return np.array([np.nan if v is None else v for v in values],
+                        dtype=float)
+
+    return as_array(ky), as_array(growth_rate), as_array(frequency)
+
+
+def summarise(json):
+    """Scalars derived from a record, for searching and sorting on.
+
+    Computed once at index time so that queries like "maximum growth rate"
+    don't need the full records.
+    """
+    wavevectors = json.get('wavevector') or []
+    summary = dict(
+        num_wavevectors=len(wavevectors),
+        num_eigenmodes=sum(len(w.get('eigenmode') or []) for w in wavevectors),
+        num_species=len(json.get('species') or []),
+    )
+
+    ky, growth_rate, frequency = _eigenmode_arrays(wavevectors)
+    if np.isfinite(growth_rate).any():
+        peak = np.nanargmax(growth_rate)
+        summary.update(
+            max_growth_rate=float(growth_rate[peak]),
+            ky_at_max_growth_rate=float(ky[peak])
+            if np.isfinite(ky[peak]) else None,
+            frequency_at_max_growth_rate=float(frequency[peak])
+            if np.isfinite(frequency[peak]) else None,
+        )
+    return summary
+
+
+class TDotDatIndexer(RecordIndexer):
+    """Record indexer that also indexes the eigenmodes of each record.
+
+    The eigenmode documents are sent in the same bulk requests as their
+    record, and only if the record's own document could be built. Eigenmodes
+    left over from older revisions of the records in a batch are deleted with
+    one query at the end of the batch.
+    """
+
+    def is_record_action(self, action):
+        """Whether ``action`` indexes a record with eigenmodes."""
+        return (action['_op_type'] == 'index' and action['_index'] ==
+                build_alias_name(eigenmodes.RECORDS_INDEX))
+
+    def eigenmode_actions(self, action):
+        """Bulk actions for the eigenmodes of the record of ``action``."""
+        if not self.is_record_action(action):
+            return []
+        return eigenmodes.eigenmode_actions(
+            action['_id'], action['_source'], action['_version'],
+            self._version_type)
+
+    def _actionsiter(self, message_iterator):
+        """Iterate bulk actions, followed by those of their eigenmodes."""
+        revisions = {}
+        for action in super()._actionsiter(message_iterator):
+            yield action
+            yield from self.eigenmode_actions(action)
+            # A new record can't have old eigenmodes
+            if self.is_record_action(action) and action['_version']:
+                revisions[action['_id']] = action['_version']
+        if revisions and not in_full_reindex():
+            eigenmodes.delete_stale_eigenmodes(revisions)
+
+
+#: Prefix of the indexing metrics in the application cache.
+METRICS_PREFIX = 'tdotdat:indexing:'
+
+
+def consume_bulk_queue(batch_size, max_delay, poll_interval=0.05,
+                       stop=None):
+    """Index records from the bulk indexing queue as soon as they arrive.
+
+    Messages are collected until either ``batch_size`` of them have arrived,
+    or ``max_delay`` seconds have passed since the first one, and then sent
+    to the search engine in a single bulk request.
+
+    :param batch_size: Maximum number of records per bulk request.
+    :param max_delay: Maximum time in seconds a record waits to be indexed.
+    :param poll_interval: Time in seconds to wait when the queue is empty.
+    :param stop: Called before each batch, stops consuming if it returns
+        true. By default, consumes forever.
+    """
+    indexer = TDotDatIndexer()
+    with current_celery_app.pool.acquire(block=True) as conn:
+        consumer = Consumer(
+            connection=conn,
+            queue=indexer.mq_queue.name,
+            exchange=indexer.mq_exchange.name,
+            routing_key=indexer.mq_routing_key,
+        )
+        try:
+            while not (stop and stop()):
+                batch = _collect_batch(
+                    consumer, batch_size, max_delay, poll_interval)
+                if batch:
+                    index_batch(indexer, batch)
+        finally:
+            consumer.close()
+
+
+def _collect_batch(consumer, batch_size, max_delay, poll_interval):
+    """Fetch messages until the batch is full or the oldest is too old."""
+    batch = []
+    deadline = None
+    while len(batch) < batch_size:
+        message = consumer.fetch()
+        if message is not None:
+            if not batch:
+                deadline = time.monotonic() + max_delay
+            batch.append(message)
+            continue
+
+        if not batch:
+            time.sleep(poll_interval)
+            break
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        time.sleep(min(poll_interval, remaining))
+    return batch
+
+
+def index_batch(indexer, messages):
+    """Index the records in a batch of bulk queue messages.
+
+    Every message is acknowledged, even if its record couldn't be indexed, so
+    one bad record neither blocks the queue nor stops the consumer.
+    """
+    record_ids = [message.decode()['id'] for message in messages]
+    _, failed = search.helpers.bulk(
+        indexer.client,
+        indexer._actionsiter(messages),
+        stats_only=True,
+        raise_on_error=False,
+        raise_on_exception=False,
+        request_timeout=current_app.config['INDEXER_BULK_REQUEST_TIMEOUT'],
+    )
+    if failed:
+        current_app.logger.warning(
+            'Failed to index {0} of {1} records.'.format(
+                failed, len(record_ids)))
+    record_visibility_lag(record_ids)
+
+
+def record_visibility_lag(record_ids):
+    """Record how long the records took to be indexed after their last change.
+
+    The lag is measured from the ``updated`` time in the database, which is
+    when the record was committed and queued for indexing.
+    """
+    now = datetime.utcnow()
+    updated = RecordMetadata.query.with_entities(RecordMetadata.updated) \
+        .filter(RecordMetadata.id.in_(record_ids)).all()
+    lags_ms = [int((now - u).total_seconds() * 1000) for (u, ) in updated]
+    if not lags_ms:
+        return
+
+    current_cache.inc(METRICS_PREFIX + 'indexed', len(lags_ms))
+    current_cache.inc(METRICS_PREFIX + 'total_lag_ms', sum(lags_ms))
+    current_cache.set(METRICS_PREFIX + 'last_lag_ms', max(lags_ms),
+                      timeout=0)
+    current_cache.set(METRICS_PREFIX + 'last_batch_size', len(lags_ms),
+                      timeout=0)
+    max_lag = current_cache.get(METRICS_PREFIX + 'max_lag_ms') or 0
+    current_cache.set(METRICS_PREFIX + 'max_lag_ms', max(max_lag, *lags_ms),
+                      timeout=0)
+
+
+def indexing_stats():
+    """Visibility lag of records indexed by :func:`consume_bulk_queue`."""
+    def get(name):
+        return current_cache.get(METRICS_PREFIX + name) or 0
+
+    indexed = get('indexed')
+    return dict(
+        indexed=indexed,
+        mean_lag_ms=get('total_lag_ms') / indexed if indexed else None,
+        max_lag_ms=get('max_lag_ms'),
+        last_lag_ms=get('last_lag_ms'),
+        last_batch_size=get('last_batch_size'),
+    )
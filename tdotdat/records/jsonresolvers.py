@@ -1,16 +1,114 @@
+import copy
+
 import jsonresolver
-from invenio_pidstore.resolver import Resolver
+from flask import current_app, g, has_request_context
+from invenio_cache import current_cache
+from invenio_db import db
+from invenio_jsonschemas import current_jsonschemas
+
 from tdotdat.records.api import Record
+from tdotdat.records.resolver import BulkResolver
 from ..config import JSONSCHEMAS_HOST
 
+#: Prefix of cached equilibria, and of the cache's hit/miss counters.
+CACHE_PREFIX = "tdotdat:equilibrium:"
 
-@jsonresolver.route("/api/resolver/equilibrium/<equid>", host=JSONSCHEMAS_HOST)
-def record_jsonresolver(equid):
-    """Resolve referenced equilibrium."""
+#: Schema of equilibrium records, which are cleared from the cache on change.
+EQUILIBRIUM_SCHEMA = "equilibrium/equilibrium-v1.0.0.json"
+
+#: Key in the database session's info of the equilibria changed in the
+#: current transaction.
+PENDING_KEY = "tdotdat_changed_equilibria"
+
+
+def _count(name):
+    current_cache.inc(f"{CACHE_PREFIX}stats:{name}")
+
+
+def _resolve_equilibrium(equid):
     # Setup a resolver to retrieve an equilibrium record given its id
-    resolver = Resolver(pid_type="equid", object_type="rec", getter=Record.get_record)
-    _, record = resolver.resolve(str(equid))
+    resolver = BulkResolver(
+        pid_type="equid", object_type="rec", getter=Record.get_records
+    )
+    [(_, record)] = resolver.resolve([equid])
+    record = dict(record)
     # Get rid of bits we don't want
     del record["$schema"]
     del record["_bucket"]
     return record
+
+
+@jsonresolver.route("/api/resolver/equilibrium/<equid>", host=JSONSCHEMAS_HOST)
+def record_jsonresolver(equid):
+    """Resolve referenced equilibrium.
+
+    Records on the same page often share an equilibrium, so each is only
+    resolved once per request, and is cached across requests for
+    ``TDOTDAT_EQUILIBRIUM_CACHE_TTL`` seconds, or until it is changed.
+    """
+    equid = str(equid)
+    # Outside requests, e.g. in the indexing consumer, the app context can
+    # last indefinitely
+    resolved = g.setdefault("tdotdat_equilibria", {}) if has_request_context() else {}
+    if equid in resolved:
+        _count("request_hits")
+        return copy.deepcopy(resolved[equid])
+
+    key = f"{CACHE_PREFIX}{equid}"
+    record = current_cache.get(key)
+    if record is None:
+        _count("misses")
+        record = _resolve_equilibrium(equid)
+        current_cache.set(
+            key, record, timeout=current_app.config["TDOTDAT_EQUILIBRIUM_CACHE_TTL"]
+        )
+    else:
+        _count("hits")
+
+    resolved[equid] = record
+    return copy.deepcopy(record)
+
+
+def forget_equilibrium(equid):
+    """Remove an equilibrium from the cache."""
+    equid = str(equid)
+    current_cache.delete(f"{CACHE_PREFIX}{equid}")
+    if has_request_context():
+        g.get("tdotdat_equilibria", {}).pop(equid, None)
+
+
+def invalidate_equilibrium(sender, record=None, **kwargs):
+    """Remove a changed equilibrium from the cache once the change is
+    committed.
+
+    The record signals are sent before the database transaction is
+    committed, and forgetting the equilibrium then would let a concurrent
+    request cache the old version again.
+    """
+    if record.get("$schema") == current_jsonschemas.path_to_url(EQUILIBRIUM_SCHEMA):
+        db.session.info.setdefault(PENDING_KEY, set()).add(str(record.get("id")))
+
+
+def forget_changed_equilibria(session, *args):
+    """Remove the equilibria changed in a transaction from the cache.
+
+    Listens to the end of database transactions, both committed and rolled
+    back, as forgetting an unchanged equilibrium is harmless.
+    """
+    for equid in session.info.pop(PENDING_KEY, ()):
+        forget_equilibrium(equid)
+
+
+def equilibrium_cache_stats():
+    """Hit and miss counts of resolving equilibria, across all workers.
+
+    ``request_hits`` are equilibria already resolved in the same request.
+    """
+    stats = {
+        name: current_cache.get(f"{CACHE_PREFIX}stats:{name}") or 0
+        for name in ("hits", "request_hits", "misses")
+    }
+    total = sum(stats.values())
+    hits = stats["hits"] + stats["request_hits"]
+    stats["hit_rate"] = hits / total if total else None
+    return stats
@@ -159,6 +159,29 @@ class GyrokineticsSchemaV1(StrictKeysMixin):
     wavevector = List(Nested(WavevectorSchemaV1))
 
 
+class ArraySchemaV1(StrictKeysMixin):
+    """Description of an array stored in a sidecar file."""
+
+    path = SanitizedUnicode()
+    key = SanitizedUnicode()
+    shape = List(fields.Integer())
+    dtype = SanitizedUnicode()
+    min = Number()
+    max = Number()
+    mean = Number()
+
+
+class SummarySchemaV1(StrictKeysMixin):
+    """Summary quantities computed at index time."""
+
+    max_growth_rate = Number()
+    ky_at_max_growth_rate = Number()
+    frequency_at_max_growth_rate = Number()
+    num_wavevectors = fields.Integer()
+    num_eigenmodes = fields.Integer()
+    num_species = fields.Integer()
+
+
 class InputsSchemaV1(StrictKeysMixin):
     files = fields.List(SanitizedUnicode())
     temperature = fields.Number()
@@ -193,6 +216,10 @@ class MetadataSchemaV1(StrictKeysMixin):
     converged = Boolean()
     inputs = Nested(InputsSchemaV1)
     outputs = Nested(OutputsSchemaV1)
+    arrays = List(Nested(ArraySchemaV1))
+    summary = Nested(SummarySchemaV1, dump_only=True)
+    equilibrium_id = fields.Integer(load_only=True)
+    equilibrium = fields.Dict(dump_only=True)
     _schema = GenFunction(
         attribute="$schema",
         data_key="$schema",
@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2022 TDoTP.
+#
+# TDotDat is free software; you can redistribute it and/or modify it under
+# the terms of the MIT License; see LICENSE file for more details.
+
+"""Database models for TDotDat records."""
+
+from invenio_db import db
+from invenio_records.models import RecordMetadata
+from sqlalchemy_utils.types import UUIDType
+
+
+class EquilibriumReference(db.Model):
+    """Reference from a record to the equilibrium it uses.
+
+    Kept up to date by :class:`tdotdat.records.api.Record`, so the records
+    using an equilibrium can be found without looking through the JSON of
+    every record.
+    """
+
+    __tablename__ = "tdotdat_equilibrium_reference"
+    __table_args__ = (
+        db.Index(
+            "idx_tdotdat_equilibrium_reference_equilibrium",
+            "equilibrium_id",
+            "record_id",
+        ),
+    )
+
+    record_id = db.Column(
+        UUIDType,
+        db.ForeignKey(RecordMetadata.id, ondelete="CASCADE"),
+        primary_key=True,
+    )
+    """UUID of the record."""
+
+    equilibrium_id = db.Column(
+        UUIDType,
+        db.ForeignKey(RecordMetadata.id, ondelete="CASCADE"),
+        nullable=False,
+    )
+    """UUID of the equilibrium the record uses."""
@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2022 TDoTP.
+#
+# TDotDat is free software; you can redistribute it and/or modify it under
+# the terms of the MIT License; see LICENSE file for more details.
+
+"""Cache of simulation data parsed by pyrokinetics, shared by workers.
+
+The cache itself is :class:`tdotdat.parse_cache.ParseCache`, which is also
+used by ``upload_run.py``. The server's cache counts hits and misses in the
+application cache, so they add up across every worker.
+"""
+
+from invenio_cache import current_cache
+
+from .. import parse_cache
+
+
+class ParseCache(parse_cache.ParseCache):
+    """Least recently used cache of parsed simulations, stored on disk.
+
+    :param directory: Directory to keep cache entries in.
+    :param max_size: Maximum total size of the entries, in bytes.
+    """
+
+    #: Prefix of the shared hit/miss counters in the application cache.
+    counter_prefix = "tdotdat:parse_cache:"
+
+    def count(self, hit):
+        """Count a hit or miss of :meth:`get_or_parse` across all workers."""
+        current_cache.inc(f"{self.counter_prefix}{'hits' if hit else 'misses'}")
+
+    def stats(self):
+        """Hit and miss counts across all workers, and the cache's size."""
+        sizes = [path.stat().st_size for path in self.directory.glob("*.json")]
+        return dict(
+            hits=current_cache.get(f"{self.counter_prefix}hits") or 0,
+            misses=current_cache.get(f"{self.counter_prefix}misses") or 0,
+            entries=len(sizes),
+            size=sum(sizes),
+            max_size=self.max_size,
+        )
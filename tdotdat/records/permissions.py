@@ -7,7 +7,10 @@
 
 """Permissions for TDotDat."""
 
-from invenio_access import Permission, authenticated_user
+from flask import current_app
+from invenio_access import Permission, authenticated_user, superuser_access
+from invenio_records_rest.utils import obj_or_import_string
+from invenio_records_rest.views import verify_record_permission
 
 
 def files_permission_factory(obj, action=None):
@@ -18,3 +21,19 @@ def files_permission_factory(obj, action=None):
 def authenticated_user_permission(record=None):
     """Permissions factory for checking for authenticated users"""
     return Permission(authenticated_user)
+
+
+def stats_permission_factory(record=None):
+    """Permissions factory for the operational statistics of the server"""
+    return Permission(superuser_access)
+
+
+def verify_endpoint_permission(endpoint_id, action, record=None):
+    """Check permission with the factory configured for a REST endpoint.
+
+    :param endpoint_id: Key of the endpoint in ``RECORDS_REST_ENDPOINTS``.
+    :param action: ``create``, ``read``, ``update``, ``delete`` or ``list``.
+    """
+    endpoint = current_app.config["RECORDS_REST_ENDPOINTS"][endpoint_id]
+    factory = obj_or_import_string(endpoint[f"{action}_permission_factory_imp"])
+    verify_record_permission(factory, record)
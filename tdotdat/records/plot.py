@@ -0,0 +1,235 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2022 TDoTP.
+#
+# TDotDat is free software; you can redistribute it and/or modify it under
+# the terms of the MIT License; see LICENSE file for more details.
+
+"""Columns of values to plot against each other.
+
+Rather than the browser fetching whole records a page at a time and picking
+out two numbers, the plot page asks for a pair of columns for every record
+matching a search. Only the two fields are fetched from the search engine,
+and the columns are sent back as base64-encoded little-endian float32 arrays.
+
+When more records match than can sensibly be drawn, the page asks for a 2D
+histogram of them instead, so the response only depends on the number of
+bins. Every point is binned with NumPy, from columns cached for a while so
+that changing the bins or their scales doesn't search again. Columns with too
+many points to keep in the shared cache are scanned again on every request.
+
+Fields may be inside lists, e.g. ``wavevector.eigenmode.growth_rate_norm``,
+giving a point for each item. Two fields can be plotted against each other if
+the lists holding one of them also hold the other: ``wavevector.
+binormal_component_norm`` against ``wavevector.eigenmode.growth_rate_norm``
+gives a point for each eigenmode, with the ky of its wavevector, but
+``species`` fields can't be paired with ``wavevector`` ones.
+"""
+
+import array
+import base64
+import hashlib
+import json
+import random
+import sys
+
+import numpy as np
+from invenio_cache import current_cache
+from invenio_search import current_search_client
+from invenio_search.engine import search as search_engine
+
+#: JSON schema types that can be plotted.
+NUMERIC_TYPES = ("number", "integer")
+
+#: Prefix of the cache keys of columns.
+CACHE_PREFIX = "tdotdat:plot:"
+
+#: Scales bins can be spaced on.
+SCALES = ("linear", "log")
+
+
+def numeric_fields(fields):
+    """Names of the numeric fields from :func:`.export.record_fields`."""
+    return [name for name, field in fields.items() if field["type"] in NUMERIC_TYPES]
+
+
+def list_fields(properties, name):
+    """Names of the lists that hold the field ``name``, outermost first.
+
+    :param properties: Properties of the record schema.
+    """
+    lists = []
+    path = []
+    for part in name.split("."):
+        path.append(part)
+        value = properties[part]
+        if value["type"] == "array":
+            lists.append(".".join(path))
+            value = value.get("items", {})
+        properties = value.get("properties", {})
+    return lists
+
+
+def compatible(properties, x, y):
+    """Whether the fields ``x`` and ``y`` can be paired up into points."""
+    x_lists = list_fields(properties, x)
+    y_lists = list_fields(properties, y)
+    shortest = min(len(x_lists), len(y_lists))
+    return x_lists[:shortest] == y_lists[:shortest]
+
+
+def _values(data, parts, index=()):
+    """Numeric values at a path, with the indices into the lists on the way.
+
+    :returns: Iterator of ``(index, value)`` tuples, where ``index`` is a
+        tuple with the position in each list.
+    """
+    if isinstance(data, list):
+        for i, item in enumerate(data):
+            yield from _values(item, parts, index + (i,))
+    elif not parts:
+        if isinstance(data, (int, float)) and not isinstance(data, bool):
+            yield index, data
+    elif isinstance(data, dict):
+        yield from _values(data.get(parts[0]), parts[1:], index)
+
+
+def points(source, x, y):
+    """Pairs of values of ``x`` and ``y`` in a record.
+
+    The values of the field in fewer lists are repeated for each item of the
+    lists holding the other.
+    """
+    x_values = dict(_values(source, x.split(".")))
+    y_values = dict(_values(source, y.split(".")))
+    if not x_values or not y_values:
+        return
+    x_depth = len(next(iter(x_values)))
+    y_depth = len(next(iter(y_values)))
+    if x_depth >= y_depth:
+        for index, x_value in x_values.items():
+            if (y_value := y_values.get(index[:y_depth])) is not None:
+                yield x_value, y_value
+    else:
+        for index, y_value in y_values.items():
+            if (x_value := x_values.get(index[:x_depth])) is not None:
+                yield x_value, y_value
+
+
+def _collect_points(body, index, x, y, batch_size):
+    """Scan the search ``body`` into columns of ``x`` and ``y`` values."""
+    hits = search_engine.helpers.scan(
+        current_search_client,
+        query=body,
+        index=",".join(index),
+        size=batch_size,
+    )
+    xs = array.array("f")
+    ys = array.array("f")
+    for hit in hits:
+        for x_value, y_value in points(hit["_source"], x, y):
+            xs.append(x_value)
+            ys.append(y_value)
+    return xs, ys
+
+
+def scan_points(search, x, y, max_points, batch_size):
+    """Points for every record matching ``search``, at most ``max_points``.
+
+    If more records match than ``max_points``, a random sample of them is
+    selected by the search engine, so they aren't all fetched. If there are
+    still too many points, a random sample of those is returned.
+
+    :returns: Dict with the ``x`` and ``y`` columns, the number of
+        ``records`` matching, and whether the points were ``sampled``.
+    """
+    body = search.source([x, y]).to_dict()
+    records = search.count()
+    if records > max_points:
+        # Scores from random_score are uniform in [0, 1), so this keeps
+        # roughly max_points records. The seed keeps the sample the same
+        # between requests.
+        body["query"] = dict(
+            function_score=dict(
+                query=body.get("query", dict(match_all={})),
+                random_score=dict(seed=0, field="_seq_no"),
+                boost_mode="replace",
+            )
+        )
+        body["min_score"] = 1 - max_points / records
+
+    xs, ys = _collect_points(body, search._index, x, y, batch_size)
+
+    sampled = records > max_points
+    if len(xs) > max_points:
+        keep = sorted(random.Random(0).sample(range(len(xs)), max_points))
+        xs = array.array("f", (xs[i] for i in keep))
+        ys = array.array("f", (ys[i] for i in keep))
+        sampled = True
+    return dict(x=xs, y=ys, records=records, sampled=sampled)
+
+
+def encode_column(column):
+    """Encode an array of floats as for a plotly typed array."""
+    if sys.byteorder == "big":
+        column = array.array(column.typecode, column)
+        column.byteswap()
+    return dict(dtype="f4", bdata=base64.b64encode(column.tobytes()).decode("ascii"))
+
+
+def cached_columns(search, x, y, batch_size, timeout, max_points):
+    """Columns of every point matching ``search``, cached for ``timeout``
+    seconds if there are at most ``max_points`` of them.
+
+    :returns: Tuple of NumPy arrays of ``x`` and ``y`` values.
+    """
+    body = search.source([x, y]).to_dict()
+    digest = hashlib.sha1(
+        json.dumps([body, search._index, x, y], sort_keys=True).encode("utf-8")
+    ).hexdigest()
+    key = f"{CACHE_PREFIX}{digest}"
+
+    columns = current_cache.get(key)
+    if columns is None:
+        xs, ys = _collect_points(body, search._index, x, y, batch_size)
+        columns = (xs.tobytes(), ys.tobytes())
+        if len(xs) <= max_points:
+            current_cache.set(key, columns, timeout=timeout)
+    return tuple(np.frombuffer(column, dtype=np.float32) for column in columns)
+
+
+def bin_points(xs, ys, bins, x_scale="linear", y_scale="linear"):
+    """2D histogram of points.
+
+    :param bins: Number of bins along each axis.
+    :param x_scale: ``linear`` or ``log`` spacing of the bins along x, in
+        which case points with values that aren't positive are dropped.
+    :returns: Dict with the ``counts`` in each bin, indexed by y then x as
+        for a plotly heatmap, the ``x_edges`` and ``y_edges`` of the bins,
+        and the number of ``points`` binned.
+    """
+    xs = np.asarray(xs, dtype=np.float64)
+    ys = np.asarray(ys, dtype=np.float64)
+    keep = np.isfinite(xs) & np.isfinite(ys)
+    if x_scale == "log":
+        keep &= xs > 0
+    if y_scale == "log":
+        keep &= ys > 0
+    xs = xs[keep]
+    ys = ys[keep]
+    if x_scale == "log":
+        xs = np.log10(xs)
+    if y_scale == "log":
+        ys = np.log10(ys)
+
+    counts, x_edges, y_edges = np.histogram2d(xs, ys, bins=bins)
+    if x_scale == "log":
+        x_edges = 10**x_edges
+    if y_scale == "log":
+        y_edges = 10**y_edges
+    return dict(
+        counts=counts.T.astype(np.int64).tolist(),
+        x_edges=x_edges.tolist(),
+        y_edges=y_edges.tolist(),
+        points=int(keep.sum()),
+    )
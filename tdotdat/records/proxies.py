@@ -0,0 +1,15 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2022 TDoTP.
+#
+# TDotDat is free software; you can redistribute it and/or modify it under
+# the terms of the MIT License; see LICENSE file for more details.
+
+"""Proxies for TDotDat."""
+
+from flask import current_app
+from werkzeug.local import LocalProxy
+
+current_parse_cache = LocalProxy(
+    lambda: current_app.extensions['tdotdat'].parse_cache)
+"""Cache of simulations parsed by pyrokinetics."""
@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2022 TDoTP.
+#
+# TDotDat is free software; you can redistribute it and/or modify it under
+# the terms of the MIT License; see LICENSE file for more details.
+
+"""Search factory for TDotDat."""
+
+from functools import lru_cache
+
+from flask import has_request_context, request
+from invenio_records_rest.query import default_search_factory
+from invenio_rest.errors import FieldError, RESTValidationError
+from marshmallow import fields as ma_fields
+
+from .cursor import apply_cursor, requested_cursor
+from .marshmallow import MetadataSchemaV1
+
+#: Fields always fetched from the search engine, as they are needed to build
+#: the search hits.
+REQUIRED_FIELDS = ("id", "_created", "_updated")
+
+
+@lru_cache(maxsize=1024)
+def is_metadata_field(schema_class, path):
+    """Whether a dotted path is a field of the metadata described by the
+    marshmallow ``schema_class``.
+
+    Anything under a field holding a free-form dict, such as the embedded
+    ``equilibrium``, is accepted.
+    """
+    schema = schema_class()
+    field = None
+    for part in path.split("."):
+        if field is not None:
+            while isinstance(field, ma_fields.List):
+                field = field.inner
+            if isinstance(field, (ma_fields.Dict, ma_fields.Raw)):
+                return True
+            if not isinstance(field, ma_fields.Nested):
+                return False
+            schema = field.schema
+        field = schema.fields.get(part)
+        if field is None:
+            return False
+    return True
+
+
+def requested_fields(schema_class=MetadataSchemaV1):
+    """Metadata fields requested with the ``fields`` query parameter.
+
+    ``fields`` is a comma-separated list of dotted paths in the metadata, e.g.
+    ``?fields=title,flux_surface.q``.
+
+    :param schema_class: Marshmallow schema of the metadata being served.
+
+    :returns: List of paths, or ``None`` if all fields are wanted.
+    :raises RESTValidationError: If a path isn't a field of the metadata.
+    """
+    if not has_request_context():
+        return None
+    value = request.values.get("fields", "")
+    fields = [field.strip() for field in value.split(",") if field.strip()]
+    unknown = [
+        field for field in fields if not is_metadata_field(schema_class, field)
+    ]
+    if unknown:
+        raise RESTValidationError(
+            errors=[
+                FieldError("fields", f"Unknown field {field}.")
+                for field in unknown
+            ]
+        )
+    return fields or None
+
+
+def search_factory(self, search, schema_class=MetadataSchemaV1):
+    """Default search factory, which also applies the ``fields`` and
+    ``cursor`` parameters.
+
+    Only the requested fields are returned by the search engine, instead of
+    whole records. See :mod:`tdotdat.records.cursor` for cursor pagination.
+
+    :param schema_class: Marshmallow schema of the metadata being searched,
+        which the requested fields are checked against.
+    """
+    search, urlkwargs = default_search_factory(self, search)
+    fields = requested_fields(schema_class)
+    if fields is not None:
+        search = search.source(includes=list(REQUIRED_FIELDS) + fields)
+        urlkwargs.add("fields", ",".join(fields))
+    cursor = requested_cursor()
+    if cursor is not None:
+        search = apply_cursor(search, cursor)
+    return search, urlkwargs
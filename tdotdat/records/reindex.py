@@ -0,0 +1,248 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2022 TDoTP.
+#
+# TDotDat is free software; you can redistribute it and/or modify it under
+# the terms of the MIT License; see LICENSE file for more details.
+
+"""Parallel, resumable reindexing of every record.
+
+The records are split into ranges of UUIDs with about the same number of
+records each, and every range is indexed by its own worker process with bulk
+requests. Workers report the last UUID they indexed after each batch, and the
+progress of every range is written to a checkpoint file, so an interrupted
+run picks up where it stopped. While indexing, the refresh interval of the
+indices is relaxed, and the original is kept in the checkpoint to restore it
+afterwards, even if the run is resumed.
+"""
+
+import json
+import os
+import queue as queue_module
+import time
+import uuid
+
+from flask import current_app
+from invenio_db import db
+from invenio_pidstore.models import PersistentIdentifier, PIDStatus
+from invenio_search import current_search_client
+from invenio_search.engine import search
+from invenio_search.utils import build_alias_name
+
+from .eigenmodes import EIGENMODES_INDEX
+from .indexer import TDotDatIndexer, full_reindex
+
+#: Indices whose refresh interval is relaxed while reindexing, by PID type.
+INDICES = {
+    "recid": ("records", EIGENMODES_INDEX),
+    "equid": ("equilibrium",),
+}
+
+
+def _pid_query(pid_type):
+    """Query of the UUIDs of the registered records with a type of PID."""
+    return db.session.query(PersistentIdentifier.object_uuid).filter(
+        PersistentIdentifier.pid_type == pid_type,
+        PersistentIdentifier.object_type == "rec",
+        PersistentIdentifier.status == PIDStatus.REGISTERED,
+    )
+
+
+def split_ranges(pid_type, workers):
+    """Split the records into ranges of UUIDs of about equal size.
+
+    :returns: Tuple of the total number of records, and a list of dicts with
+        the ``start`` (inclusive) and ``end`` (exclusive) UUIDs of each
+        range, ``None`` for unbounded.
+    """
+    query = _pid_query(pid_type).order_by(PersistentIdentifier.object_uuid)
+    total = query.count()
+    boundaries = {
+        str(query.offset(total * i // workers).limit(1).scalar())
+        for i in range(1, workers)
+        if total * i // workers < total
+    }
+    return total, make_ranges(sorted(boundaries, key=uuid.UUID))
+
+
+def make_ranges(boundaries):
+    """Ranges between sorted ``boundaries``, with unbounded ends."""
+    edges = [None, *boundaries, None]
+    return [
+        dict(start=start, end=end, last=None, indexed=0, failed=0, done=False)
+        for start, end in zip(edges, edges[1:])
+    ]
+
+
+def load_checkpoint(path):
+    """Progress of a previous run, or ``None`` if there wasn't one."""
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_checkpoint(path, checkpoint):
+    """Write progress so it can't be left half written."""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(checkpoint, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def get_refresh_intervals(pid_type):
+    """Current refresh interval of each index, ``None`` for the default."""
+    intervals = {}
+    for name in INDICES[pid_type]:
+        alias = build_alias_name(name)
+        settings = current_search_client.indices.get_settings(
+            index=alias, name="index.refresh_interval"
+        )
+        for index, value in settings.items():
+            intervals[index] = (
+                value["settings"].get("index", {}).get("refresh_interval")
+            )
+    return intervals
+
+
+def set_refresh_intervals(intervals):
+    """Set the refresh interval of each index; ``None`` resets it."""
+    for index, interval in intervals.items():
+        current_search_client.indices.put_settings(
+            index=index, body={"index": {"refresh_interval": interval}}
+        )
+
+
+def next_ids(pid_type, start, end, after, batch_size):
+    """UUIDs of the next batch of records in a range."""
+    query = _pid_query(pid_type)
+    if after is not None:
+        query = query.filter(PersistentIdentifier.object_uuid > after)
+    elif start is not None:
+        query = query.filter(PersistentIdentifier.object_uuid >= start)
+    if end is not None:
+        query = query.filter(PersistentIdentifier.object_uuid < end)
+    query = query.order_by(PersistentIdentifier.object_uuid).limit(batch_size)
+    return [str(object_uuid) for (object_uuid,) in query]
+
+
+def _index_actions(indexer, ids, failed):
+    """Bulk actions to index records and their eigenmodes, skipping those
+    that can't be."""
+    for id_ in ids:
+        try:
+            action = indexer._index_action(dict(id=id_, op="index"))
+        except Exception:
+            current_app.logger.exception(f"Failed to index record {id_}")
+            failed.append(id_)
+            continue
+        yield action
+        yield from indexer.eigenmode_actions(action)
+
+
+def reindex_range(queue, index, pid_type, start, end, after, batch_size):
+    """Index a range of records, reporting each batch to ``queue``.
+
+    Runs in a worker process, so creates its own application, in which the
+    side effects of indexing are suppressed, see :func:`.indexer.full_reindex`.
+    Puts tuples of the range ``index``, the last UUID indexed and the number
+    of records indexed and failed, with ``None`` for the UUID when the range
+    is done.
+    """
+    from invenio_app.factory import create_api
+
+    app = create_api()
+    with app.app_context(), full_reindex():
+        indexer = TDotDatIndexer()
+        request_timeout = current_app.config["INDEXER_BULK_REQUEST_TIMEOUT"]
+        while True:
+            ids = next_ids(pid_type, start, end, after, batch_size)
+            if not ids:
+                break
+            skipped = []
+            _, errors = search.helpers.bulk(
+                indexer.client,
+                _index_actions(indexer, ids, skipped),
+                raise_on_error=False,
+                raise_on_exception=False,
+                request_timeout=request_timeout,
+            )
+            # Only count the records, not their eigenmodes
+            failed = len(
+                {item["_id"] for error in errors for item in error.values()}
+                & set(ids)
+            )
+            indexed = len(ids) - len(skipped) - failed
+            after = ids[-1]
+            queue.put((index, after, indexed, failed + len(skipped)))
+            # Don't keep every record loaded so far in the session
+            db.session.expunge_all()
+    queue.put((index, None, 0, 0))
+
+
+def run_workers(context, checkpoint, batch_size, save, report, poll_interval=1):
+    """Index the unfinished ranges of ``checkpoint`` in parallel.
+
+    :param context: ``multiprocessing`` context to start workers with.
+    :param save: Called with the checkpoint after every batch.
+    :param report: Called with the checkpoint after every batch.
+    :raises RuntimeError: If a worker process dies.
+    """
+    queue = context.Queue()
+    processes = {}
+    for index, range_ in enumerate(checkpoint["ranges"]):
+        if range_["done"]:
+            continue
+        process = context.Process(
+            target=reindex_range,
+            args=(
+                queue,
+                index,
+                checkpoint["pid_type"],
+                range_["start"],
+                range_["end"],
+                range_["last"],
+                batch_size,
+            ),
+        )
+        process.start()
+        processes[index] = process
+
+    try:
+        while any(not r["done"] for r in checkpoint["ranges"]):
+            try:
+                index, last, indexed, failed = queue.get(timeout=poll_interval)
+            except queue_module.Empty:
+                for worker, process in processes.items():
+                    if not process.is_alive() and process.exitcode != 0:
+                        raise RuntimeError(
+                            f"Worker for range {worker} exited with code "
+                            f"{process.exitcode}"
+                        )
+                continue
+
+            range_ = checkpoint["ranges"][index]
+            if last is None:
+                range_["done"] = True
+            else:
+                range_["last"] = last
+                range_["indexed"] += indexed
+                range_["failed"] += failed
+            save(checkpoint)
+            report(checkpoint)
+    finally:
+        for process in processes.values():
+            if process.is_alive():
+                process.terminate()
+            process.join()
+
+
+def progress(checkpoint, started, indexed_before):
+    """Numbers of records indexed and failed, and records per second."""
+    indexed = sum(r["indexed"] for r in checkpoint["ranges"])
+    failed = sum(r["failed"] for r in checkpoint["ranges"])
+    elapsed = time.monotonic() - started
+    rate = (indexed - indexed_before) / elapsed if elapsed > 0 else 0.0
+    return dict(
+        indexed=indexed, failed=failed, total=checkpoint["total"], rate=rate
+    )
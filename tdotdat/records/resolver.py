@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2022 TDoTP.
+#
+# TDotDat is free software; you can redistribute it and/or modify it under
+# the terms of the MIT License; see LICENSE file for more details.
+
+"""Resolution of many persistent identifiers at once."""
+
+from invenio_pidstore.errors import (
+    PIDDeletedError,
+    PIDDoesNotExistError,
+    PIDMissingObjectError,
+    PIDRedirectedError,
+    PIDUnregistered,
+)
+from invenio_pidstore.models import PersistentIdentifier
+
+
+class BulkResolver(object):
+    """Resolve a list of PIDs to their objects.
+
+    Works like :class:`invenio_pidstore.resolver.Resolver`, raising the same
+    errors for the first PID in the list that can't be resolved, but fetches
+    all the PIDs in one query and all the objects in another, rather than two
+    queries per PID.
+
+    :param pid_type: Persistent identifier type.
+    :param object_type: Object type.
+    :param getter: Callable taking a list of object UUIDs, and returning the
+        objects, which must have an ``id``, e.g. ``Record.get_records``. If
+        ``None``, the object UUIDs are returned instead.
+    """
+
+    def __init__(self, pid_type=None, object_type=None, getter=None):
+        """Initialize resolver."""
+        self.pid_type = pid_type
+        self.object_type = object_type
+        self.getter = getter
+
+    def _get_objects(self, ids):
+        if self.getter is None:
+            return {id_: id_ for id_ in ids}
+        return {obj.id: obj for obj in self.getter(list(set(ids)))}
+
+    def resolve(self, pid_values):
+        """Resolve persistent identifiers.
+
+        :param pid_values: List of PID values.
+        :returns: List of ``(pid, object)`` tuples, in the same order.
+        """
+        pid_values = [str(pid_value) for pid_value in pid_values]
+        pids = {
+            pid.pid_value: pid
+            for pid in PersistentIdentifier.query.filter(
+                PersistentIdentifier.pid_type == self.pid_type,
+                PersistentIdentifier.pid_value.in_(set(pid_values)),
+            )
+        }
+
+        for pid_value in pid_values:
+            pid = pids.get(pid_value)
+            if pid is None:
+                raise PIDDoesNotExistError(self.pid_type, pid_value)
+            if pid.is_new() or pid.is_reserved():
+                raise PIDUnregistered(pid)
+            obj_id = pid.get_assigned_object(object_type=self.object_type)
+            if pid.is_deleted():
+                obj = self._get_objects([obj_id]).get(obj_id) if obj_id else None
+                raise PIDDeletedError(pid, obj)
+            if pid.is_redirected():
+                raise PIDRedirectedError(pid, pid.get_redirect())
+            if not obj_id:
+                raise PIDMissingObjectError(self.pid_type, pid_value)
+
+        objects = self._get_objects(
+            [pids[pid_value].object_uuid for pid_value in pid_values]
+        )
+        result = []
+        for pid_value in pid_values:
+            pid = pids[pid_value]
+            if pid.object_uuid not in objects:
+                raise PIDMissingObjectError(self.pid_type, pid_value)
+            result.append((pid, objects[pid.object_uuid]))
+        return result
@@ -7,11 +7,11 @@
 
 """Record serializers."""
 
-from invenio_records_rest.serializers.json import JSONSerializer
 from invenio_records_rest.serializers.response import record_responsify, \
     search_responsify
 
 from ..marshmallow import RecordSchemaV1
+from .json import JSONSerializer
 
 # Serializers
 # ===========
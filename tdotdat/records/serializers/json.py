@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2022 TDoTP.
+#
+# TDotDat is free software; you can redistribute it and/or modify it under
+# the terms of the MIT License; see LICENSE file for more details.
+
+"""JSON serializer for TDotDat records."""
+
+from flask import has_request_context, request
+from invenio_records_rest.serializers.json import \
+    JSONSerializer as _JSONSerializer
+from invenio_rest.errors import FieldError, RESTValidationError
+
+from ..arrays import load_arrays
+from ..cursor import cursor_links, requested_cursor
+from ..query import requested_fields
+
+
+class BaseJSONSerializer(_JSONSerializer):
+    """JSON serializer handling the query parameters of
+    :func:`tdotdat.records.query.search_factory`.
+
+    If the request has a ``fields`` parameter, only those paths in the
+    metadata are dumped, along with the top-level fields such as ``id`` and
+    ``links``. With a ``cursor``, search results get cursor links instead of
+    page links.
+    """
+
+    def dump(self, obj, context):
+        """Serialize object with schema."""
+        metadata = self.schema_class._declared_fields['metadata']
+        fields = requested_fields(metadata.nested)
+        if fields is None:
+            return super().dump(obj, context)
+
+        only = [
+            name for name in self.schema_class._declared_fields
+            if name != 'metadata'
+        ]
+        only.extend(f'metadata.{field}' for field in fields)
+        try:
+            schema = self.schema_class(context=context, only=only)
+        except ValueError as e:
+            raise RESTValidationError(errors=[FieldError('fields', str(e))])
+        return schema.dump(obj)
+
+    def serialize_search(self, pid_fetcher, search_result, links=None,
+                         item_links_factory=None, **kwargs):
+        """Serialize a search result."""
+        if links is not None and requested_cursor() is not None:
+            links = cursor_links(search_result)
+        return super().serialize_search(
+            pid_fetcher, search_result, links=links,
+            item_links_factory=item_links_factory, **kwargs)
+
+
+class JSONSerializer(BaseJSONSerializer):
+    """JSON serializer that can include arrays stored in sidecar files.
+
+    Sidecar arrays are left out unless the request asks for them with
+    ``?arrays=inline``, in which case they are read from the record's bucket
+    and put back where they belong in the metadata.
+    """
+
+    def transform_record(self, pid, record, links_factory=None, **kwargs):
+        """Transform record into an intermediate representation."""
+        result = super().transform_record(
+            pid, record, links_factory=links_factory, **kwargs)
+        if has_request_context() and request.args.get('arrays') == 'inline':
+            load_arrays(record, result.get('metadata', {}))
+        return result
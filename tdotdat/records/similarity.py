@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2022 TDoTP.
+#
+# TDotDat is free software; you can redistribute it and/or modify it under
+# the terms of the MIT License; see LICENSE file for more details.
+
+"""Nearest-neighbour search over input parameters.
+
+Each record is indexed with a vector of its main input parameters, each
+shifted and scaled (after taking the logarithm, for parameters spanning
+decades) so that a unit distance means a similar change in every direction.
+The vector is stored in a ``knn_vector`` field, so the closest runs to a
+given one can be found by the search engine without fetching every record.
+"""
+
+import math
+
+from flask import current_app
+from invenio_search import RecordsSearch
+from invenio_search.engine import dsl
+
+#: Field of the records index holding the parameter vectors.
+VECTOR_FIELD = "parameter_vector"
+
+
+def _get(data, path):
+    """Get the value at the dotted ``path`` in ``data``, or ``None``.
+
+    Parts of the path which are integers index into lists.
+    """
+    for part in path.split("."):
+        if isinstance(data, list) and part.isdigit():
+            data = data[int(part)] if int(part) < len(data) else None
+        elif isinstance(data, dict):
+            data = data.get(part)
+        else:
+            return None
+    return data
+
+
+def parameter_vector(json, parameters):
+    """Normalised vector of the input parameters of a record.
+
+    :param json: The record metadata.
+    :param parameters: List of dicts with the dotted ``path`` of each
+        parameter in the record, the ``centre`` and ``scale`` to normalise
+        it with, and optionally ``log`` to use its logarithm, floored at
+        ``floor``.
+    :returns: List of floats, or ``None`` if any parameter is missing.
+    """
+    vector = []
+    for parameter in parameters:
+        value = _get(json, parameter["path"])
+        if not isinstance(value, (int, float)) or isinstance(value, bool):
+            return None
+        if parameter.get("log"):
+            value = math.log10(max(abs(value), parameter.get("floor", 1e-6)))
+        vector.append((value - parameter["centre"]) / parameter["scale"])
+    return vector
+
+
+def similar_records(json, k):
+    """Find the ``k`` records with input parameters closest to ``json``.
+
+    :returns: List of ``(hit, distance)`` tuples, nearest first, not including
+        the record itself. Empty if the record is missing a parameter.
+    """
+    vector = parameter_vector(
+        json, current_app.config["TDOTDAT_SIMILARITY_PARAMETERS"]
+    )
+    if vector is None:
+        return []
+
+    # Ask for one extra, as the record itself is in the index
+    search = (
+        RecordsSearch(index="records")
+        .query(dsl.Q("knn", **{VECTOR_FIELD: dict(vector=vector, k=k + 1)}))
+        .source(["id", "title"])
+        .extra(size=k + 1)
+    )
+
+    results = []
+    for hit in search.execute():
+        if hit.id == json.get("id"):
+            continue
+        # Scores of L2 spaces are 1 / (1 + distance²)
+        distance = math.sqrt(max(1 / hit.meta.score - 1, 0.0))
+        results.append((hit, distance))
+    return results[:k]
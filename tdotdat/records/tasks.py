@@ -7,16 +7,45 @@
 
 """Tasks for TDotDat."""
 
+import pathlib
+import tempfile
+import uuid
+
 import sqlalchemy
 from celery import shared_task
+from flask import current_app
+from invenio_cache import current_cache
 from invenio_db import db
+from invenio_files_rest.models import FileInstance, ObjectVersion
 from invenio_records_files.api import Record
 from invenio_records_files.models import RecordsBuckets
 
+import pyrokinetics
+
+from .api import create_record
+from .indexer import TDotDatIndexer
+from .proxies import current_parse_cache
+
+
+#: Prefix of the markers of buckets with an update pending, and of the
+#: update counters.
+FILES_UPDATE_PREFIX = 'tdotdat:files_update:'
+
+
+def _count(name):
+    current_cache.inc(f'{FILES_UPDATE_PREFIX}stats:{name}')
+
+
+def _pending_key(bucket_id):
+    return f'{FILES_UPDATE_PREFIX}pending:{bucket_id}'
+
 
 @shared_task(ignore_result=True)
 def update_record_files_by_bucket(bucket_id):
     """Given a bucket id, dump its files in the record metadata."""
+    # Clear the marker first, so files uploaded from now on schedule
+    # another update rather than being missed by this one
+    current_cache.delete(_pending_key(bucket_id))
     record_bucket = \
         RecordsBuckets.query.filter_by(bucket_id=bucket_id).first()
     if record_bucket:
@@ -25,17 +54,196 @@ def update_record_files_by_bucket(bucket_id):
             record.files.flush()
             record.commit()
             db.session.commit()
+            _count('updates')
         except sqlalchemy.orm.exc.StaleDataError:
-            # it might fail with `sqlalchemy.orm.exc.StaleDataError`
-            # if another task is updating the record at the same time.
-            # The exception might be ignored because one of the task will
-            # anyway update the record metadata with the entire content
-            # of the bucket.
-            pass
+            # Another change to the record was committed at the same time.
+            # As the marker was cleared, no other update of the files may be
+            # coming, so try again later with the record as it is then.
+            db.session.rollback()
+            _count('stale')
+            _schedule_files_update(bucket_id)
+
+
+def _schedule_files_update(bucket_id):
+    """Schedule an update of the files of a bucket's record, unless one is
+    already pending."""
+    delay = current_app.config['TDOTDAT_FILES_UPDATE_DELAY']
+    # The marker expires in case the task is lost, so the bucket isn't
+    # stuck without updates
+    marker_timeout = delay * 10 + 60
+    if not current_cache.add(
+            _pending_key(bucket_id), True, timeout=marker_timeout):
+        return None
+    _count('tasks')
+    return update_record_files_by_bucket.apply_async(
+        kwargs=dict(bucket_id=bucket_id), countdown=delay)
 
 
 def update_record_files_async(object_version, obj):
-    """Get the bucket id and spawn a task to update record metadata."""
+    """Get the bucket id and spawn a task to update record metadata.
+
+    The task waits for ``TDOTDAT_FILES_UPDATE_DELAY`` seconds, and only one
+    is scheduled per bucket at a time, so a burst of uploads to the same
+    bucket updates its record once.
+    """
+    _count('signals')
     # convert to string to be able to serialize it when sending to the task
-    str_uuid = str(obj.bucket_id)
-    return update_record_files_by_bucket.delay(bucket_id=str_uuid)
+    return _schedule_files_update(str(obj.bucket_id))
+
+
+def files_update_stats():
+    """Counts of file signals, and of the record updates they caused.
+
+    ``signals`` are files uploaded or deleted, ``tasks`` the updates
+    scheduled for them, and ``updates`` and ``stale`` the updates that
+    succeeded or clashed with another change to the record, and were
+    scheduled again.
+    """
+    return {
+        name: current_cache.get(f'{FILES_UPDATE_PREFIX}stats:{name}') or 0
+        for name in ('signals', 'tasks', 'updates', 'stale')
+    }
+
+
+@shared_task(ignore_result=True)
+def process_bulk_queue(search_bulk_kwargs=None):
+    """Index the records in the bulk indexing queue, with their eigenmodes.
+
+    Replaces :func:`invenio_indexer.tasks.process_bulk_queue`, which doesn't
+    index eigenmodes.
+    """
+    TDotDatIndexer().process_bulk_queue(search_bulk_kwargs=search_bulk_kwargs)
+
+
+@shared_task(ignore_result=True)
+def remove_unused_file(file_id):
+    """Delete a file and its data if no object points at it any more."""
+    # Objects being pointed at the file, e.g. by linking, hold a key share
+    # lock on it until they are committed, so this waits for them, and any
+    # started afterwards wait for the file to be deleted and then fail.
+    file_instance = FileInstance.query.filter_by(
+        id=file_id).with_for_update().one_or_none()
+    if file_instance is None or \
+            ObjectVersion.query.filter_by(file_id=file_id).count():
+        db.session.commit()
+        return
+    storage = file_instance.storage()
+    file_instance.delete()
+    db.session.commit()
+    storage.delete()
+
+
+def parse_simulation(input_obj, output_objs=()):
+    """Parse stored GK input and output files with pyrokinetics.
+
+    :param input_obj: ``ObjectVersion`` of the GK input file.
+    :param output_objs: ``ObjectVersion`` of each GK output file.
+    :returns: The IMAS representation of the simulation.
+    """
+    # We have a small problem: Pyrokinetics (currently) might rely on the actual
+    # filenames of GK input/output files (for at least some GK codes). But the
+    # uploaded files will be stored on disk with names like "<hash>/data". So,
+    # we create a temporary directory, and we create symlinks there with the
+    # actual filenames of the uploaded files (just the filename part, not the
+    # full path). The tempdir gets cleaned up automatically
+    with tempfile.TemporaryDirectory() as tmpdir:
+        tmpdir_path = pathlib.Path(tmpdir)
+
+        def link_file(file_storage):
+            """Make temporary symlink to a stored file for Pyrokinetics"""
+            file_symlink = tmpdir_path / pathlib.Path(file_storage.key).name
+            file_symlink.symlink_to(file_storage.file.storage().fileurl)
+            return file_symlink
+
+        for output_obj in output_objs:
+            link_file(output_obj)
+
+        pyro = pyrokinetics.Pyro(gk_file=link_file(input_obj))
+        data = pyro.to_imas()
+
+        if output_objs:
+            pyro.load_gk_output()
+            data.update(pyro.to_imas())
+
+    return data
+
+
+@shared_task
+def ingest_record(bucket_id, data, input_key=None, output_keys=None):
+    """Parse uploaded simulation files and create a record from them.
+
+    The files must already be stored in the bucket. Parsing large nonlinear
+    outputs can take minutes, which is why this runs in a worker rather than
+    in the request that uploaded the files. Files that have been parsed
+    before are not parsed again, see :mod:`tdotdat.records.parse_cache`.
+
+    :param bucket_id: UUID of the bucket holding the uploaded files.
+    :param dict data: Record metadata from the upload form.
+    :param input_key: Key of the GK input file in the bucket, if any.
+    :param output_keys: Keys of the GK output files in the bucket.
+    :returns: The PID value of the new record.
+    """
+    output_keys = output_keys or []
+    data = dict(data)
+
+    if input_key is not None:
+        input_obj = ObjectVersion.get(bucket_id, input_key)
+        output_objs = [ObjectVersion.get(bucket_id, key) for key in output_keys]
+        data.update(
+            current_parse_cache.get_or_parse(
+                "record",
+                [obj.file.checksum for obj in [input_obj] + output_objs],
+                lambda: parse_simulation(input_obj, output_objs),
+            )
+        )
+        data["input_files"] = [input_key]
+        if output_keys:
+            data["output_files"] = output_keys
+
+    data["_bucket"] = str(bucket_id)
+    data["_files"] = [
+        dict(
+            key=f.key,
+            file_id=str(f.file_id),
+            bucket=str(bucket_id),
+            size=f.file.size,
+            checksum=f.file.checksum,
+            version_id=str(f.version_id),
+        )
+        for f in ObjectVersion.get_by_bucket(bucket_id)
+    ]
+
+    record = create_record(data)
+    return record["id"]
+
+
+#: Prefix of the cache keys holding the owner of each ingestion job.
+INGEST_JOB_PREFIX = 'tdotdat:ingest_job:'
+
+
+def start_ingest_job(owner_id, bucket_id, data, input_key=None,
+                     output_keys=None):
+    """Start :func:`ingest_record` on behalf of a user.
+
+    The owner is stored with the job, so only they can see its status.
+
+    :param owner_id: ID of the user who uploaded the files.
+    :returns: The ID of the job.
+    """
+    job_id = str(uuid.uuid4())
+    # Store the owner first, as the task may run (or even finish) before
+    # apply_async returns
+    current_cache.set(
+        f'{INGEST_JOB_PREFIX}{job_id}', owner_id,
+        timeout=current_app.config['TDOTDAT_INGEST_JOB_TTL'])
+    ingest_record.apply_async(
+        args=(str(bucket_id), data),
+        kwargs=dict(input_key=input_key, output_keys=output_keys),
+        task_id=job_id,
+    )
+    return job_id
+
+
+def ingest_job_owner(job_id):
+    """ID of the user who started an ingestion job, or ``None``."""
+    return current_cache.get(f'{INGEST_JOB_PREFIX}{job_id}')
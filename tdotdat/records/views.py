@@ -10,10 +10,7 @@
 from operator import itemgetter
 from os.path import splitext
 import json
-from io import BytesIO
-import copy
-import pathlib
-import tempfile
+import zlib
 
 from flask import (
     Blueprint,
@@ -23,29 +20,77 @@ from flask import (
     url_for,
     render_template,
     current_app,
-    send_file,
+    jsonify,
+    stream_with_context,
+    Response,
 )
-from flask_login import login_required
+from flask_login import current_user, login_required
+from invenio_db import db
+from invenio_files_rest.signals import file_uploaded
 from invenio_previewer.proxies import current_previewer
 from invenio_files_rest.models import ObjectVersion, Bucket
 from invenio_files_rest.views import ObjectResource
+from invenio_jsonschemas import current_jsonschemas
 from invenio_records_ui.views import default_view_method
 from invenio_records_ui.signals import record_viewed
 from invenio_pidstore.resolver import Resolver
+from invenio_records_files.models import RecordsBuckets
+from invenio_records_rest.query import default_search_factory
+from invenio_records_rest.utils import obj_or_import_string
+from invenio_records_rest.views import verify_record_permission
 from invenio_pidstore.errors import (
     PIDDoesNotExistError,
     PIDMissingObjectError,
     PIDRedirectedError,
     PIDUnregistered,
 )
-from invenio_jsonschemas import current_jsonschemas
+from invenio_search import RecordsSearch
+from marshmallow import ValidationError
 from werkzeug.routing import BuildError, BaseConverter
 
-import pyrokinetics
-
 from .forms import RecordForm
-from .api import create_record, Record
+from .api import Record, create_records
+from .archive import archive_records
+from .eigenmodes import EigenmodeSearch
+from .export import (
+    columns,
+    export_csv,
+    export_ndjson,
+    export_parquet,
+    pyarrow,
+    record_fields,
+    scan_metadata,
+)
+from .files import (
+    create_object,
+    find_readable_file_instance,
+    link_object,
+    remove_unused_files,
+)
+from .indexer import indexing_stats
+from .jsonresolvers import equilibrium_cache_stats
+from .marshmallow import MetadataSchemaV1
+from .permissions import verify_endpoint_permission
+from .plot import (
+    SCALES,
+    bin_points,
+    cached_columns,
+    compatible,
+    encode_column,
+    numeric_fields,
+    scan_points,
+)
+from .proxies import current_parse_cache
+from .query import requested_fields, search_factory
+from .resolver import BulkResolver
 from .serializers import json_v1
+from .similarity import similar_records
+from .tasks import (
+    files_update_stats,
+    ingest_job_owner,
+    ingest_record,
+    start_ingest_job,
+)
 
 
 blueprint = Blueprint(
@@ -62,6 +107,13 @@ templates and static files located in the folders of the same names next to
 this file.
 """
 
+api_blueprint = Blueprint(
+    "tdotdat_records_api",
+    __name__,
+    url_prefix="/records",
+)
+"""Blueprint for the REST API endpoints that aren't provided by Invenio"""
+
 
 class IntListConverter(BaseConverter):
     """Match ints separated with ','.
@@ -168,86 +220,91 @@ def create():
 
     contributors = [dict(name=form.contributor_name.data)]
     bucket = Bucket.create()
-    data = {}
-    pyro = None
-
-    # We have a small problem: Pyrokinetics (currently) might rely on the actual
-    # filenames of GK input/output files (for at least some GK codes). But the
-    # uploaded files will be stored on disk with names like "<hash>/data". So,
-    # we create a temporary directory, and we create symlinks there with the
-    # actual filenames of the uploaded files (just the filename part, not the
-    # full path). The tempdir gets cleaned up automatically
-    with tempfile.TemporaryDirectory() as tmpdir:
-        tmpdir_path = pathlib.Path(tmpdir)
-
-        def store_file(file_):
-            """Store file in bucket, make temporary symlink for Pyrokinetics"""
-            file_storage = ObjectVersion.create(bucket, file_.filename, stream=file_)
-
-            file_symlink = tmpdir_path / pathlib.Path(file_.filename).name
-            file_symlink.symlink_to(file_storage.file.storage().fileurl)
-            return file_storage.key, file_symlink
-
-        if form.input_file.data:
-            input_file = request.files[form.input_file.name]
-            input_key, input_symlink = store_file(input_file)
-
-            # Note this relies on details of the file storage to get the filename
-            pyro = pyrokinetics.Pyro(gk_file=input_symlink)
-            data.update({"input_files": [input_key], **pyro.to_imas()})
-        else:
-            data.update({"software": {"name": form.software.data}})
-
-        if form.output_file.data:
-            if pyro is None:
-                raise RuntimeError("Missing input file")
-
-            keys = []
-            for output_file in request.files.getlist(form.output_file.name):
-                key, _ = store_file(output_file)
-                keys.append(key)
-
-            pyro.load_gk_output()
-            data.update({"output_files": keys, **pyro.to_imas()})
-
-    files = [
-        dict(
-            key=f.key,
-            file_id=str(f.file_id),
-            bucket=str(bucket.id),
-            size=f.file.size,
-            checksum=f.file.checksum,
-            version_id=str(f.version_id),
-        )
-        for f in ObjectVersion.get_by_bucket(bucket.id)
-    ]
-
-    create_record(
-        dict(
-            title=form.title.data,
-            contributors=contributors,
-            _bucket=str(bucket.id),
-            _files=files,
-            **data,
-        )
+    data = dict(title=form.title.data, contributors=contributors)
+    input_key = None
+    output_keys = []
+    orphans = []
+
+    if form.input_file.data:
+        input_file = request.files[form.input_file.name]
+        input_obj, orphan_id = create_object(bucket, input_file.filename, input_file)
+        input_key = input_obj.key
+        orphans.append(orphan_id)
+    else:
+        data.update({"software": {"name": form.software.data}})
+
+    if form.output_file.data:
+        if input_key is None:
+            raise RuntimeError("Missing input file")
+
+        for output_file in request.files.getlist(form.output_file.name):
+            output_obj, orphan_id = create_object(
+                bucket, output_file.filename, output_file
+            )
+            output_keys.append(output_obj.key)
+            orphans.append(orphan_id)
+
+    db.session.commit()
+    remove_unused_files(orphans)
+
+    # Parsing the files with pyrokinetics can take minutes for large outputs,
+    # so hand it off to a worker and let the user poll for the result
+    job_id = start_ingest_job(
+        current_user.id, bucket.id, data, input_key=input_key, output_keys=output_keys
     )
-    return redirect(url_for("tdotdat_records.success"))
+    return redirect(url_for("tdotdat_records.success", job_id=job_id))
 
 
 @blueprint.route("/success")
 @login_required
 def success():
-    return render_template("records/success.html")
+    return render_template("records/success.html", job_id=request.args.get("job_id"))
 
 
-@blueprint.route("/compare/<int_list:pid_value_list>")
-def compare(pid_value_list):
-    """Display multiple records at once. Takes a comma-separated list of PIDs"""
+@blueprint.route("/jobs/<job_id>")
+@login_required
+def job_status(job_id):
+    """Report the state of a background ingestion job as JSON.
 
-    resolver = Resolver(pid_type="recid", object_type="rec", getter=Record.get_record)
+    Once the job has succeeded, this includes the new record's PID and whether
+    it is visible in the search index yet. Only the user who started the job
+    can see it.
+    """
+    if ingest_job_owner(job_id) != current_user.id:
+        abort(404)
+
+    result = ingest_record.AsyncResult(job_id)
+    status = dict(id=job_id, state=result.state)
+
+    if result.successful():
+        pid_value = result.result
+        status.update(
+            recid=pid_value,
+            indexed=RecordsSearch(index="records")
+            .filter("term", id=pid_value)
+            .count()
+            > 0,
+            links=dict(
+                record=url_for(
+                    "invenio_records_ui.recid", pid_value=pid_value, _external=True
+                )
+            ),
+        )
+    elif result.failed():
+        status["error"] = str(result.result)
+
+    return jsonify(status)
+
+
+def _bulk_resolve(pid_value_list, getter=None):
+    """Resolve a list of record PIDs, or abort as for a single record.
+
+    :param getter: As for :class:`~tdotdat.records.resolver.BulkResolver`.
+    """
+    resolver = BulkResolver(pid_type="recid", object_type="rec", getter=getter)
 
     try:
-        record_list = [resolver.resolve(pid_value) for pid_value in pid_value_list]
+        return resolver.resolve(pid_value_list)
     except (PIDDoesNotExistError, PIDUnregistered):
         abort(404)
     except PIDMissingObjectError as e:
@@ -257,10 +314,12 @@ def compare(pid_value_list):
         abort(500)
     except PIDRedirectedError as e:
         try:
-            return redirect(
-                url_for(
-                    ".{0}".format(e.destination_pid.pid_type),
-                    pid_value=e.destination_pid.pid_value,
+            abort(
+                redirect(
+                    url_for(
+                        ".{0}".format(e.destination_pid.pid_type),
+                        pid_value=e.destination_pid.pid_value,
+                    )
                 )
             )
         except BuildError:
@@ -275,6 +334,31 @@ def compare(pid_value_list):
             )
             abort(500)
 
+
+def _load_records(resolved, batch_size):
+    """Load the records of PIDs resolved without a getter, a batch at a time.
+
+    :returns: Generator of ``(pid, record)`` tuples.
+    """
+    app = current_app._get_current_object()
+    for start in range(0, len(resolved), batch_size):
+        batch = resolved[start : start + batch_size]
+        records = {
+            record.id: record
+            for record in Record.get_records([id_ for _, id_ in batch])
+        }
+        for pid, id_ in batch:
+            record = records[id_]
+            record_viewed.send(app, pid=pid, record=record)
+            yield pid, record
+
+
+@blueprint.route("/compare/<int_list:pid_value_list>")
+def compare(pid_value_list):
+    """Display multiple records at once. Takes a comma-separated list of PIDs"""
+
+    record_list = _bulk_resolve(pid_value_list, getter=Record.get_records)
+
     for pid, record in record_list:
         record_viewed.send(current_app._get_current_object(), pid=pid, record=record)
 
@@ -285,83 +369,426 @@ def compare(pid_value_list):
 
 @blueprint.route("/download/<int_list:pid_value_list>")
 def download(pid_value_list):
-    """Download multiple records. Takes a comma-separated list of PIDs"""
+    """Download multiple records. Takes a comma-separated list of PIDs
 
-    resolver = Resolver(pid_type="recid", object_type="rec", getter=Record.get_record)
+    The records are loaded in batches of ``TDOTDAT_DOWNLOAD_BATCH_SIZE`` and
+    streamed as a JSON array, gzipped if the client accepts it.
+    """
 
-    try:
-        record_list = [resolver.resolve(pid_value) for pid_value in pid_value_list]
-    except (PIDDoesNotExistError, PIDUnregistered):
-        abort(404)
-    except PIDMissingObjectError as e:
-        current_app.logger.exception(
-            "No object assigned to {0}.".format(e.pid), extra={"pid": e.pid}
-        )
-        abort(500)
-    except PIDRedirectedError as e:
-        try:
-            return redirect(
-                url_for(
-                    ".{0}".format(e.destination_pid.pid_type),
-                    pid_value=e.destination_pid.pid_value,
-                )
-            )
-        except BuildError:
-            current_app.logger.exception(
-                "Invalid redirect - pid_type '{0}' endpoint missing.".format(
-                    e.destination_pid.pid_type
-                ),
-                extra={
-                    "pid": e.pid,
-                    "destination_pid": e.destination_pid,
-                },
-            )
-            abort(500)
+    # Only get the record IDs for now, the records are loaded while streaming
+    resolved = _bulk_resolve(pid_value_list)
+    batch_size = current_app.config["TDOTDAT_DOWNLOAD_BATCH_SIZE"]
+
+    def generate():
+        yield "["
+        for n, (pid, record) in enumerate(_load_records(resolved, batch_size)):
+            metadata = json_v1.transform_record(pid, record)["metadata"]
+            yield ("," if n else "") + json.dumps(metadata)
+        yield "]"
+
+    chunks = (chunk.encode("utf-8") for chunk in generate())
+    headers = {"Content-Disposition": "attachment; filename=results.json"}
+    if "gzip" in request.accept_encodings:
+        chunks = _gzip(chunks)
+        headers["Content-Encoding"] = "gzip"
+    headers["Vary"] = "Accept-Encoding"
+
+    return Response(
+        stream_with_context(chunks), mimetype="application/json", headers=headers
+    )
 
-    for pid, record in record_list:
-        record_viewed.send(current_app._get_current_object(), pid=pid, record=record)
 
-    serialised = json.dumps(
-        [
-            json_v1.transform_record(pid, record)["metadata"]
-            for (pid, record) in record_list
-        ]
+@blueprint.route("/archive/<int_list:pid_value_list>")
+def archive(pid_value_list):
+    """Download multiple records and their files as a ZIP archive. Takes a
+    comma-separated list of PIDs
+
+    The archive is streamed, see :mod:`tdotdat.records.archive`.
+    """
+
+    resolved = _bulk_resolve(pid_value_list)
+    batch_size = current_app.config["TDOTDAT_DOWNLOAD_BATCH_SIZE"]
+    records = (
+        (pid, json_v1.transform_record(pid, record)["metadata"], record)
+        for pid, record in _load_records(resolved, batch_size)
+    )
+    chunks = archive_records(
+        records, current_app.config["TDOTDAT_ARCHIVE_CHUNK_SIZE"]
     )
 
-    return send_file(
-        BytesIO(serialised.encode("utf-8")),
-        mimetype="application/json",
-        download_name="results.json",
-        as_attachment=True,
+    return Response(
+        stream_with_context(chunk for chunk in chunks if chunk),
+        mimetype="application/zip",
+        headers={"Content-Disposition": "attachment; filename=records.zip"},
     )
 
-    return render_template("records/compare.html", record_list=record_list)
+
+#: Fields plotted if none are given.
+DEFAULT_PLOT_FIELDS = (
+    "wavevector.binormal_component_norm",
+    "wavevector.eigenmode.growth_rate_norm",
+)
 
 
 @blueprint.route("/plot")
 def plot():
-    return render_template("records/plot.html")
+    return render_template(
+        "records/plot.html",
+        fields=numeric_fields(record_fields()),
+        default_fields=DEFAULT_PLOT_FIELDS,
+        max_points=current_app.config["TDOTDAT_PLOT_MAX_POINTS"],
+    )
+
+
+def _plot_search():
+    """Search and fields to plot from the request."""
+    _verify_permission("list")
+
+    x = request.args.get("x", DEFAULT_PLOT_FIELDS[0])
+    y = request.args.get("y", DEFAULT_PLOT_FIELDS[1])
+    fields = numeric_fields(record_fields())
+    if x not in fields or y not in fields:
+        abort(400, "Fields must be numeric fields of the record schema.")
+    properties = current_jsonschemas.get_schema(Record._schema)["properties"]
+    if not compatible(properties, x, y):
+        abort(400, f"Values of {x} can't be paired with values of {y}.")
+
+    search, _ = default_search_factory(None, RecordsSearch(index="records"))
+    return search, x, y
+
+
+@blueprint.route("/plot/data")
+def plot_data():
+    """Columns of two fields for every record matching a search.
+
+    Takes the same ``q`` parameter as the records search, and the dotted
+    names of the ``x`` and ``y`` fields, see :mod:`tdotdat.records.plot`.
+    """
+    search, x, y = _plot_search()
+    result = scan_points(
+        search,
+        x,
+        y,
+        max_points=current_app.config["TDOTDAT_PLOT_MAX_POINTS"],
+        batch_size=current_app.config["TDOTDAT_EXPORT_BATCH_SIZE"],
+    )
+    return jsonify(
+        x=encode_column(result["x"]),
+        y=encode_column(result["y"]),
+        points=len(result["x"]),
+        records=result["records"],
+        sampled=result["sampled"],
+    )
+
+
+@blueprint.route("/plot/density")
+def plot_density():
+    """2D histogram of two fields for every record matching a search.
+
+    Takes the same parameters as :func:`plot_data`, the number of ``bins``
+    along each axis (100 by default), and the ``x_scale`` and ``y_scale`` of
+    the bins, ``linear`` (the default) or ``log``.
+    """
+    search, x, y = _plot_search()
+
+    bins = request.args.get("bins", 100, type=int)
+    if not 1 <= bins <= current_app.config["TDOTDAT_PLOT_MAX_BINS"]:
+        abort(400)
+    x_scale = request.args.get("x_scale", "linear")
+    y_scale = request.args.get("y_scale", "linear")
+    if x_scale not in SCALES or y_scale not in SCALES:
+        abort(400)
+
+    xs, ys = cached_columns(
+        search,
+        x,
+        y,
+        batch_size=current_app.config["TDOTDAT_EXPORT_BATCH_SIZE"],
+        timeout=current_app.config["TDOTDAT_PLOT_CACHE_TTL"],
+        max_points=current_app.config["TDOTDAT_PLOT_CACHE_MAX_POINTS"],
+    )
+    return jsonify(bin_points(xs, ys, bins, x_scale=x_scale, y_scale=y_scale))
 
 
 @blueprint.route("/reference")
 def reference():
-    schema = copy.deepcopy(current_jsonschemas.get_schema(Record._schema))["properties"]
-    DROP_KEYS = ["$schema", "_bucket", "_files"]
-    for key in DROP_KEYS:
-        del schema[key]
-
-    def flatten_dict(data, parent=None):
-        result = {}
-        for key, value in data.items():
-            name = f"{parent}.{key}" if parent else key
-            result[name] = {
-                "type": value["type"],
-                "description": value.get("description", ""),
-            }
-            result.update(flatten_dict(value.get("properties", {}), parent=name))
-            result.update(
-                flatten_dict(value.get("items", {}).get("properties", {}), parent=name)
+    return render_template("records/reference.html", schema=record_fields())
+
+
+EXPORT_FORMATS = {
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "csv": ("text/csv", "csv"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+}
+
+
+@blueprint.route("/export")
+def export():
+    """Export every record matching a search.
+
+    Takes the same ``q`` and ``fields`` parameters as the records search, and
+    the ``format``: ``ndjson`` (the default), ``csv`` or ``parquet``. The
+    results are streamed, see :mod:`tdotdat.records.export`.
+    """
+    _verify_permission("list")
+
+    export_format = request.args.get("format", "ndjson")
+    if export_format not in EXPORT_FORMATS:
+        abort(400)
+    if export_format == "parquet" and pyarrow is None:
+        abort(501, "Parquet export needs pyarrow to be installed.")
+
+    search, _ = search_factory(None, RecordsSearch(index="records"))
+    batch_size = current_app.config["TDOTDAT_EXPORT_BATCH_SIZE"]
+    records = scan_metadata(search, batch_size)
+    fields = record_fields()
+    names = columns(fields, requested_fields())
+
+    if export_format == "csv":
+        chunks = export_csv(records, names)
+    elif export_format == "parquet":
+        chunks = export_parquet(records, fields, names, batch_size)
+    else:
+        chunks = export_ndjson(records)
+
+    mimetype, extension = EXPORT_FORMATS[export_format]
+    return Response(
+        stream_with_context(chunks),
+        mimetype=mimetype,
+        headers={
+            "Content-Disposition": f"attachment; filename=records.{extension}"
+        },
+    )
+
+
+def _gzip(chunks):
+    """Gzip a stream of bytes."""
+    compressor = zlib.compressobj(wbits=16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def _verify_permission(action, record=None):
+    """Check permission with the factory configured for the recid REST endpoint."""
+    verify_endpoint_permission("recid", action, record)
+
+
+def _file_json(obj):
+    return dict(
+        key=obj.key,
+        bucket=str(obj.bucket_id),
+        version_id=str(obj.version_id),
+        file_id=str(obj.file_id),
+        size=obj.file.size,
+        checksum=obj.file.checksum,
+    )
+
+
+@api_blueprint.route("/checksums/<checksum>")
+def checksum_lookup(checksum):
+    """Check if a file with the given checksum has already been uploaded.
+
+    Lets clients skip sending files the server already has, and attach them
+    to a record with :func:`link_file` instead. Only files the user can read
+    are found.
+    """
+    _verify_permission("create")
+
+    file_instance = find_readable_file_instance(checksum)
+    if file_instance is None:
+        abort(404)
+
+    return jsonify(checksum=file_instance.checksum, size=file_instance.size)
+
+
+@api_blueprint.route("/<pid_value>/link/<path:key>", methods=("PUT",))
+def link_file(pid_value, key):
+    """Add an already uploaded file to a record, given its checksum.
+
+    Expects a JSON body like ``{"checksum": "md5:1234abcd..."}``. The user
+    must be allowed to update the record, and to read the existing file.
+    """
+    checksum = (request.get_json(silent=True) or {}).get("checksum")
+    if checksum is None:
+        abort(400)
+
+    resolver = Resolver(pid_type="recid", object_type="rec", getter=Record.get_record)
+    try:
+        _, record = resolver.resolve(pid_value)
+    except (PIDDoesNotExistError, PIDUnregistered, PIDRedirectedError):
+        abort(404)
+    _verify_permission("update", record)
+
+    file_instance = find_readable_file_instance(checksum)
+    records_bucket = RecordsBuckets.query.filter_by(record_id=record.id).first()
+    if file_instance is None or records_bucket is None:
+        abort(404)
+    if records_bucket.bucket.locked:
+        abort(403)
+
+    obj = link_object(records_bucket.bucket, key, file_instance)
+    db.session.commit()
+    file_uploaded.send(current_app._get_current_object(), obj=obj)
+
+    return jsonify(_file_json(obj)), 201
+
+
+@api_blueprint.route("/<pid_value>/similar")
+def similar(pid_value):
+    """Find the records with input parameters closest to a record's.
+
+    Returns the ``k`` nearest records (10 by default) with their distance in
+    normalised parameter space, see ``TDOTDAT_SIMILARITY_PARAMETERS``.
+    """
+    k = request.args.get("k", 10, type=int)
+    if not 1 <= k <= current_app.config["TDOTDAT_SIMILAR_MAX_RESULTS"]:
+        abort(400)
+
+    resolver = Resolver(pid_type="recid", object_type="rec", getter=Record.get_record)
+    try:
+        _, record = resolver.resolve(pid_value)
+    except (PIDDoesNotExistError, PIDUnregistered, PIDRedirectedError):
+        abort(404)
+    _verify_permission("read", record)
+
+    return jsonify(
+        hits=[
+            dict(
+                id=hit.id,
+                title=hit.title,
+                distance=distance,
+                links=dict(
+                    self=url_for(
+                        "invenio_records_rest.recid_item",
+                        pid_value=hit.id,
+                        _external=True,
+                    ),
+                    html=url_for(
+                        "invenio_records_ui.recid", pid_value=hit.id, _external=True
+                    ),
+                ),
             )
-        return result
+            for hit, distance in similar_records(record, k)
+        ]
+    )
+
+
+def _bulk_results(lines):
+    """Validate and create the records in a batch of NDJSON lines."""
+    schema = MetadataSchemaV1(context={})
+    results = {}
+    valid = {}
+    for line_number, line in lines:
+        try:
+            valid[line_number] = schema.load(json.loads(line))
+        except ValidationError as e:
+            results[line_number] = dict(status=400, errors=e.messages)
+        except ValueError as e:
+            results[line_number] = dict(status=400, message=str(e))
+
+    for line_number, record in zip(valid, create_records(list(valid.values()))):
+        if isinstance(record, Record):
+            results[line_number] = dict(status=201, id=record["id"])
+        else:
+            results[line_number] = dict(status=400, message=str(record))
 
-    return render_template("records/reference.html", schema=flatten_dict(schema))
+    return [dict(line=line_number, **results[line_number]) for line_number, _ in lines]
+
+
+@api_blueprint.route("/bulk", methods=("POST",))
+def bulk_create():
+    """Create many records at once from newline-delimited JSON.
+
+    Each line of the request body is the metadata of one record, as it would be
+    POSTed to the records endpoint. Lines are validated and created in batches
+    of ``TDOTDAT_BULK_BATCH_SIZE``, one transaction per batch, and queued for
+    bulk indexing. Returns one NDJSON line per input line, with the PID of the
+    new record, or the reason it couldn't be created.
+    """
+    _verify_permission("create")
+
+    batch_size = current_app.config["TDOTDAT_BULK_BATCH_SIZE"]
+    results = []
+    batch = []
+    for line_number, line in enumerate(request.stream, start=1):
+        if not line.strip():
+            continue
+        batch.append((line_number, line))
+        if len(batch) >= batch_size:
+            results.extend(_bulk_results(batch))
+            batch = []
+    if batch:
+        results.extend(_bulk_results(batch))
+
+    return Response(
+        "".join(json.dumps(result) + "\n" for result in results),
+        mimetype="application/x-ndjson",
+    )
+
+
+@api_blueprint.route("/stats")
+def stats():
+    """Indexing lag, and ingestion, equilibrium cache and file update
+    statistics."""
+    verify_record_permission(
+        obj_or_import_string(
+            current_app.config["TDOTDAT_STATS_PERMISSION_FACTORY"]),
+        None,
+    )
+    return jsonify(
+        indexing=indexing_stats(),
+        parse_cache=current_parse_cache.stats(),
+        equilibrium_cache=equilibrium_cache_stats(),
+        files_update=files_update_stats(),
+    )
+
+
+@api_blueprint.route("/eigenmodes/")
+def eigenmode_search():
+    """Search individual eigenmodes across all records.
+
+    Takes the same ``q``, ``sort``, ``page`` and ``size`` parameters as the
+    records search, e.g. ``q=ky:[0.1 TO 0.5] AND growth_rate:>0.2`` only
+    matches records with an eigenmode satisfying both conditions.
+    """
+    _verify_permission("list")
+
+    page = request.values.get("page", 1, type=int)
+    size = request.values.get("size", 10, type=int)
+    max_result_window = current_app.config["RECORDS_REST_ENDPOINTS"]["recid"].get(
+        "max_result_window", 10000
+    )
+    if page < 1 or size < 1 or page * size > max_result_window:
+        abort(400)
+
+    search, urlkwargs = default_search_factory(None, EigenmodeSearch())
+    result = search[(page - 1) * size : page * size].execute().to_dict()
+
+    def page_link(page):
+        return url_for(
+            ".eigenmode_search", page=page, size=size, _external=True, **urlkwargs
+        )
+
+    total = result["hits"]["total"]
+    if isinstance(total, dict):
+        total = total["value"]
+    links = dict(self=page_link(page))
+    if page > 1:
+        links["prev"] = page_link(page - 1)
+    if page * size < min(total, max_result_window):
+        links["next"] = page_link(page + 1)
+
+    return jsonify(
+        hits=dict(
+            hits=[
+                dict(id=hit["_id"], metadata=hit["_source"])
+                for hit in result["hits"]["hits"]
+            ],
+            total=total,
+        ),
+        aggregations=result.get("aggregations", {}),
+        links=links,
+    )
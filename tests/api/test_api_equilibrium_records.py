@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2022 TDoTP.
+#
+# TDotDat is free software; you can redistribute it and/or modify it under
+# the terms of the MIT License; see LICENSE file for more details.
+
+"""Test listing the records that use an equilibrium."""
+
+from invenio_db import db
+from invenio_records_rest.utils import deny_all
+
+from tdotdat.equilibrium.api import create_equilibrium
+from tdotdat.records.api import create_record
+
+
+def _record(title, equilibrium=None):
+    data = {"title": title, "contributors": [{"name": "Ellis"}]}
+    if equilibrium is not None:
+        data["equilibrium_id"] = int(equilibrium["id"])
+    return create_record(data)
+
+
+def _ids(client, url):
+    response = client.get(url)
+    assert response.status_code == 200
+    data = response.get_json()
+    return [hit["id"] for hit in data["hits"]["hits"]], data["links"]
+
+
+def test_equilibrium_records(client, location):
+    """Test records are listed in pages, and follow updates and deletes."""
+    first = create_equilibrium({"title": "First", "elongation": 1.7})
+    second = create_equilibrium({"title": "Second", "elongation": 1.2})
+    records = [_record(f"Run {i}", first) for i in range(3)]
+    _record("Unrelated")
+
+    url = f"https://localhost:5000/equilibrium/{first['id']}/records?size=2"
+    page, links = _ids(client, url)
+    assert len(page) == 2
+    next_page, links = _ids(client, links["next"])
+    assert len(next_page) == 1
+    assert "next" not in links
+    assert sorted(page + next_page) == sorted(int(r["id"]) for r in records)
+
+    moved = records[0]
+    moved["equilibrium_id"] = int(second["id"])
+    moved.commit()
+    removed = records[1]
+    del removed["equilibrium"]
+    removed.commit()
+    db.session.commit()
+
+    url = f"https://localhost:5000/equilibrium/{first['id']}/records"
+    assert _ids(client, url)[0] == [int(records[2]["id"])]
+    url = f"https://localhost:5000/equilibrium/{second['id']}/records"
+    assert _ids(client, url)[0] == [int(moved["id"])]
+
+    records[2].delete()
+    db.session.commit()
+    url = f"https://localhost:5000/equilibrium/{first['id']}/records"
+    assert _ids(client, url)[0] == []
+
+
+def test_equilibrium_records_missing(client, location):
+    """Test unknown equilibria and bad parameters."""
+    url = "https://localhost:5000/equilibrium/12345/records"
+    assert client.get(url).status_code == 404
+    equilibrium = create_equilibrium({"title": "First"})
+    url = f"https://localhost:5000/equilibrium/{equilibrium['id']}/records"
+    assert client.get(f"{url}?after=nonsense").status_code == 400
+    assert client.get(f"{url}?size=0").status_code == 400
+
+
+def test_equilibrium_records_permission(app, client, location, monkeypatch):
+    """Test listing records needs permission to list records."""
+    endpoint = app.config["RECORDS_REST_ENDPOINTS"]["recid"]
+    monkeypatch.setitem(endpoint, "list_permission_factory_imp", deny_all)
+    equilibrium = create_equilibrium({"title": "First"})
+    url = f"https://localhost:5000/equilibrium/{equilibrium['id']}/records"
+    assert client.get(url).status_code == 401
@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2022 TDoTP.
+#
+# TDotDat is free software; you can redistribute it and/or modify it under
+# the terms of the MIT License; see LICENSE file for more details.
+
+"""Test large arrays stored in sidecar files."""
+
+from io import BytesIO
+
+from invenio_db import db
+from invenio_files_rest.models import ObjectVersion
+from invenio_pidstore.models import PersistentIdentifier
+
+from tdotdat.records.api import Record
+from tdotdat.records.arrays import SIDECAR_PREFIX
+
+
+def _sidecar_keys(pid_value):
+    """Keys of the sidecar files in the bucket of a record."""
+    pid = PersistentIdentifier.get("recid", pid_value)
+    record = Record.get_record(pid.object_uuid)
+    return sorted(
+        obj.key for obj in ObjectVersion.get_by_bucket(record.files.bucket)
+        if obj.key.startswith(SIDECAR_PREFIX)
+    )
+
+
+def test_arrays_inline_round_trip(app, client, location, monkeypatch):
+    """Test arrays stay in sidecar files when updated with inline arrays."""
+    monkeypatch.setitem(app.config, "TDOTDAT_SIDECAR_ARRAYS_ENABLED", True)
+    monkeypatch.setitem(app.config, "TDOTDAT_SIDECAR_ARRAY_MIN_SIZE", 5)
+    time = [float(t) for t in range(10)]
+    data = {
+        "title": "Record with a long time trace",
+        "contributors": [{"name": "Ellis Jonathan"}],
+        "time": time,
+    }
+
+    response = client.post("https://localhost:5000/records/", json=data)
+    assert response.status_code == 201
+    pid_value = response.get_json()["id"]
+    url = f"https://localhost:5000/records/{pid_value}"
+
+    metadata = client.get(url).get_json()["metadata"]
+    assert "time" not in metadata
+    assert [a["path"] for a in metadata["arrays"]] == ["time"]
+    inline = client.get(f"{url}?arrays=inline").get_json()["metadata"]
+    assert inline["time"] == time
+    assert "arrays" not in inline
+    assert _sidecar_keys(pid_value) == ["arrays/time.npy"]
+
+    # A file uploaded by the user under the same prefix isn't a sidecar
+    record = Record.get_record(
+        PersistentIdentifier.get("recid", pid_value).object_uuid)
+    record.files["arrays/notes.txt"] = BytesIO(b"Not an array")
+    record.commit()
+    db.session.commit()
+
+    # Updating with the inline arrays moves them out again
+    time = [t * 2 for t in time]
+    response = client.put(url, json={**data, "time": time})
+    assert response.status_code == 200
+    metadata = client.get(url).get_json()["metadata"]
+    assert "time" not in metadata
+    assert [a["path"] for a in metadata["arrays"]] == ["time"]
+    assert metadata["arrays"][0]["max"] == 18.0
+    inline = client.get(f"{url}?arrays=inline").get_json()["metadata"]
+    assert inline["time"] == time
+    assert _sidecar_keys(pid_value) == ["arrays/notes.txt", "arrays/time.npy"]
+
+    # Arrays too short for a sidecar stay inline, and the sidecar is deleted
+    response = client.put(url, json={**data, "time": [1.0, 2.0]})
+    assert response.status_code == 200
+    metadata = client.get(url).get_json()["metadata"]
+    assert metadata["time"] == [1.0, 2.0]
+    assert "arrays" not in metadata
+    assert _sidecar_keys(pid_value) == ["arrays/notes.txt"]
@@ -7,11 +7,19 @@
 
 """Test record and files."""
 
+import hashlib
 import json
 
+from invenio_db import db
+from invenio_files_rest.models import Bucket, FileInstance, ObjectVersion
+from invenio_records_rest.utils import allow_all, deny_all
 from invenio_search import current_search
 from six import BytesIO
 
+from tdotdat.records import files
+from tdotdat.records.files import create_object, deduplicate_object
+from tdotdat.records.tasks import remove_unused_file
+
 
 def _create_record(client):
     """Create record."""
@@ -87,3 +95,134 @@ def test_files_creation_deletion(client, location):
     rec = _get_record(client, pid_value)
     assert "_bucket" not in rec
     assert rec["files"] == []
+
+
+def test_multipart_upload(client, location):
+    """Test that large files can be uploaded in parts."""
+    pid_value, _ = _create_record(client)
+
+    part_size = 5 * 1024 * 1024
+    contents = b"a" * part_size + b"b" * part_size + b"c" * 1024
+    url = "https://localhost:5000/records/{}/files/big.nc".format(pid_value)
+
+    # start the upload
+    response = client.post(
+        url + "?uploads&size={}&partSize={}".format(len(contents), part_size))
+    assert response.status_code == 200
+    upload_id = response.get_json()["id"]
+
+    # upload the parts, last one first
+    headers = [("Content-Type", "application/octet-stream")]
+    for part_number in [2, 0, 1]:
+        part = contents[part_number * part_size:(part_number + 1) * part_size]
+        response = client.put(
+            url + "?uploadId={}&partNumber={}".format(upload_id, part_number),
+            input_stream=BytesIO(part), headers=headers)
+        assert response.status_code == 200
+
+    # complete the upload
+    response = client.post(url + "?uploadId={}".format(upload_id))
+    assert response.status_code == 200
+
+    rec = _get_record(client, pid_value)
+    assert [f["key"] for f in rec["files"]] == ["big.nc"]
+    assert rec["files"][0]["size"] == len(contents)
+
+
+def _upload(client, pid_value, key, contents):
+    headers = [("Content-Type", "application/octet-stream")]
+    url = "https://localhost:5000/records/{}/files/{}".format(pid_value, key)
+    response = client.put(url, input_stream=BytesIO(contents), headers=headers)
+    assert response.status_code == 200
+    return response.get_json()
+
+
+def test_checksum_lookup_and_link(app, client, location, monkeypatch):
+    """Test files already uploaded can be found and added to other records."""
+    contents = b"shared equilibrium"
+    checksum = "md5:{}".format(hashlib.md5(contents).hexdigest())
+    first, _ = _create_record(client)
+    _upload(client, first, "eq.geqdsk", contents)
+
+    url = "https://localhost:5000/records/checksums/{}"
+    response = client.get(url.format(checksum))
+    assert response.status_code == 200
+    assert response.get_json() == dict(checksum=checksum, size=len(contents))
+    assert client.get(url.format("md5:0000")).status_code == 404
+
+    second, _ = _create_record(client)
+    link_url = "https://localhost:5000/records/{}/link/copy.geqdsk".format(second)
+    response = client.put(link_url, json={"checksum": checksum})
+    assert response.status_code == 201
+    assert response.get_json()["checksum"] == checksum
+
+    rec = _get_record(client, second)
+    assert [f["key"] for f in rec["files"]] == ["copy.geqdsk"]
+    # Both records share one copy of the contents
+    assert FileInstance.query.filter_by(checksum=checksum).count() == 1
+
+    response = client.put(link_url, json={"checksum": "md5:0000"})
+    assert response.status_code == 404
+    assert client.put(link_url, json={}).status_code == 400
+
+    # Users who can't update the record can't add files to it
+    endpoint = app.config["RECORDS_REST_ENDPOINTS"]["recid"]
+    monkeypatch.setitem(endpoint, "update_permission_factory_imp", deny_all)
+    response = client.put(link_url, json={"checksum": checksum})
+    assert response.status_code == 401
+
+    # Nor can they get a copy of a file they can't read
+    monkeypatch.setitem(endpoint, "update_permission_factory_imp", allow_all)
+    monkeypatch.setattr(files, "current_permission_factory", deny_all)
+    assert client.get(url.format(checksum)).status_code == 404
+    assert client.put(link_url, json={"checksum": checksum}).status_code == 404
+
+
+def test_remove_unused_file(app, location):
+    """Test files are only removed once no object points at them."""
+    first = ObjectVersion.create(
+        Bucket.create(), "a.in", stream=BytesIO(b"same contents"))
+    second = ObjectVersion.create(
+        Bucket.create(), "b.in", stream=BytesIO(b"same contents"))
+    db.session.commit()
+
+    orphan_id = deduplicate_object(second)
+    db.session.commit()
+    assert orphan_id is not None
+    assert second.file_id == first.file_id
+
+    remove_unused_file(str(first.file_id))
+    assert FileInstance.query.get(first.file_id) is not None
+
+    remove_unused_file(str(orphan_id))
+    assert FileInstance.query.get(orphan_id) is None
+
+    # Already removed
+    remove_unused_file(str(orphan_id))
+
+
+class UnseekableStream(BytesIO):
+    def seekable(self):
+        return False
+
+
+def test_create_object(app, location):
+    """Test duplicates are linked, and nothing is committed."""
+    first = ObjectVersion.create(
+        Bucket.create(), "a.in", stream=BytesIO(b"same contents"))
+    db.session.commit()
+
+    # The checksum of seekable streams is known before storing them
+    obj, orphan_id = create_object(
+        Bucket.create(), "b.in", BytesIO(b"same contents"))
+    assert orphan_id is None
+    assert obj.file_id == first.file_id
+
+    # Other streams are stored, and then deduplicated
+    obj, orphan_id = create_object(
+        Bucket.create(), "c.in", UnseekableStream(b"same contents"))
+    assert orphan_id is not None
+    assert obj.file_id == first.file_id
+
+    db.session.rollback()
+    assert ObjectVersion.query.filter_by(file_id=first.file_id).count() == 1
@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2022 TDoTP.
+#
+# TDotDat is free software; you can redistribute it and/or modify it under
+# the terms of the MIT License; see LICENSE file for more details.
+
+"""Test bulk record creation."""
+
+import json
+
+from invenio_indexer.api import RecordIndexer
+from invenio_search import current_search
+
+
+def test_bulk_create(client, location):
+    """Test creating records from NDJSON, with per-line results."""
+    lines = [
+        {"title": "First bulk record", "contributors": [{"name": "Ellis"}]},
+        {"contributors": [{"name": "No title"}]},
+        {"title": "Second bulk record", "contributors": [{"name": "Ellis"}]},
+    ]
+    body = "\n".join(json.dumps(line) for line in lines) + "\nnot json\n"
+
+    response = client.post(
+        "https://localhost:5000/records/bulk",
+        data=body,
+        headers=[("Content-Type", "application/x-ndjson")],
+    )
+    assert response.status_code == 200
+    results = [json.loads(line) for line in response.data.splitlines()]
+    assert [r["line"] for r in results] == [1, 2, 3, 4]
+    assert [r["status"] for r in results] == [201, 400, 201, 400]
+    assert "title" in results[1]["errors"]
+
+    RecordIndexer().process_bulk_queue()
+    current_search.flush_and_refresh("records")
+
+    for result in (results[0], results[2]):
+        response = client.get(
+            "https://localhost:5000/records/{}".format(result["id"]))
+        assert response.status_code == 200
+
+    response = client.get("https://localhost:5000/records/?q=bulk")
+    assert response.get_json()["hits"]["total"] == 2
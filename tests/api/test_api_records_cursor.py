@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2022 TDoTP.
+#
+# TDotDat is free software; you can redistribute it and/or modify it under
+# the terms of the MIT License; see LICENSE file for more details.
+
+"""Test cursor pagination of search results."""
+
+import json
+from urllib.parse import parse_qs, urlsplit
+
+from invenio_indexer.api import RecordIndexer
+from invenio_search import current_search
+
+from tdotdat.records.cursor import decode_cursor
+
+
+def _create_records(client, created, titles):
+    for title in titles:
+        response = client.post(
+            "https://localhost:5000/records/",
+            data=json.dumps(
+                {"title": title, "contributors": [{"name": "Ellis"}]}
+            ),
+            headers=[("Content-Type", "application/json")],
+        )
+        assert response.status_code == 201
+        created.add(response.get_json()["id"])
+    RecordIndexer().process_bulk_queue()
+    current_search.flush_and_refresh("records")
+
+
+def _walk(client, url, during=None):
+    """IDs of the hits of every page, and the cursors of the next links."""
+    seen = []
+    cursors = []
+    while url:
+        response = client.get(url)
+        assert response.status_code == 200
+        data = response.get_json()
+        seen.extend(hit["id"] for hit in data["hits"]["hits"])
+        assert "prev" not in data["links"]
+        url = data["links"].get("next")
+        if url:
+            cursors.append(decode_cursor(parse_qs(urlsplit(url).query)["cursor"][0]))
+            if during is not None:
+                during()
+                during = None
+    return seen, cursors
+
+
+def test_cursor_pagination(client, location):
+    """Test following next links visits every record once."""
+    created = set()
+    _create_records(client, created, [f"Cursor record {n}" for n in range(3)])
+
+    url = "https://localhost:5000/records/?q=cursor&size=2&cursor="
+    seen, cursors = _walk(client, url)
+    assert sorted(seen) == sorted(created)
+    # Pages are taken from the same point in time by default
+    assert len({cursor["pit"] for cursor in cursors}) == 1
+
+    response = client.get("https://localhost:5000/records/?cursor=nonsense")
+    assert response.status_code == 400
+
+
+def test_cursor_point_in_time(app, client, location, monkeypatch):
+    """Test records added during a walk don't shift its pages."""
+    created = set()
+    _create_records(client, created, [f"Snapshot record {n}" for n in range(4)])
+    url = "https://localhost:5000/records/?q=snapshot&size=2&cursor="
+
+    def add_record():
+        _create_records(client, set(), ["Snapshot record added later"])
+
+    seen, _ = _walk(client, url, during=add_record)
+    assert sorted(seen) == sorted(created)
+
+    # Without a point in time, cursors only carry the search_after values
+    monkeypatch.setitem(app.config, "TDOTDAT_CURSOR_KEEP_ALIVE", None)
+    seen, cursors = _walk(client, url)
+    assert len(seen) == 5
+    assert all("pit" not in cursor for cursor in cursors)
@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2022 TDoTP.
+#
+# TDotDat is free software; you can redistribute it and/or modify it under
+# the terms of the MIT License; see LICENSE file for more details.
+
+"""Test searching records by their equilibrium."""
+
+from invenio_db import db
+from invenio_indexer.api import RecordIndexer
+from invenio_search import current_search
+
+from tdotdat.equilibrium.api import create_equilibrium
+from tdotdat.records.api import create_record
+
+
+def _index():
+    RecordIndexer().process_bulk_queue()
+    current_search.flush_and_refresh("records")
+    current_search.flush_and_refresh("equilibrium")
+
+
+def test_equilibrium_fields(client, location):
+    """Test equilibrium fields are searchable, and updated with it."""
+    equilibrium = create_equilibrium({"title": "Elongated", "elongation": 1.7})
+    create_record(
+        {
+            "title": "Uses an equilibrium",
+            "contributors": [{"name": "Ellis"}],
+            "equilibrium_id": int(equilibrium["id"]),
+        }
+    )
+    _index()
+
+    url = "https://localhost:5000/records/?q=equilibrium_fields.elongation:>1.5"
+    hits = client.get(url).get_json()["hits"]
+    assert hits["total"] == 1
+    # Hits keep the reference, rather than a partial copy of the equilibrium
+    equilibrium_ref = hits["hits"][0]["metadata"]["equilibrium"]
+    assert list(equilibrium_ref) == ["$ref"]
+    assert equilibrium_ref["$ref"].endswith(f"/equilibrium/{equilibrium['id']}")
+
+    equilibrium["elongation"] = 1.2
+    equilibrium.commit()
+    db.session.commit()
+    RecordIndexer().bulk_index([str(equilibrium.id)])
+    # Once for the equilibrium, then for the records using it
+    _index()
+    _index()
+
+    assert client.get(url).get_json()["hits"]["total"] == 0
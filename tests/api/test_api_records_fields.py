@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2022 TDoTP.
+#
+# TDotDat is free software; you can redistribute it and/or modify it under
+# the terms of the MIT License; see LICENSE file for more details.
+
+"""Test field projection on the records and equilibrium endpoints."""
+
+import json
+
+from invenio_indexer.api import RecordIndexer
+from invenio_search import current_search
+
+from tdotdat.equilibrium.api import create_equilibrium
+
+
+def test_fields(client, location):
+    """Test only the requested metadata fields are returned."""
+    response = client.post(
+        "https://localhost:5000/records/",
+        data=json.dumps(
+            {
+                "title": "Projected record",
+                "contributors": [{"name": "Ellis"}],
+                "flux_surface": {"q": 2.0, "elongation": 1.5},
+            }
+        ),
+        headers=[("Content-Type", "application/json")],
+    )
+    assert response.status_code == 201
+    recid = response.get_json()["id"]
+
+    response = client.get(
+        "https://localhost:5000/records/{}?fields=flux_surface.q".format(recid))
+    assert response.status_code == 200
+    assert response.get_json()["metadata"] == {"flux_surface": {"q": 2.0}}
+
+    RecordIndexer().process_bulk_queue()
+    current_search.flush_and_refresh("records")
+
+    response = client.get(
+        "https://localhost:5000/records/?q=projected&fields=title")
+    assert response.status_code == 200
+    hits = response.get_json()["hits"]["hits"]
+    assert [hit["metadata"] for hit in hits] == [{"title": "Projected record"}]
+    assert hits[0]["id"] == recid
+
+    response = client.get(
+        "https://localhost:5000/records/{}?fields=nonsense".format(recid))
+    assert response.status_code == 400
+
+
+def test_fields_validated(client):
+    """Test unknown fields are rejected before searching."""
+    for fields in ["nonsense", "title,flux_surface.nonsense", "title.length"]:
+        response = client.get(
+            "https://localhost:5000/records/?fields={}".format(fields))
+        assert response.status_code == 400
+        assert response.get_json()["errors"][0]["field"] == "fields"
+
+    for fields in ["species.charge_norm", "wavevector.eigenmode.growth_rate_norm",
+                   "equilibrium.elongation", "summary.max_growth_rate"]:
+        response = client.get(
+            "https://localhost:5000/records/?fields={}".format(fields))
+        assert response.status_code == 200
+
+
+def test_equilibrium_fields(client, location):
+    """Test fields are checked against the equilibrium metadata."""
+    equilibrium = create_equilibrium(
+        {"title": "Projected equilibrium", "elongation": 1.7, "q": 3.0})
+    RecordIndexer().process_bulk_queue()
+    current_search.flush_and_refresh("equilibrium")
+
+    response = client.get(
+        "https://localhost:5000/equilibrium/?q=projected&fields=q,elongation")
+    assert response.status_code == 200
+    hits = response.get_json()["hits"]["hits"]
+    assert [hit["metadata"] for hit in hits] == [{"q": 3.0, "elongation": 1.7}]
+    assert hits[0]["id"] == int(equilibrium["id"])
+
+    # Record fields aren't equilibrium fields
+    response = client.get(
+        "https://localhost:5000/equilibrium/?fields=flux_surface.q")
+    assert response.status_code == 400
@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2022 TDoTP.
+#
+# TDotDat is free software; you can redistribute it and/or modify it under
+# the terms of the MIT License; see LICENSE file for more details.
+
+"""Test batching of the bulk indexing queue."""
+
+from types import SimpleNamespace
+
+from invenio_indexer.api import RecordIndexer
+from sqlalchemy.orm.exc import NoResultFound
+
+from tdotdat.records import indexer
+
+
+class FakeMessage:
+    def __init__(self, record_id):
+        self.record_id = record_id
+        self.state = None
+
+    def decode(self):
+        return dict(id=self.record_id, op='index')
+
+    def ack(self):
+        self.state = 'acked'
+
+    def reject(self):
+        self.state = 'rejected'
+
+
+class FakeConsumer:
+    """Hands out the messages queued at the time of each fetch."""
+
+    def __init__(self, clock, arrivals):
+        self.clock = clock
+        self.arrivals = list(arrivals)
+
+    def fetch(self):
+        if self.arrivals and self.arrivals[0][0] <= self.clock.now:
+            return self.arrivals.pop(0)[1]
+        return None
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+class FakeIndexer:
+    """Builds actions like the real indexer, failing for missing records."""
+
+    client = None
+    _actionsiter = RecordIndexer._actionsiter
+
+    def _index_action(self, payload):
+        if payload['id'] == 'missing':
+            raise NoResultFound()
+        if payload['id'] == 'broken':
+            raise ValueError('Invalid record')
+        return dict(_id=payload['id'], _source={})
+
+
+def _collect(monkeypatch, arrivals, batch_size=3, max_delay=1.0):
+    clock = FakeClock()
+    monkeypatch.setattr(indexer, 'time', clock)
+    consumer = FakeConsumer(clock, arrivals)
+    batch = indexer._collect_batch(consumer, batch_size, max_delay, 0.1)
+    return [message.record_id for message in batch], clock.now, consumer
+
+
+def test_collect_batch_size(monkeypatch):
+    """Test a batch stops at the batch size, leaving the rest queued."""
+    arrivals = [(0, FakeMessage(str(i))) for i in range(5)]
+    ids, now, consumer = _collect(monkeypatch, arrivals)
+    assert ids == ['0', '1', '2']
+    assert now == 0
+    assert len(consumer.arrivals) == 2
+
+
+def test_collect_batch_max_delay(monkeypatch):
+    """Test a partial batch is sent once its first message is too old."""
+    arrivals = [(0, FakeMessage('a')), (0.5, FakeMessage('b')),
+                (5, FakeMessage('c'))]
+    ids, now, consumer = _collect(monkeypatch, arrivals)
+    assert ids == ['a', 'b']
+    assert 1.0 <= now < 1.1
+    assert len(consumer.arrivals) == 1
+
+
+def test_collect_batch_empty(monkeypatch):
+    """Test an empty queue gives an empty batch after one poll."""
+    ids, now, _ = _collect(monkeypatch, [(5, FakeMessage('a'))])
+    assert ids == []
+    assert now == 0.1
+
+
+def test_index_batch_acks_failures(app, monkeypatch):
+    """Test every message is acknowledged, even if its record fails."""
+    bulk_calls = []
+
+    def bulk(client, actions, **kwargs):
+        bulk_calls.append(kwargs)
+        actions = list(actions)
+        # The search engine rejects one of the documents
+        return len(actions) - 1, 1
+
+    monkeypatch.setattr(
+        indexer, 'search', SimpleNamespace(helpers=SimpleNamespace(bulk=bulk)))
+    lags = []
+    monkeypatch.setattr(indexer, 'record_visibility_lag', lags.append)
+
+    messages = [FakeMessage(record_id)
+                for record_id in ['a', 'missing', 'b', 'broken', 'c']]
+    indexer.index_batch(FakeIndexer(), messages)
+
+    assert [message.state for message in messages] == [
+        'acked', 'rejected', 'acked', 'rejected', 'acked']
+    assert bulk_calls[0]['raise_on_error'] is False
+    assert bulk_calls[0]['raise_on_exception'] is False
+    assert lags == [['a', 'missing', 'b', 'broken', 'c']]
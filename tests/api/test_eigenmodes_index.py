@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2022 TDoTP.
+#
+# TDotDat is free software; you can redistribute it and/or modify it under
+# the terms of the MIT License; see LICENSE file for more details.
+
+"""Test the eigenmodes index is kept in sync with the records."""
+
+from invenio_db import db
+from invenio_records.api import Record as BaseRecord
+from invenio_search import current_search
+
+from tdotdat.records import eigenmodes
+from tdotdat.records.api import Record, create_record
+from tdotdat.records.eigenmodes import EIGENMODES_INDEX, EigenmodeSearch
+from tdotdat.records.indexer import TDotDatIndexer
+
+
+def _eigenmodes(record):
+    """Revisions of the indexed eigenmodes of a record, by document ID."""
+    current_search.flush_and_refresh(EIGENMODES_INDEX)
+    search = EigenmodeSearch().filter("term", record_uuid=str(record.id))
+    return {
+        hit.meta.id: hit.record_revision
+        for hit in search.params(size=100).execute()
+    }
+
+
+def test_eigenmodes_sync(app, location):
+    """Test eigenmodes are indexed with their record, and old ones deleted."""
+    record = create_record({
+        "title": "Record with eigenmodes",
+        "contributors": [{"name": "Ellis Jonathan"}],
+        "wavevector": [
+            {
+                "binormal_component_norm": 0.1,
+                "eigenmode": [
+                    {"growth_rate_norm": 0.2, "frequency_norm": 1.0},
+                    {"growth_rate_norm": 0.5, "frequency_norm": 2.0},
+                ],
+            },
+            {
+                "binormal_component_norm": 0.3,
+                "eigenmode": [{"growth_rate_norm": 0.1}],
+            },
+        ],
+    })
+    TDotDatIndexer().process_bulk_queue()
+    assert _eigenmodes(record) == {
+        f"{record.id}-0-0": 0, f"{record.id}-0-1": 0, f"{record.id}-1-0": 0,
+    }
+
+    record = Record.get_record(record.id)
+    del record["wavevector"][0]
+    record.commit()
+    db.session.commit()
+    TDotDatIndexer().bulk_index([str(record.id)])
+    TDotDatIndexer().process_bulk_queue()
+    assert _eigenmodes(record) == {f"{record.id}-0-0": 1}
+
+    record.delete()
+    db.session.commit()
+    assert _eigenmodes(record) == {}
+
+
+def test_delete_other_records(app, monkeypatch):
+    """Test deleting records of other classes leaves eigenmodes alone."""
+    deleted = []
+    monkeypatch.setattr(eigenmodes, "delete_eigenmodes", deleted.append)
+
+    record = BaseRecord.create({"title": "Not a simulation"})
+    record.delete()
+    db.session.commit()
+    assert deleted == []
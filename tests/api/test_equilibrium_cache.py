@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2022 TDoTP.
+#
+# TDotDat is free software; you can redistribute it and/or modify it under
+# the terms of the MIT License; see LICENSE file for more details.
+
+"""Test caching of resolved equilibria."""
+
+from invenio_cache import current_cache
+from invenio_db import db
+
+from tdotdat.equilibrium.api import create_equilibrium
+from tdotdat.records.jsonresolvers import (
+    CACHE_PREFIX,
+    equilibrium_cache_stats,
+    record_jsonresolver,
+)
+
+
+def test_equilibrium_cache(app, location):
+    """Test equilibria are resolved once per request, and reloaded on change."""
+    equilibrium = create_equilibrium({"title": "Cached equilibrium", "q": 2.0})
+    equid = equilibrium["id"]
+
+    with app.test_request_context():
+        first = record_jsonresolver(equid)
+        second = record_jsonresolver(equid)
+        assert first == second
+        assert first is not second
+        assert first["q"] == 2.0
+        assert "_bucket" not in first
+        assert equilibrium_cache_stats()["request_hits"] >= 1
+
+    with app.test_request_context():
+        assert record_jsonresolver(equid)["q"] == 2.0
+
+        equilibrium["q"] = 3.0
+        equilibrium.commit()
+        # Only forgotten once committed, so nothing can cache the old
+        # version again in between
+        assert current_cache.get(f"{CACHE_PREFIX}{equid}") is not None
+        db.session.commit()
+        assert current_cache.get(f"{CACHE_PREFIX}{equid}") is None
+
+        assert record_jsonresolver(equid)["q"] == 3.0
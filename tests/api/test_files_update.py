@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2022 TDoTP.
+#
+# TDotDat is free software; you can redistribute it and/or modify it under
+# the terms of the MIT License; see LICENSE file for more details.
+
+"""Test updates of record files are coalesced per bucket."""
+
+import uuid
+from types import SimpleNamespace
+
+from sqlalchemy.orm.exc import StaleDataError
+
+from tdotdat.records import tasks
+from tdotdat.records.api import create_record
+
+
+def test_files_update_coalesced(app, location, monkeypatch):
+    """Test a burst of file signals schedules one update per bucket."""
+    scheduled = []
+    monkeypatch.setattr(
+        tasks.update_record_files_by_bucket,
+        "apply_async",
+        lambda kwargs, countdown: scheduled.append(kwargs["bucket_id"]),
+    )
+    before = tasks.files_update_stats()
+
+    bucket_id = uuid.uuid4()
+    obj = SimpleNamespace(bucket_id=bucket_id)
+    other = SimpleNamespace(bucket_id=uuid.uuid4())
+    for _ in range(20):
+        tasks.update_record_files_async(None, obj)
+    tasks.update_record_files_async(None, other)
+    assert scheduled == [str(bucket_id), str(other.bucket_id)]
+
+    # Once the update runs, later files schedule another
+    tasks.update_record_files_by_bucket(str(bucket_id))
+    tasks.update_record_files_async(None, obj)
+    assert scheduled[-1] == str(bucket_id)
+    assert len(scheduled) == 3
+
+    after = tasks.files_update_stats()
+    assert after["signals"] - before["signals"] == 22
+    assert after["tasks"] - before["tasks"] == 3
+
+
+def test_files_update_stale(app, location, monkeypatch):
+    """Test an update clashing with another change is tried again."""
+    scheduled = []
+    monkeypatch.setattr(
+        tasks.update_record_files_by_bucket,
+        "apply_async",
+        lambda kwargs, countdown: scheduled.append(kwargs["bucket_id"]),
+    )
+    record = create_record({
+        "title": "Record with files",
+        "contributors": [{"name": "Ellis Jonathan"}],
+    })
+    bucket_id = str(record.files.bucket.id)
+
+    class StaleRecord:
+        files = SimpleNamespace(flush=lambda: None)
+
+        @classmethod
+        def get_record(cls, id_):
+            return cls()
+
+        def commit(self):
+            raise StaleDataError()
+
+    monkeypatch.setattr(tasks, "Record", StaleRecord)
+    before = tasks.files_update_stats()
+    tasks.update_record_files_by_bucket(bucket_id)
+
+    assert scheduled == [bucket_id]
+    after = tasks.files_update_stats()
+    assert after["stale"] - before["stale"] == 1
+    assert after["tasks"] - before["tasks"] == 1
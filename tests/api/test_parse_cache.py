@@ -0,0 +1,28 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2022 TDoTP.
+#
+# TDotDat is free software; you can redistribute it and/or modify it under
+# the terms of the MIT License; see LICENSE file for more details.
+
+"""Test the server's cache of parsed simulations."""
+
+from tdotdat.records.proxies import current_parse_cache
+
+
+def test_parse_cache_stats(app, tmp_path, monkeypatch):
+    """Test hits and misses are counted in the application cache."""
+    monkeypatch.setattr(current_parse_cache, "directory", tmp_path)
+    before = current_parse_cache.stats()
+
+    for _ in range(3):
+        value = current_parse_cache.get_or_parse(
+            "record", ["md5:stats"], lambda: {"q": 2.0}
+        )
+        assert value == {"q": 2.0}
+
+    after = current_parse_cache.stats()
+    assert after["hits"] - before["hits"] == 2
+    assert after["misses"] - before["misses"] == 1
+    assert after["entries"] == 1
+    assert after["size"] > 0
@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2022 TDoTP.
+#
+# TDotDat is free software; you can redistribute it and/or modify it under
+# the terms of the MIT License; see LICENSE file for more details.
+
+"""Test the side effects of indexing are suppressed while reindexing."""
+
+import uuid
+from types import SimpleNamespace
+
+from tdotdat.records import eigenmodes, indexer
+
+
+def test_full_reindex(app, monkeypatch):
+    """Test equilibria don't queue their records while reindexing."""
+    record_id = uuid.uuid4()
+    queued = []
+    monkeypatch.setattr(
+        indexer, "records_using_equilibrium",
+        lambda equilibrium_id: [(record_id, "1")])
+    monkeypatch.setattr(
+        indexer.TDotDatIndexer, "bulk_index",
+        lambda self, record_ids: queued.extend(record_ids))
+    equilibrium = SimpleNamespace(id=uuid.uuid4())
+
+    with indexer.full_reindex():
+        assert indexer.in_full_reindex()
+        indexer.equilibrium_receiver(
+            None, json={"id": "1"}, record=equilibrium)
+    assert not indexer.in_full_reindex()
+    assert queued == []
+
+    indexer.equilibrium_receiver(None, json={"id": "1"}, record=equilibrium)
+    assert queued == [str(record_id)]
+
+
+def test_full_reindex_keeps_eigenmodes(app, monkeypatch):
+    """Test old eigenmodes are only deleted outside a full reindex."""
+    deleted = []
+    monkeypatch.setattr(eigenmodes, "delete_stale_eigenmodes", deleted.append)
+    record_id = str(uuid.uuid4())
+
+    class Indexer(indexer.TDotDatIndexer):
+        def _index_action(self, payload):
+            return dict(
+                _op_type="index",
+                _index=indexer.build_alias_name(eigenmodes.RECORDS_INDEX),
+                _id=payload["id"],
+                _version=2,
+                _source={"wavevector": [{"eigenmode": [{}]}]},
+            )
+
+    class Message:
+        def decode(self):
+            return dict(id=record_id, op="index")
+
+        def ack(self):
+            pass
+
+    with indexer.full_reindex():
+        actions = list(Indexer()._actionsiter([Message()]))
+    assert [action["_id"] for action in actions] == [
+        record_id, f"{record_id}-0-0"]
+    assert deleted == []
+
+    list(Indexer()._actionsiter([Message()]))
+    assert deleted == [{record_id: 2}]
@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2022 TDoTP.
+#
+# TDotDat is free software; you can redistribute it and/or modify it under
+# the terms of the MIT License; see LICENSE file for more details.
+
+"""Test resolving many PIDs at once."""
+
+import pytest
+from invenio_db import db
+from invenio_pidstore.errors import PIDDoesNotExistError, PIDRedirectedError
+from invenio_pidstore.models import PersistentIdentifier
+
+from tdotdat.records.api import Record, create_record
+from tdotdat.records.resolver import BulkResolver
+
+
+def test_bulk_resolver(app, location):
+    """Test PIDs are resolved in order, with the same errors as Resolver."""
+    records = [
+        create_record({"title": f"Resolved {n}", "contributors": [{"name": "Ellis"}]})
+        for n in range(3)
+    ]
+    pid_values = [record["id"] for record in reversed(records)]
+
+    resolver = BulkResolver(
+        pid_type="recid", object_type="rec", getter=Record.get_records
+    )
+    resolved = resolver.resolve(pid_values)
+    assert [pid.pid_value for pid, _ in resolved] == pid_values
+    assert [record.id for _, record in resolved] == [r.id for r in reversed(records)]
+
+    ids = BulkResolver(pid_type="recid", object_type="rec").resolve(pid_values[:1])
+    assert ids[0][1] == records[-1].id
+
+    with pytest.raises(PIDDoesNotExistError):
+        resolver.resolve(pid_values + ["12345"])
+
+    first, second = (
+        PersistentIdentifier.get("recid", records[n]["id"]) for n in range(2)
+    )
+    first.redirect(second)
+    db.session.commit()
+    with pytest.raises(PIDRedirectedError):
+        resolver.resolve([records[0]["id"]])
@@ -0,0 +1,26 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2022 TDoTP.
+#
+# TDotDat is free software; you can redistribute it and/or modify it under
+# the terms of the MIT License; see LICENSE file for more details.
+
+"""Test the operational statistics endpoint."""
+
+from invenio_records_rest.utils import allow_all
+
+
+def test_stats_permission(app, client, monkeypatch):
+    """Test statistics are only shown to users with permission."""
+    url = "https://localhost:5000/records/stats"
+    assert client.get(url).status_code == 401
+
+    monkeypatch.setitem(app.config, "TDOTDAT_STATS_PERMISSION_FACTORY", allow_all)
+    response = client.get(url)
+    assert response.status_code == 200
+    assert set(response.get_json()) == {
+        "indexing",
+        "parse_cache",
+        "equilibrium_cache",
+        "files_update",
+    }
@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2022 TDoTP.
+#
+# TDotDat is free software; you can redistribute it and/or modify it under
+# the terms of the MIT License; see LICENSE file for more details.
+
+"""Test moving large arrays out of record data."""
+
+from tdotdat.records.arrays import extract_arrays, remove_unused_arrays
+
+
+def test_extract_arrays():
+    """Test only large numerical arrays are moved."""
+    data = {
+        "time": list(range(10)),
+        "model": {"time_interval_norm": [1.0, 2.0]},
+        "collisions": {"collisionality_norm": ["a"] * 10},
+    }
+    arrays = extract_arrays(
+        data,
+        ["time", "model.time_interval_norm", "collisions.collisionality_norm",
+         "missing.field"],
+        min_size=5,
+    )
+
+    assert list(arrays) == ["time"]
+    assert arrays["time"].tolist() == list(range(10))
+    assert "time" not in data
+    assert data["model"] == {"time_interval_norm": [1.0, 2.0]}
+    assert data["arrays"] == [
+        dict(path="time", key="arrays/time.npy", shape=[10], dtype="float64",
+             min=0.0, max=9.0, mean=4.5),
+    ]
+
+
+def test_extract_arrays_again():
+    """Test descriptions are replaced when arrays are extracted again, and
+    dropped when the arrays are back inline."""
+    data = {"time": [1.0, 2.0], "model": {"time_interval_norm": [0.0] * 5}}
+    data["arrays"] = [
+        dict(path="time", key="arrays/time.npy"),
+        dict(path="model.time_interval_norm",
+             key="arrays/model.time_interval_norm.npy"),
+    ]
+    arrays = extract_arrays(
+        data, ["time", "model.time_interval_norm"], min_size=5)
+
+    assert list(arrays) == ["model.time_interval_norm"]
+    assert data["time"] == [1.0, 2.0]
+    assert [a["path"] for a in data["arrays"]] == ["model.time_interval_norm"]
+    assert data["arrays"][0]["shape"] == [5]
+
+    data["time"] = [1.0]
+    data["model"]["time_interval_norm"] = [1.0]
+    extract_arrays(data, ["time", "model.time_interval_norm"], min_size=5)
+    assert "arrays" not in data
+
+
+class FakeRecord(dict):
+    """Record whose bucket is a dict of keys."""
+
+    def __init__(self, data, files):
+        super().__init__(data)
+        self.files = files
+
+
+def test_remove_unused_arrays():
+    """Test only sidecars the record described before are deleted."""
+    files = {"arrays/time.npy": b"", "arrays/q.npy": b"", "arrays/notes.txt": b""}
+    previous = {"arrays": [dict(path="time", key="arrays/time.npy"),
+                           dict(path="q", key="arrays/q.npy")]}
+    record = FakeRecord({"arrays": [dict(path="q", key="arrays/q.npy")]}, files)
+
+    remove_unused_arrays(record, previous)
+    assert sorted(files) == ["arrays/notes.txt", "arrays/q.npy"]
+
+    # Deleting again does nothing
+    remove_unused_arrays(record, previous)
+    assert sorted(files) == ["arrays/notes.txt", "arrays/q.npy"]
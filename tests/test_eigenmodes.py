@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2022 TDoTP.
+#
+# TDotDat is free software; you can redistribute it and/or modify it under
+# the terms of the MIT License; see LICENSE file for more details.
+
+"""Test documents for the eigenmodes index."""
+
+from tdotdat.records.eigenmodes import eigenmode_documents, stale_eigenmodes_query
+
+
+def test_eigenmode_documents():
+    """Test there is one document per eigenmode, with the record's inputs."""
+    json = {
+        "id": "1",
+        "flux_surface": {"q": 2.0, "elongation": 1.5},
+        "species": [{"temperature_log_gradient_norm": 3.0}],
+        "wavevector": [
+            {
+                "binormal_component_norm": 0.1,
+                "eigenmode": [
+                    {"growth_rate_norm": 0.2, "frequency_norm": 1.0},
+                    {"growth_rate_norm": 0.5, "frequency_norm": 2.0},
+                ],
+            },
+            {"binormal_component_norm": 0.3, "eigenmode": [{}]},
+        ],
+    }
+
+    documents = eigenmode_documents("abc", json)
+
+    assert sorted(documents) == ["abc-0-0", "abc-0-1", "abc-1-0"]
+    document = documents["abc-0-1"]
+    assert document["record_id"] == "1"
+    assert document["record_uuid"] == "abc"
+    assert document["q"] == 2.0
+    assert document["elongation"] == 1.5
+    assert document["species"][0]["temperature_log_gradient_norm"] == 3.0
+    assert document["ky"] == 0.1
+    assert document["growth_rate"] == 0.5
+    assert document["frequency"] == 2.0
+    assert documents["abc-1-0"]["growth_rate"] is None
+
+
+def test_eigenmode_documents_empty():
+    """Test records without wavevectors have no eigenmodes."""
+    assert eigenmode_documents("abc", {"title": "No outputs"}) == {}
+
+
+def test_stale_eigenmodes_query():
+    """Test old eigenmodes are matched by record and revision."""
+    query = stale_eigenmodes_query({"abc": 2})
+
+    [clause] = query["query"]["bool"]["should"]
+    assert clause["bool"]["filter"] == [{"term": {"record_uuid": "abc"}}]
+    assert clause["bool"]["must_not"] == [
+        {"range": {"record_revision": {"gte": 2}}}
+    ]
@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2022 TDoTP.
+#
+# TDotDat is free software; you can redistribute it and/or modify it under
+# the terms of the MIT License; see LICENSE file for more details.
+
+"""Test flattening records for export."""
+
+from tdotdat.records.export import columns, export_csv, flatten_schema
+
+PROPERTIES = {
+    "title": {"type": "string"},
+    "flux_surface": {
+        "type": "object",
+        "properties": {"q": {"type": "number"}, "elongation": {"type": "number"}},
+    },
+    "species": {
+        "type": "array",
+        "items": {"properties": {"charge_norm": {"type": "number"}}},
+    },
+}
+
+
+def test_columns():
+    """Test only fields holding values become columns."""
+    fields = flatten_schema(PROPERTIES)
+
+    assert columns(fields) == [
+        "title",
+        "flux_surface.q",
+        "flux_surface.elongation",
+        "species.charge_norm",
+    ]
+    assert columns(fields, ["flux_surface"]) == [
+        "flux_surface.q",
+        "flux_surface.elongation",
+    ]
+    assert fields["species.charge_norm"]["in_array"]
+    assert not fields["flux_surface.q"]["in_array"]
+
+
+def test_export_csv():
+    """Test fields inside lists are written as JSON lists."""
+    records = [
+        {
+            "title": "Run",
+            "flux_surface": {"q": 2.0},
+            "species": [{"charge_norm": -1}, {"charge_norm": 1}],
+        }
+    ]
+    names = ["title", "flux_surface.q", "species.charge_norm"]
+
+    assert "".join(export_csv(records, names)).splitlines() == [
+        "title,flux_surface.q,species.charge_norm",
+        'Run,2.0,"[-1, 1]"',
+    ]
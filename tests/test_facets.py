@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2022 TDoTP.
+#
+# TDotDat is free software; you can redistribute it and/or modify it under
+# the terms of the MIT License; see LICENSE file for more details.
+
+"""Test numeric facets."""
+
+from tdotdat.records.facets import numeric_facets, range_filter
+
+
+def test_range_filter():
+    """Test ranges and histogram bucket keys are filter clauses."""
+    query = range_filter("flux_surface.q", interval=0.5)
+
+    assert query(["1--<2"]).to_dict() == {
+        "bool": {"filter": [{"range": {"flux_surface.q": {"gte": "1", "lt": "2"}}}]}
+    }
+    assert query(["1.5"]).to_dict() == {
+        "bool": {
+            "filter": [{"range": {"flux_surface.q": {"gte": 1.5, "lt": 2.0}}}]
+        }
+    }
+    either = query(["0.5", "1.5"]).to_dict()["bool"]["filter"][0]
+    assert len(either["bool"]["should"]) == 2
+
+
+def test_numeric_facets():
+    """Test histogram and range aggregations are built from definitions."""
+    aggs, post_filters = numeric_facets(
+        dict(
+            q=dict(field="flux_surface.q", interval=0.5),
+            beta=dict(
+                field="species_all.beta_reference",
+                ranges=[{"to": 0.01}, {"from": 0.01}],
+            ),
+        )
+    )
+
+    assert aggs["q"] == dict(
+        histogram=dict(field="flux_surface.q", interval=0.5, min_doc_count=1)
+    )
+    assert [r["key"] for r in aggs["beta"]["range"]["ranges"]] == [
+        "--<0.01",
+        "0.01--",
+    ]
+    assert set(post_filters) == {"q", "beta"}
@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2022 TDoTP.
+#
+# TDotDat is free software; you can redistribute it and/or modify it under
+# the terms of the MIT License; see LICENSE file for more details.
+
+"""Test summary quantities computed at index time."""
+
+from tdotdat.records.indexer import summarise
+
+
+def test_summarise():
+    """Test the peak growth rate is found across all eigenmodes."""
+    json = {
+        "species": [{}, {}],
+        "wavevector": [
+            {
+                "binormal_component_norm": 0.1,
+                "eigenmode": [
+                    {"growth_rate_norm": 0.2, "frequency_norm": 1.0},
+                    {"growth_rate_norm": 0.5, "frequency_norm": 2.0},
+                ],
+            },
+            {
+                "binormal_component_norm": 0.3,
+                "eigenmode": [{"frequency_norm": 3.0}],
+            },
+        ],
+    }
+
+    assert summarise(json) == dict(
+        num_wavevectors=2,
+        num_eigenmodes=3,
+        num_species=2,
+        max_growth_rate=0.5,
+        ky_at_max_growth_rate=0.1,
+        frequency_at_max_growth_rate=2.0,
+    )
+
+
+def test_summarise_empty():
+    """Test records without wavevectors only get counts."""
+    assert summarise({"title": "No outputs"}) == dict(
+        num_wavevectors=0, num_eigenmodes=0, num_species=0)
@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2022 TDoTP.
+#
+# TDotDat is free software; you can redistribute it and/or modify it under
+# the terms of the MIT License; see LICENSE file for more details.
+
+"""Test the cache of parsed simulations."""
+
+import os
+
+from tdotdat.parse_cache import ParseCache
+
+
+def test_make_key():
+    """Test keys depend on what's parsed and the checksums, in order."""
+    key = ParseCache.make_key("record", ["md5:a", "md5:b"])
+    assert key == ParseCache.make_key("record", ("md5:a", "md5:b"))
+    assert key != ParseCache.make_key("record", ["md5:b", "md5:a"])
+    assert key != ParseCache.make_key("equilibrium", ["md5:a", "md5:b"])
+
+
+def test_get_set(tmp_path):
+    """Test results are stored on disk, surviving a new cache object."""
+    cache = ParseCache(tmp_path / "cache", 2**20)
+    assert cache.get("key") is None
+
+    cache.set("key", {"q": 2.0})
+    assert cache.get("key") == {"q": 2.0}
+    assert ParseCache(tmp_path / "cache", 2**20).get("key") == {"q": 2.0}
+    assert [p.name for p in (tmp_path / "cache").iterdir()] == ["key.json"]
+
+
+def test_evict_least_recently_used(tmp_path):
+    """Test the least recently used entries are evicted over the limit."""
+    cache = ParseCache(tmp_path, 2**20)
+    value = {"data": "x" * 100}
+    for age, key in enumerate(["old", "used", "new"]):
+        cache.set(key, value)
+        os.utime(cache._path(key), (age, age))
+    # Reading an entry makes it the most recently used
+    assert cache.get("old") == value
+
+    entry_size = cache._path("new").stat().st_size
+    cache.max_size = 2 * entry_size
+    cache.evict()
+    assert cache.get("used") is None
+    assert cache.get("old") == value
+    assert cache.get("new") == value
+
+
+def test_get_or_parse(tmp_path):
+    """Test files are only parsed when their checksums haven't been seen."""
+    cache = ParseCache(tmp_path, 2**20)
+    parsed = []
+
+    def parse():
+        parsed.append(True)
+        return {"q": 2.0}
+
+    assert cache.get_or_parse("record", ["md5:a"], parse) == {"q": 2.0}
+    assert cache.get_or_parse("record", ["md5:a"], parse) == {"q": 2.0}
+    assert len(parsed) == 1
+    cache.get_or_parse("record", ["md5:b"], parse)
+    assert len(parsed) == 2
@@ -0,0 +1,161 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2022 TDoTP.
+#
+# TDotDat is free software; you can redistribute it and/or modify it under
+# the terms of the MIT License; see LICENSE file for more details.
+
+"""Test extracting columns of values to plot."""
+
+import array
+import base64
+
+from tdotdat.records import plot
+from tdotdat.records.plot import (
+    bin_points,
+    cached_columns,
+    compatible,
+    encode_column,
+    list_fields,
+    points,
+)
+
+PROPERTIES = {
+    "flux_surface": {
+        "type": "object",
+        "properties": {"q": {"type": "number"}},
+    },
+    "species": {
+        "type": "array",
+        "items": {"properties": {"charge_norm": {"type": "number"}}},
+    },
+    "wavevector": {
+        "type": "array",
+        "items": {
+            "properties": {
+                "binormal_component_norm": {"type": "number"},
+                "eigenmode": {
+                    "type": "array",
+                    "items": {"properties": {"growth_rate_norm": {"type": "number"}}},
+                },
+            }
+        },
+    },
+}
+
+RECORD = {
+    "flux_surface": {"q": 2.0},
+    "wavevector": [
+        {"binormal_component_norm": 0.1, "eigenmode": [{"growth_rate_norm": 1.0}]},
+        {
+            "binormal_component_norm": 0.2,
+            "eigenmode": [{"growth_rate_norm": 2.0}, {"growth_rate_norm": 3.0}],
+        },
+    ],
+}
+
+KY = "wavevector.binormal_component_norm"
+GROWTH_RATE = "wavevector.eigenmode.growth_rate_norm"
+
+
+def test_compatible():
+    """Test fields can only be paired if their lists are nested."""
+    assert list_fields(PROPERTIES, GROWTH_RATE) == [
+        "wavevector",
+        "wavevector.eigenmode",
+    ]
+    assert compatible(PROPERTIES, KY, GROWTH_RATE)
+    assert compatible(PROPERTIES, "flux_surface.q", "species.charge_norm")
+    assert not compatible(PROPERTIES, "species.charge_norm", KY)
+
+
+def test_points():
+    """Test values in fewer lists are repeated for the other's items."""
+    assert list(points(RECORD, KY, GROWTH_RATE)) == [
+        (0.1, 1.0),
+        (0.2, 2.0),
+        (0.2, 3.0),
+    ]
+    assert list(points(RECORD, GROWTH_RATE, "flux_surface.q")) == [
+        (1.0, 2.0),
+        (2.0, 2.0),
+        (3.0, 2.0),
+    ]
+    assert list(points(RECORD, KY, "flux_surface.elongation")) == []
+
+
+def test_encode_column():
+    """Test columns are encoded as little-endian float32."""
+    encoded = encode_column(array.array("f", [1.0, 2.5]))
+    assert encoded["dtype"] == "f4"
+    assert base64.b64decode(encoded["bdata"]) == b"\x00\x00\x80?\x00\x00 @"
+
+
+def test_bin_points():
+    """Test points are binned on linear and log scales."""
+    xs = [1.0, 2.0, 3.0, 4.0]
+    ys = [1.0, 10.0, 100.0, 0.0]
+
+    result = bin_points(xs, ys, bins=2)
+    assert result["x_edges"] == [1.0, 2.5, 4.0]
+    assert result["y_edges"] == [0.0, 50.0, 100.0]
+    assert result["counts"] == [[2, 1], [0, 1]]
+    assert result["points"] == 4
+
+    result = bin_points(xs, ys, bins=2, y_scale="log")
+    # The point at y = 0 can't be shown on a log scale
+    assert result["points"] == 3
+    assert result["y_edges"] == [1.0, 10.0, 100.0]
+    assert result["counts"] == [[1, 0], [0, 2]]
+
+
+class FakeSearch:
+    """Just enough of a search to build cache keys from."""
+
+    _index = ["records"]
+
+    def source(self, fields):
+        return self
+
+    def to_dict(self):
+        return {"query": {"match_all": {}}}
+
+
+class FakeCache(dict):
+    def set(self, key, value, timeout=None):
+        self[key] = value
+
+
+def test_cached_columns(monkeypatch):
+    """Test columns are scanned once for each search, unless too large."""
+    cache = FakeCache()
+    scans = []
+
+    def collect_points(body, index, x, y, batch_size):
+        scans.append((x, y))
+        return array.array("f", [1.0, 2.0]), array.array("f", [1.0, 10.0])
+
+    monkeypatch.setattr(plot, "current_cache", cache)
+    monkeypatch.setattr(plot, "_collect_points", collect_points)
+
+    def columns(y, max_points=10):
+        return cached_columns(
+            FakeSearch(), "a", y, batch_size=10, timeout=60, max_points=max_points
+        )
+
+    xs, ys = columns("b")
+    assert list(xs) == [1.0, 2.0]
+    assert list(ys) == [1.0, 10.0]
+    # Binned differently without scanning again
+    assert bin_points(*columns("b"), bins=2, y_scale="log")["points"] == 2
+    assert len(scans) == 1
+
+    columns("c")
+    assert len(scans) == 2
+    assert len(cache) == 2
+
+    # Too many points to cache
+    columns("d", max_points=1)
+    columns("d", max_points=1)
+    assert len(scans) == 4
+    assert len(cache) == 2
@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2022 TDoTP.
+#
+# TDotDat is free software; you can redistribute it and/or modify it under
+# the terms of the MIT License; see LICENSE file for more details.
+
+"""Test splitting and checkpointing reindexing."""
+
+from tdotdat.records.reindex import (
+    load_checkpoint,
+    make_ranges,
+    progress,
+    save_checkpoint,
+)
+
+
+def test_make_ranges():
+    """Test ranges cover everything between the boundaries."""
+    assert [(r["start"], r["end"]) for r in make_ranges(["b", "d"])] == [
+        (None, "b"),
+        ("b", "d"),
+        ("d", None),
+    ]
+    assert [(r["start"], r["end"]) for r in make_ranges([])] == [(None, None)]
+
+
+def test_checkpoint(tmp_path):
+    """Test progress is saved and loaded again."""
+    path = str(tmp_path / "reindex.json")
+    assert load_checkpoint(path) is None
+
+    checkpoint = dict(
+        pid_type="recid",
+        total=10,
+        ranges=make_ranges(["b"]),
+        refresh_intervals={"records-record-v1.0.0": None},
+    )
+    checkpoint["ranges"][0].update(last="a", indexed=4, failed=1)
+    save_checkpoint(path, checkpoint)
+    assert load_checkpoint(path) == checkpoint
+
+    stats = progress(checkpoint, started=0, indexed_before=4)
+    assert (stats["indexed"], stats["failed"], stats["total"]) == (4, 1, 10)
+    assert stats["rate"] == 0
@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2022 TDoTP.
+#
+# TDotDat is free software; you can redistribute it and/or modify it under
+# the terms of the MIT License; see LICENSE file for more details.
+
+"""Test parameter vectors for similarity search."""
+
+import json
+import pathlib
+
+import jsonschema
+import pytest
+
+from tdotdat.records import config
+from tdotdat.records.similarity import parameter_vector
+
+SCHEMA_PATH = (
+    pathlib.Path(__file__).parent.parent
+    / "tdotdat/records/jsonschemas/records/record-v1.0.0.json"
+)
+
+PARAMETERS = [
+    dict(path="flux_surface.q", centre=2.0, scale=0.5),
+    dict(path="species.1.temperature_log_gradient_norm", centre=3.0, scale=2.0),
+    dict(path="species_all.beta_reference", log=True, floor=1e-4, centre=-2.0,
+         scale=1.0),
+]
+
+
+def test_parameter_vector():
+    """Test parameters are normalised, and looked up in lists."""
+    json = {
+        "flux_surface": {"q": 3.0},
+        "species": [{}, {"temperature_log_gradient_norm": 7.0}],
+        "species_all": {"beta_reference": 0.0},
+    }
+
+    assert parameter_vector(json, PARAMETERS) == [2.0, 2.0, -2.0]
+
+
+def test_parameter_vector_missing():
+    """Test records missing a parameter don't get a vector."""
+    json = {"flux_surface": {"q": 3.0}, "species": [{}]}
+
+    assert parameter_vector(json, PARAMETERS) is None
+
+
+def test_parameter_vector_valid_record():
+    """Test the configured parameters are all found in a valid record."""
+    json_record = {
+        "$schema": "https://localhost/schemas/records/record-v1.0.0.json",
+        "id": "1",
+        "title": "Valid record",
+        "contributors": [{"name": "Ellis Jonathan"}],
+        "flux_surface": {
+            "q": 2.0,
+            "magnetic_shear_r_minor": 1.0,
+            "elongation": 1.5,
+            "triangularity_upper": 0.2,
+        },
+        "species": [
+            {"temperature_log_gradient_norm": 3.0,
+             "density_log_gradient_norm": 1.0},
+        ],
+        "species_all": {"beta_reference": 0.01},
+        "collisions": {"collisionality_norm": [0.01, 0.1]},
+    }
+    jsonschema.validate(json_record, json.loads(SCHEMA_PATH.read_text()))
+
+    vector = parameter_vector(json_record, config.TDOTDAT_SIMILARITY_PARAMETERS)
+
+    assert vector is not None
+    assert len(vector) == len(config.TDOTDAT_SIMILARITY_PARAMETERS)
+    assert vector == pytest.approx([0.0] * len(vector))
@@ -0,0 +1,264 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2022 TDoTP.
+#
+# TDotDat is free software; you can redistribute it and/or modify it under
+# the terms of the MIT License; see LICENSE file for more details.
+
+"""Test the bulk and multipart modes of the upload script."""
+
+import hashlib
+import itertools
+import os
+import threading
+
+import pytest
+
+import upload_run
+
+
+class FakeResponse:
+    def __init__(self, data, status_code=200):
+        self.data = data
+        self.status_code = status_code
+        self.ok = status_code < 400
+
+    def json(self):
+        return self.data
+
+
+class FakeSession:
+    """Records what was uploaded, failing uploads of files named ``fail``."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.ids = itertools.count(1)
+        self.records = {}
+        self.files = {}
+
+    def post(self, url, json=None, params=None):
+        with self.lock:
+            record_id = next(self.ids)
+            self.records[record_id] = json
+        return FakeResponse({"id": record_id})
+
+    def put(self, url, data=None, params=None, json=None):
+        key = url.rsplit("/", 1)[-1]
+        if key.startswith("fail"):
+            return FakeResponse({"message": "Disk full"}, status_code=500)
+        with self.lock:
+            self.files[url] = data.read()
+        return FakeResponse({"key": key})
+
+
+def fake_metadata(filename, contributors, title, converged, cache, outputs):
+    return {"title": title, "converged": converged}, False
+
+
+def test_bulk_upload(tmp_path, monkeypatch):
+    """Test every run is uploaded, and failed runs are reported."""
+    monkeypatch.setattr(upload_run, "make_metadata", fake_metadata)
+    runs = []
+    for name in ["first", "second", "third"]:
+        run_dir = tmp_path / name
+        run_dir.mkdir()
+        input_file = run_dir / "input.in"
+        input_file.write_text(f"{name} input")
+        output_file = run_dir / ("fail.out" if name == "second" else "output.out")
+        output_file.write_text(f"{name} output")
+        runs.append((input_file, [output_file], name))
+
+    session = FakeSession()
+    state = upload_run.UploadState()
+    failures = upload_run.bulk_upload(
+        runs,
+        server="http://localhost:5000",
+        jobs=0,
+        dedup=False,
+        state=state,
+        session=session,
+        quiet=True,
+    )
+
+    assert sorted(data["title"] for data in session.records.values()) == [
+        "first",
+        "second",
+        "third",
+    ]
+    uploaded = sorted(session.files.values())
+    assert uploaded == [
+        b"first input",
+        b"first output",
+        b"second input",
+        b"third input",
+        b"third output",
+    ]
+
+    [(input_file, error)] = failures
+    assert input_file == runs[1][0]
+    assert "Disk full" in str(error)
+    # The failed run can be resumed, the others are finished
+    assert state.record(runs[1][0]) is not None
+    assert state.record(runs[0][0]) is None
+    assert state.record(runs[2][0]) is None
+
+
+class FakePyro:
+    def __init__(self, parsed):
+        self.parsed = parsed
+
+    def to_imas(self):
+        self.parsed.append(True)
+        return {"q": 2.0}
+
+
+def test_make_metadata_cache(tmp_path, monkeypatch):
+    """Test runs are parsed again when their contents change, not their
+    modification times."""
+    parsed = []
+    monkeypatch.setattr(upload_run, "read", lambda filename: FakePyro(parsed))
+    cache = upload_run.ParseCache(tmp_path / "cache", 2**20)
+    run_dir = tmp_path / "run"
+    run_dir.mkdir()
+    input_file = run_dir / "input.in"
+    output_file = run_dir / "output.nc"
+    input_file.write_text("input")
+    output_file.write_text("output")
+
+    def make_metadata():
+        return upload_run.make_metadata(
+            input_file, ["A. N. Other"], "Run", True, cache, [output_file]
+        )
+
+    data, cached = make_metadata()
+    assert not cached
+    assert data["q"] == 2.0
+    assert data["title"] == "Run"
+
+    os.utime(input_file, (0, 0))
+    os.utime(output_file, (0, 0))
+    _, cached = make_metadata()
+    assert cached
+    assert len(parsed) == 1
+
+    output_file.write_text("different output")
+    _, cached = make_metadata()
+    assert not cached
+    assert len(parsed) == 2
+
+    # Without outputs, the files next to the input with the same stem are
+    # checksummed, but not those of other runs
+    _, cached = upload_run.make_metadata(input_file, ["A. N. Other"], cache=cache)
+    assert not cached
+    (run_dir / "other.in").write_text("another run")
+    _, cached = upload_run.make_metadata(input_file, ["A. N. Other"], cache=cache)
+    assert cached
+    (run_dir / "input.out").write_text("more output")
+    _, cached = upload_run.make_metadata(input_file, ["A. N. Other"], cache=cache)
+    assert not cached
+
+
+def _md5(data):
+    return f"md5:{hashlib.md5(data).hexdigest()}"
+
+
+class FakeMultipartSession:
+    """Multipart uploads to a single file, as the files REST API does them.
+
+    Parts already in ``parts`` belong to the upload ``upload_id``. Parts
+    numbered in ``corrupt`` are stored with their last byte dropped.
+    """
+
+    def __init__(self, upload_id=None, parts=None, corrupt=()):
+        self.lock = threading.Lock()
+        self.upload_id = upload_id
+        self.parts = dict(parts or {})
+        self.corrupt = corrupt
+        self.sent = []
+        self.completed = None
+
+    def get(self, url, params=None):
+        if params["uploadId"] != self.upload_id:
+            return FakeResponse({"message": "Not found"}, status_code=404)
+        parts = [
+            {"part_number": number, "checksum": _md5(data)}
+            for number, data in self.parts.items()
+        ]
+        return FakeResponse({"parts": parts})
+
+    def post(self, url, params=None):
+        if "uploads" in params:
+            self.upload_id = "new-upload"
+            self.parts = {}
+            return FakeResponse({"id": self.upload_id})
+        assert params["uploadId"] == self.upload_id
+        self.completed = b"".join(data for _, data in sorted(self.parts.items()))
+        return FakeResponse({"key": url.rsplit("/", 1)[-1]})
+
+    def put(self, url, data=None, params=None):
+        assert params["uploadId"] == self.upload_id
+        part_number = params["partNumber"]
+        if part_number in self.corrupt:
+            data = data[:-1]
+        with self.lock:
+            self.sent.append(part_number)
+            self.parts[part_number] = data
+        return FakeResponse({"checksum": _md5(data)})
+
+
+FILE_URL = "http://localhost:5000/api/records/1/files/output.nc"
+
+
+def _big_file(tmp_path):
+    filename = tmp_path / "output.nc"
+    filename.write_bytes(b"0123456789")
+    return filename
+
+
+def test_upload_multipart(tmp_path):
+    """Test a file is uploaded in parts, and the upload is remembered."""
+    filename = _big_file(tmp_path)
+    session = FakeMultipartSession()
+    state = upload_run.UploadState(tmp_path / "state.json")
+
+    result = upload_run.upload_multipart(
+        session, FILE_URL, filename, part_size=4, state=state
+    )
+
+    assert result == {"key": "output.nc"}
+    assert sorted(session.sent) == [0, 1, 2]
+    assert session.completed == b"0123456789"
+    resumed = upload_run.UploadState(tmp_path / "state.json")
+    assert resumed.upload_id(FILE_URL) == "new-upload"
+
+
+def test_upload_multipart_resume(tmp_path):
+    """Test only missing parts, and parts that don't match, are sent again."""
+    filename = _big_file(tmp_path)
+    state = upload_run.UploadState()
+    state.set_upload_id(FILE_URL, "old-upload")
+    # Part 1 was cut short when the upload was interrupted
+    session = FakeMultipartSession("old-upload", {0: b"0123", 1: b"45"})
+
+    upload_run.upload_multipart(session, FILE_URL, filename, part_size=4, state=state)
+
+    assert sorted(session.sent) == [1, 2]
+    assert session.completed == b"0123456789"
+    assert state.upload_id(FILE_URL) == "old-upload"
+
+    # An upload the server no longer has is started again
+    state.set_upload_id(FILE_URL, "expired-upload")
+    session = FakeMultipartSession("old-upload", {0: b"0123"})
+    upload_run.upload_multipart(session, FILE_URL, filename, part_size=4, state=state)
+    assert sorted(session.sent) == [0, 1, 2]
+    assert state.upload_id(FILE_URL) == "new-upload"
+
+
+def test_upload_multipart_checksum_mismatch(tmp_path):
+    """Test a part the server stored differently is reported."""
+    filename = _big_file(tmp_path)
+    session = FakeMultipartSession(corrupt={1})
+
+    with pytest.raises(RuntimeError, match="Checksum mismatch on upload of part 1"):
+        upload_run.upload_multipart(session, FILE_URL, filename, part_size=4)
+    assert session.completed is None
@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2022 TDoTP.
+#
+# TDotDat is free software; you can redistribute it and/or modify it under
+# the terms of the MIT License; see LICENSE file for more details.
+
+"""Test downloading multiple records."""
+
+import gzip
+import json
+import zipfile
+from io import BytesIO
+
+from invenio_db import db
+from invenio_records_rest.utils import allow_all
+
+from tdotdat.records import archive as archive_module
+from tdotdat.records.api import create_record
+
+
+def test_download(app, client, location, monkeypatch):
+    """Test records are streamed as a JSON array, gzipped if accepted."""
+    monkeypatch.setitem(app.config, "TDOTDAT_DOWNLOAD_BATCH_SIZE", 2)
+    pids = [
+        create_record(
+            {"title": f"Download {n}", "contributors": [{"name": "Ellis"}]}
+        )["id"]
+        for n in range(3)
+    ]
+    url = "/records/download/{}".format(",".join(pids))
+
+    response = client.get(url)
+    assert response.status_code == 200
+    assert [r["title"] for r in json.loads(response.data)] == [
+        "Download 0",
+        "Download 1",
+        "Download 2",
+    ]
+
+    response = client.get(url, headers=[("Accept-Encoding", "gzip")])
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert len(json.loads(gzip.decompress(response.data))) == 3
+
+    assert client.get("/records/download/12345").status_code == 404
+
+
+def test_archive(app, client, location):
+    """Test records are archived, leaving out files the user can't read."""
+    record = create_record(
+        {"title": "Archived", "contributors": [{"name": "Ellis"}]}
+    )
+    record.files["input.in"] = BytesIO(b"&parameters\n/\n")
+    record.commit()
+    db.session.commit()
+
+    response = client.get("/records/archive/{}".format(record["id"]))
+    assert response.status_code == 200
+    assert response.mimetype == "application/zip"
+    archive = zipfile.ZipFile(BytesIO(response.data))
+    assert archive.testzip() is None
+    assert archive.namelist() == ["{}/record.json".format(record["id"])]
+    metadata = json.loads(archive.read("{}/record.json".format(record["id"])))
+    assert metadata["title"] == "Archived"
+
+
+def test_archive_files(app, client, location, monkeypatch):
+    """Test files the user can read are archived with their contents."""
+    monkeypatch.setattr(archive_module, "current_permission_factory", allow_all)
+    # Read the file in several chunks
+    monkeypatch.setitem(app.config, "TDOTDAT_ARCHIVE_CHUNK_SIZE", 4)
+    contents = b"&parameters\n    nky = 16\n/\n"
+    record = create_record(
+        {"title": "Archived with files", "contributors": [{"name": "Ellis"}]}
+    )
+    record.files["input.in"] = BytesIO(contents)
+    record.commit()
+    db.session.commit()
+
+    response = client.get("/records/archive/{}".format(record["id"]))
+    assert response.status_code == 200
+    archive = zipfile.ZipFile(BytesIO(response.data))
+    assert archive.testzip() is None
+    assert archive.namelist() == [
+        "{}/record.json".format(record["id"]),
+        "{}/files/input.in".format(record["id"]),
+    ]
+    assert archive.read("{}/files/input.in".format(record["id"])) == contents
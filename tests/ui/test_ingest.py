@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2022 TDoTP.
+#
+# TDotDat is free software; you can redistribute it and/or modify it under
+# the terms of the MIT License; see LICENSE file for more details.
+
+"""Test ingesting records in a background task."""
+
+import pytest
+from invenio_accounts.testutils import create_test_user, login_user_via_session
+from invenio_db import db
+from invenio_files_rest.models import Bucket
+from invenio_pidstore.models import PersistentIdentifier
+
+from tdotdat.records.api import Record
+from tdotdat.records.tasks import ingest_job_owner, start_ingest_job
+
+
+@pytest.fixture(scope="module")
+def app_config(app_config):
+    """Run tasks eagerly, keeping their results."""
+    app_config["CELERY_TASK_ALWAYS_EAGER"] = True
+    app_config["CELERY_TASK_EAGER_PROPAGATES"] = True
+    app_config["CELERY_TASK_STORE_EAGER_RESULT"] = True
+    app_config["CELERY_RESULT_BACKEND"] = "cache"
+    app_config["CELERY_CACHE_BACKEND"] = "memory"
+    return app_config
+
+
+def test_ingest_job(app, client, location):
+    """Test a job creates the record, and its owner can poll its status."""
+    owner = create_test_user("owner@example.org")
+    other = create_test_user("other@example.org")
+
+    bucket = Bucket.create()
+    db.session.commit()
+    data = {"title": "Ingested", "contributors": [{"name": "Ellis"}]}
+    job_id = start_ingest_job(owner.id, bucket.id, data)
+    assert ingest_job_owner(job_id) == owner.id
+
+    url = f"/records/jobs/{job_id}"
+    login_user_via_session(client, email=other.email)
+    assert client.get(url).status_code == 404
+
+    login_user_via_session(client, email=owner.email)
+    status = client.get(url).get_json()
+    assert status["state"] == "SUCCESS"
+    pid = PersistentIdentifier.get("recid", status["recid"])
+    assert Record.get_record(pid.object_uuid)["title"] == "Ingested"
+    assert status["links"]["record"].endswith(f"/records/{status['recid']}")
+
+    assert client.get("/records/jobs/unknown").status_code == 404
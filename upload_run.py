@@ -1,14 +1,94 @@
 #!/usr/bin/env python3
 
 import argparse
+import glob
+import hashlib
+import math
+import os
 import pathlib
 import requests
 import json
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from requests.adapters import HTTPAdapter
 from urllib.parse import urljoin
-from typing import List
+from typing import List, Optional, Tuple
 
 import pyrokinetics
 
+try:
+    from tdotdat.parse_cache import ParseCache
+except ImportError:
+    # Caching parsed simulations needs the server package to be installed, so
+    # the keys are the same as the server's
+    ParseCache = None
+
+
+#: Files larger than this are uploaded in parts of this size. Must be no larger
+#: than the server's ``MAX_CONTENT_LENGTH``
+DEFAULT_PART_SIZE = 64 * 2**20
+
+#: Where progress is saved so that interrupted uploads can be resumed
+DEFAULT_STATE_FILE = pathlib.Path.home() / ".tdotdat_uploads.json"
+
+#: Where parsed simulations are cached
+DEFAULT_CACHE_DIR = pathlib.Path.home() / ".cache" / "tdotdat" / "parse"
+
+
+class UploadState:
+    """Progress of uploads, saved to ``path`` after every change so that an
+    interrupted upload can be resumed by running the same command again.
+
+    Keeps track of the record created for each input file, the multipart
+    upload ID for each partially uploaded file, and which files are complete
+    """
+
+    def __init__(self, path: Optional[pathlib.Path] = None):
+        self.path = path
+        self._lock = threading.Lock()
+        self._state = {"records": {}, "uploads": {}, "completed": []}
+        if path is not None and path.exists():
+            self._state.update(json.loads(path.read_text()))
+
+    def _save(self):
+        if self.path is not None:
+            self.path.write_text(json.dumps(self._state))
+
+    def record(self, input_file: pathlib.Path):
+        return self._state["records"].get(str(input_file.resolve()))
+
+    def set_record(self, input_file: pathlib.Path, record_id):
+        with self._lock:
+            self._state["records"][str(input_file.resolve())] = record_id
+            self._save()
+
+    def upload_id(self, file_url: str) -> Optional[str]:
+        return self._state["uploads"].get(file_url)
+
+    def set_upload_id(self, file_url: str, upload_id: str):
+        with self._lock:
+            self._state["uploads"][file_url] = upload_id
+            self._save()
+
+    def is_completed(self, file_url: str) -> bool:
+        return file_url in self._state["completed"]
+
+    def set_completed(self, file_url: str):
+        with self._lock:
+            self._state["uploads"].pop(file_url, None)
+            self._state["completed"].append(file_url)
+            self._save()
+
+    def finish(self, input_file: pathlib.Path, file_urls: List[str]):
+        """Forget about a run once all its files have been uploaded"""
+        with self._lock:
+            self._state["records"].pop(str(input_file.resolve()), None)
+            self._state["completed"] = [
+                url for url in self._state["completed"] if url not in file_urls
+            ]
+            self._save()
+
 
 def read(filename: pathlib.Path) -> pyrokinetics.Pyro:
     pyro = pyrokinetics.Pyro(gk_file=filename)
@@ -17,6 +97,219 @@ def read(filename: pathlib.Path) -> pyrokinetics.Pyro:
     return pyro
 
 
+def make_metadata(
+    filename: pathlib.Path,
+    contributors: Optional[List[str]] = None,
+    title: Optional[str] = None,
+    converged: bool = True,
+    cache: Optional[ParseCache] = None,
+    outputs: Optional[List[pathlib.Path]] = None,
+) -> Tuple[dict, bool]:
+    """Read a simulation and build the record metadata for it
+
+    Parsed simulations are cached by the checksums of the input file and
+    ``outputs``, the same way as on the server. Without ``outputs``, the files
+    next to the input with the same stem, such as ``run.out.nc`` for
+    ``run.in``, are checksummed instead, as that's where pyrokinetics looks
+    for outputs. Other runs in the same directory aren't checksummed
+
+    Returns the metadata, and whether the parsed simulation came from ``cache``
+    """
+
+    data = None
+    if cache:
+        if not outputs:
+            outputs = [
+                p for p in sorted(filename.parent.glob(f"{glob.escape(filename.stem)}.*"))
+                if p.is_file() and p != filename
+            ]
+        key = cache.make_key(
+            "record", [md5_checksum(f) for f in [filename, *outputs]]
+        )
+        data = cache.get(key)
+    cached = data is not None
+    if not cached:
+        data = read(filename).to_imas()
+        if cache:
+            cache.set(key, data)
+
+    data["contributors"] = [
+        {"name": contributor} for contributor in contributors or [filename.owner()]
+    ]
+    data["title"] = title or filename.name
+    data["converged"] = converged
+    return data, cached
+
+
+def make_session(server: str, token=None, pool_size: int = 10) -> requests.Session:
+    """Create a session that keeps up to ``pool_size`` connections alive"""
+
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.verify = "localhost" not in server
+    if token:
+        session.headers["Authorization"] = f"Bearer {token}"
+    return session
+
+
+def post_record(session: requests.Session, url: str, data: dict) -> dict:
+    """Create a new record from ``data``"""
+
+    r = session.post(url, json=data)
+    _check(r, "initial upload")
+    return r.json()
+
+
+def _check(r: requests.Response, action: str):
+    if not r.ok:
+        raise RuntimeError(f"Server error on {action} ({r.status_code}): {r.json()}")
+
+
+def file_url_for(url: str, record_id, filename: pathlib.Path) -> str:
+    return f"{url}/{record_id}/files/{filename.name}"
+
+
+def upload_multipart(
+    session: requests.Session,
+    file_url: str,
+    filename: pathlib.Path,
+    part_size: int = DEFAULT_PART_SIZE,
+    parallel_parts: int = 4,
+    state: Optional[UploadState] = None,
+) -> dict:
+    """Upload a file in parts of ``part_size``, ``parallel_parts`` at a time
+
+    If ``state`` has an unfinished upload of this file, only the parts that
+    are missing on the server, or whose checksum doesn't match the local file,
+    are sent again
+    """
+
+    state = state or UploadState()
+    size = filename.stat().st_size
+    uploaded = {}
+
+    upload_id = state.upload_id(file_url)
+    if upload_id is not None:
+        r = session.get(file_url, params={"uploadId": upload_id})
+        if r.ok:
+            uploaded = {
+                part["part_number"]: part["checksum"] for part in r.json()["parts"]
+            }
+        else:
+            # Upload has expired or been aborted, so start again
+            upload_id = None
+
+    if upload_id is None:
+        r = session.post(
+            file_url, params={"uploads": "", "size": size, "partSize": part_size}
+        )
+        _check(r, "starting multipart upload")
+        upload_id = r.json()["id"]
+        state.set_upload_id(file_url, upload_id)
+
+    def upload_part(part_number):
+        with open(filename, "rb") as f:
+            f.seek(part_number * part_size)
+            chunk = f.read(part_size)
+
+        checksum = f"md5:{hashlib.md5(chunk).hexdigest()}"
+        if uploaded.get(part_number) == checksum:
+            return
+
+        r = session.put(
+            file_url,
+            params={"uploadId": upload_id, "partNumber": part_number},
+            data=chunk,
+        )
+        _check(r, f"upload of part {part_number} of {filename.name}")
+        if r.json()["checksum"] != checksum:
+            raise RuntimeError(
+                f"Checksum mismatch on upload of part {part_number} of {filename.name}"
+            )
+
+    with ThreadPoolExecutor(max_workers=parallel_parts) as pool:
+        list(pool.map(upload_part, range(math.ceil(size / part_size))))
+
+    r = session.post(file_url, params={"uploadId": upload_id})
+    _check(r, f"completing multipart upload of {filename.name}")
+    return r.json()
+
+
+def md5_checksum(filename: pathlib.Path, chunk_size: int = 2**20) -> str:
+    """Checksum of a file, in the same format as the server uses"""
+
+    md5 = hashlib.md5()
+    with open(filename, "rb") as f:
+        while chunk := f.read(chunk_size):
+            md5.update(chunk)
+    return f"md5:{md5.hexdigest()}"
+
+
+def link_existing_file(
+    session: requests.Session, url: str, record_id, filename: pathlib.Path
+) -> Optional[dict]:
+    """If the server already has a file with the same contents as ``filename``,
+    add it to the record without uploading it again
+
+    Returns ``None`` if the file still needs uploading
+    """
+
+    checksum = md5_checksum(filename)
+    r = session.get(f"{url}/checksums/{checksum}")
+    if r.status_code == 404:
+        return None
+    _check(r, "checksum lookup")
+
+    r = session.put(
+        f"{url}/{record_id}/link/{filename.name}", json={"checksum": checksum}
+    )
+    _check(r, f"linking existing copy of {filename.name}")
+    return r.json()
+
+
+def upload_file(
+    session: requests.Session,
+    url: str,
+    record_id,
+    filename: pathlib.Path,
+    part_size: int = DEFAULT_PART_SIZE,
+    parallel_parts: int = 4,
+    state: Optional[UploadState] = None,
+    dedup: bool = True,
+) -> dict:
+    """Upload a single file to an existing record
+
+    If ``dedup`` is true, and the server already has a file with the same
+    checksum, that is reused instead. Files larger than ``part_size`` are
+    uploaded in parts, see `upload_multipart`
+    """
+
+    state = state or UploadState()
+    file_url = file_url_for(url, record_id, filename)
+
+    if state.is_completed(file_url):
+        return {"key": filename.name}
+
+    if dedup and (result := link_existing_file(session, url, record_id, filename)):
+        state.set_completed(file_url)
+        return result
+
+    if filename.stat().st_size > part_size:
+        result = upload_multipart(
+            session, file_url, filename, part_size, parallel_parts, state
+        )
+    else:
+        with open(filename, "rb") as f:
+            r = session.put(file_url, data=f)
+        _check(r, "file upload")
+        result = r.json()
+
+    state.set_completed(file_url)
+    return result
+
+
 def upload(
     input_file: pathlib.Path,
     data: dict,
@@ -25,45 +318,221 @@ def upload(
     endpoint="api/records",
     token=None,
     quiet=False,
+    session: Optional[requests.Session] = None,
+    max_uploads: int = 4,
+    part_size: int = DEFAULT_PART_SIZE,
+    parallel_parts: int = 4,
+    state: Optional[UploadState] = None,
+    dedup: bool = True,
 ):
 
     url = urljoin(server, endpoint)
-    verify = "localhost" not in server
-    header = {"Authorization": f"Bearer {token}"} if token else {}
+    session = session or make_session(
+        server, token, pool_size=max_uploads * parallel_parts
+    )
+    state = state or UploadState()
 
-    r = requests.post(url, json=data, verify=verify, headers=header)
+    if (new_id := state.record(input_file)) is not None:
+        result_json = {"id": new_id}
+        if not quiet:
+            print(f"Resuming upload to record with ID: {new_id}")
+    else:
+        result_json = post_record(session, url, data)
+        new_id = result_json["id"]
+        state.set_record(input_file, new_id)
+        if not quiet:
+            print(f"Created new record with ID: {new_id}")
 
-    if not r.ok:
-        raise RuntimeError(
-            f"Server error on initial upload ({r.status_code}): {r.json()}"
+    filenames = [input_file] + outputs
+    with ThreadPoolExecutor(max_workers=max_uploads) as pool:
+        result_json["files"] = list(
+            pool.map(
+                lambda filename: upload_file(
+                    session,
+                    url,
+                    new_id,
+                    filename,
+                    part_size,
+                    parallel_parts,
+                    state,
+                    dedup,
+                ),
+                filenames,
+            )
         )
 
-    result_json = r.json()
-    new_id = r.json()["id"]
-    result_json["files"] = []
+    state.finish(input_file, [file_url_for(url, new_id, f) for f in filenames])
+    return result_json
 
-    if not quiet:
-        print(f"Created new record with ID: {new_id}")
 
-    for filename in [input_file] + outputs:
-        file_url = f"{url}/{new_id}/files/{filename.name}"
+def find_runs(
+    paths: List[pathlib.Path], input_glob: str, output_glob: Optional[str] = None
+) -> List[Tuple[pathlib.Path, List[pathlib.Path], str]]:
+    """Find the simulations to upload under ``paths``
 
-        with open(filename, "rb") as f:
-            r = requests.put(file_url, data=f, verify=verify, headers=header)
+    Directories are searched for input files matching ``input_glob``; any other
+    path is taken to be an input file itself. Output files are those matching
+    ``output_glob`` in the same directory as each input file.
 
-        if not r.ok:
-            raise RuntimeError(
-                f"Server error on file upload ({r.status_code}): {r.json()}"
-            )
+    Returns a list of ``(input_file, output_files, title)``
+    """
 
-        result_json["files"].append(r.json())
+    runs = []
+    for path in paths:
+        if path.is_dir():
+            inputs = [(p, str(p.relative_to(path))) for p in sorted(path.glob(input_glob))]
+        else:
+            inputs = [(path, path.name)]
 
-    return result_json
+        for input_file, title in inputs:
+            outputs = []
+            if output_glob:
+                outputs = [
+                    p for p in sorted(input_file.parent.glob(output_glob))
+                    if p != input_file
+                ]
+            runs.append((input_file, outputs, title))
+
+    return runs
+
+
+def bulk_upload(
+    runs: List[Tuple[pathlib.Path, List[pathlib.Path], str]],
+    contributors: Optional[List[str]] = None,
+    title: Optional[str] = None,
+    converged: bool = True,
+    server="https://localhost:5000",
+    endpoint="api/records",
+    token=None,
+    quiet=False,
+    jobs: Optional[int] = None,
+    max_uploads: int = 4,
+    part_size: int = DEFAULT_PART_SIZE,
+    parallel_parts: int = 4,
+    state: Optional[UploadState] = None,
+    dedup: bool = True,
+    cache: Optional[ParseCache] = None,
+    session: Optional[requests.Session] = None,
+):
+    """Parse and upload many simulations at once
+
+    Runs are parsed in a pool of ``jobs`` processes, or in this process if
+    ``jobs`` is 0. As each one finishes, its record is created and its files
+    are queued for upload, with at most ``max_uploads`` files in flight over a
+    shared pool of connections. Runs that were partly uploaded according to
+    ``state`` are resumed.
+
+    Returns a list of ``(input_file, error)`` for the runs that failed
+    """
+
+    url = urljoin(server, endpoint)
+    session = session or make_session(
+        server, token, pool_size=max_uploads * parallel_parts
+    )
+    state = state or UploadState()
+    if jobs == 0:
+        parsers = ThreadPoolExecutor(max_workers=1)
+    else:
+        parsers = ProcessPoolExecutor(max_workers=jobs)
+
+    start = time.perf_counter()
+    n_records = 0
+    n_files = 0
+    n_bytes = 0
+    n_cache_hits = 0
+    n_cache_misses = 0
+    failures = []
+
+    with parsers, ThreadPoolExecutor(max_workers=max_uploads) as uploaders:
+        parsing = {
+            parsers.submit(
+                make_metadata,
+                input_file,
+                contributors,
+                f"{title}: {run_title}" if title else run_title,
+                converged,
+                cache,
+                outputs,
+            ): (input_file, outputs)
+            for input_file, outputs, run_title in runs
+        }
+
+        uploading = {}
+        pending = {}
+        for future in as_completed(parsing):
+            input_file, outputs = parsing[future]
+            if (record_id := state.record(input_file)) is None:
+                try:
+                    data, cached = future.result()
+                    n_cache_hits += cached
+                    n_cache_misses += not cached
+                    record_id = post_record(session, url, data)["id"]
+                except Exception as e:
+                    failures.append((input_file, e))
+                    continue
+                state.set_record(input_file, record_id)
+
+            n_records += 1
+            if not quiet:
+                print(f"Uploading files to record with ID {record_id} for {input_file}")
+
+            filenames = [input_file] + outputs
+            pending[input_file] = (record_id, filenames, len(filenames))
+            for filename in filenames:
+                upload_future = uploaders.submit(
+                    upload_file,
+                    session,
+                    url,
+                    record_id,
+                    filename,
+                    part_size,
+                    parallel_parts,
+                    state,
+                    dedup,
+                )
+                uploading[upload_future] = (input_file, filename)
+
+        failed_runs = set()
+        for future in as_completed(uploading):
+            input_file, filename = uploading[future]
+            record_id, filenames, remaining = pending[input_file]
+            pending[input_file] = (record_id, filenames, remaining - 1)
+            try:
+                future.result()
+                n_files += 1
+                n_bytes += filename.stat().st_size
+            except Exception as e:
+                failures.append((input_file, e))
+                failed_runs.add(input_file)
+
+            # Keep the state of runs with failed files, so they're resumed
+            if remaining == 1 and input_file not in failed_runs:
+                state.finish(
+                    input_file, [file_url_for(url, record_id, f) for f in filenames]
+                )
+
+    elapsed = time.perf_counter() - start
+    print(
+        f"Uploaded {n_records} records ({n_files} files, {n_bytes / 2**20:.1f} MiB) "
+        f"in {elapsed:.1f} s: {n_records / elapsed:.2f} records/s, "
+        f"{n_bytes / 2**20 / elapsed:.2f} MiB/s, {len(failures)} failures"
+    )
+    if cache:
+        print(f"Parse cache: {n_cache_hits} hits, {n_cache_misses} misses")
+    for input_file, error in failures:
+        print(f"  {input_file}: {error}")
+
+    return failures
 
 
 def run():
     parser = argparse.ArgumentParser("Upload simulation to TDoTDat")
-    parser.add_argument("filename", help="Name of input file", type=pathlib.Path)
+    parser.add_argument(
+        "filename",
+        help="Name of input file, or with --bulk, input files and/or directories of runs",
+        type=pathlib.Path,
+        nargs="+",
+    )
     parser.add_argument(
         "--outputs",
         help="Name of output file(s)",
@@ -81,7 +550,7 @@ def run():
         "--title",
         default=None,
         type=str,
-        help="Title of simulation, default is input file name",
+        help="Title of simulation, default is input file name. With --bulk, used as a prefix",
     )
     parser.add_argument(
         "--unconverged", action="store_true", help="Is the simulation NOT converged?"
@@ -95,24 +564,131 @@ def run():
     parser.add_argument(
         "--token", help="Personal Access Token. Required for authentication"
     )
+    parser.add_argument(
+        "--bulk",
+        action="store_true",
+        help="Upload every run found in the given files/directories",
+    )
+    parser.add_argument(
+        "--input-glob",
+        default="**/*.in",
+        help="With --bulk, pattern matching input files in directories",
+    )
+    parser.add_argument(
+        "--output-glob",
+        default=None,
+        help="With --bulk, pattern matching output files next to each input file",
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=os.cpu_count(),
+        help="With --bulk, number of processes used to parse runs, 0 to parse in this one",
+    )
+    parser.add_argument(
+        "--max-uploads",
+        type=int,
+        default=4,
+        help="Maximum number of files to upload at once",
+    )
+    parser.add_argument(
+        "--part-size",
+        type=int,
+        default=DEFAULT_PART_SIZE // 2**20,
+        help="Upload files larger than this (in MiB) in parts of this size",
+    )
+    parser.add_argument(
+        "--parallel-parts",
+        type=int,
+        default=4,
+        help="Maximum number of parts of each file to upload at once",
+    )
+    parser.add_argument(
+        "--state-file",
+        type=pathlib.Path,
+        default=DEFAULT_STATE_FILE,
+        help="File to save upload progress in, so interrupted uploads can be resumed",
+    )
+    parser.add_argument(
+        "--no-dedup",
+        action="store_true",
+        help="Always upload files, even if the server already has an identical copy",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        type=pathlib.Path,
+        default=DEFAULT_CACHE_DIR,
+        help="Directory to cache parsed simulations in",
+    )
+    parser.add_argument(
+        "--cache-size",
+        type=int,
+        default=1024,
+        help="Maximum size of the cache of parsed simulations, in MiB",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Always parse simulations, ignoring the cache",
+    )
 
     args = parser.parse_args()
+    state = UploadState(args.state_file)
+    part_size = args.part_size * 2**20
+    cache = None
+    if not args.no_cache:
+        if ParseCache is not None:
+            cache = ParseCache(args.cache_dir, args.cache_size * 2**20)
+        elif not args.quiet:
+            print("tdotdat isn't installed, so parsed simulations won't be cached")
 
-    data = read(args.filename).to_imas()
-    data["contributors"] = [
-        {"name": contributor}
-        for contributor in args.contributors or [args.filename.owner()]
-    ]
-    data["title"] = args.title or args.filename.name
-    data["converged"] = not args.unconverged
+    if args.bulk:
+        if args.outputs:
+            parser.error("--outputs cannot be used with --bulk, use --output-glob")
+
+        failures = bulk_upload(
+            find_runs(args.filename, args.input_glob, args.output_glob),
+            contributors=args.contributors,
+            title=args.title,
+            converged=not args.unconverged,
+            server=args.server,
+            token=args.token,
+            quiet=args.quiet,
+            jobs=args.jobs,
+            max_uploads=args.max_uploads,
+            part_size=part_size,
+            parallel_parts=args.parallel_parts,
+            state=state,
+            dedup=not args.no_dedup,
+            cache=cache,
+        )
+        raise SystemExit(1 if failures else 0)
+
+    if len(args.filename) > 1:
+        parser.error("Only one input file can be uploaded without --bulk")
+    filename = args.filename[0]
+
+    data, _ = make_metadata(
+        filename,
+        contributors=args.contributors,
+        title=args.title,
+        converged=not args.unconverged,
+        cache=cache,
+        outputs=args.outputs,
+    )
 
     result_json = upload(
-        args.filename,
+        filename,
         data,
         args.outputs,
         server=args.server,
         token=args.token,
         quiet=args.quiet,
+        max_uploads=args.max_uploads,
+        part_size=part_size,
+        parallel_parts=args.parallel_parts,
+        state=state,
+        dedup=not args.no_dedup,
     )
 
     if not args.quiet: